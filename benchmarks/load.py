@@ -0,0 +1,330 @@
+"""Нагрузочный прогон полного цикла статьи: черновик → ревью → одобрение → публикация.
+
+Запуск из корня репозитория:
+
+    python benchmarks/load.py [--authors 20] [--reviewers 5] [--articles 5] [--postgres]
+
+Бот работает в режиме webhook против локальной заглушки Bot API
+(bot/fake_telegram.py). По умолчанию вместо PostgreSQL используется
+MemoryDatabase с задержкой ``--db-latency`` на запрос; с ``--postgres``
+бот подключается к БД из .env (лучше отдельной, прогон создает статьи).
+Лимиты Telegram в Sender по умолчанию сняты, ``--telegram-limits``
+возвращает их.
+
+Отчет: пропускная способность, p50/p99 шагов (от отправки обновления до
+ответного вызова Bot API) и обработчиков, суммарное время запросов к БД и
+шифрования. Результат дописывается строкой JSON в
+benchmarks/results/load.jsonl и сравнивается с предыдущим прогоном с теми же
+параметрами.
+"""
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import tempfile
+import dataclasses
+import subprocess
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+BOT_DIR = ROOT / "bot"
+RESULTS = Path(__file__).resolve().parent / "results" / "load.jsonl"
+sys.path.insert(0, str(BOT_DIR))
+
+from aiogram import BaseMiddleware
+from aiogram.fsm.storage.memory import MemoryStorage
+from cryptography.fernet import Fernet
+
+from callbacks import ArticleAction, ArticleCallback
+from config import Settings, get_settings
+from fake_telegram import FakeTelegram
+from main import NewsBot
+from memory_db import MemoryDatabase
+from metrics import CRYPTO_LATENCY, DB_QUERY_LATENCY, handler_name
+from sender import Sender
+
+REVIEWER_CHAT_ID = -1001
+CHANNEL_ID = -1002
+AUTHOR_IDS = 10_000
+REVIEWER_IDS = 20_000
+WEBHOOK_SECRET = "load-benchmark"
+# Допуск при сравнении с прошлым прогоном
+REGRESSION_THRESHOLD = 0.10
+
+BODY = "\n\n".join(
+    f"Абзац {i}: редакция проверяет текст, факты и источники перед публикацией." for i in range(20)
+)
+
+
+class SampleMiddleware(BaseMiddleware):
+    """Сырые длительности обработчиков для точных перцентилей"""
+
+    def __init__(self, samples: Dict[str, List[float]]):
+        self.samples = samples
+
+    async def __call__(self, handler, event, data: Dict[str, Any]):
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            self.samples[handler_name(data)].append(time.perf_counter() - start)
+
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def summary(samples: Dict[str, List[float]]) -> Dict[str, dict]:
+    return {
+        name: {
+            "count": len(values),
+            "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+        }
+        for name, values in sorted(samples.items()) if values
+    }
+
+
+def totals(histogram) -> Dict[str, dict]:
+    return {
+        ":".join(labels): {"count": count, "total_ms": round(total * 1000, 3)}
+        for labels, (count, total) in sorted(histogram.totals().items())
+    }
+
+
+def chat_is(chat_id: int) -> Callable[[Dict[str, Any]], bool]:
+    return lambda params: int(params.get("chat_id", 0)) == chat_id
+
+
+def article_from_markup(params: Dict[str, Any], action: ArticleAction) -> Optional[int]:
+    """id статьи из кнопки ``action`` в reply_markup ответа бота"""
+    markup = params.get("reply_markup") or {}
+    for row in markup.get("inline_keyboard", []):
+        for button in row:
+            data = button.get("callback_data") or ""
+            if data.startswith(f"{ArticleCallback.__prefix__}:"):
+                callback_data = ArticleCallback.unpack(data)
+                if callback_data.action == action:
+                    return callback_data.article_id
+    return None
+
+
+class LoadRun:
+    def __init__(self, fake: FakeTelegram, args: argparse.Namespace):
+        self.fake = fake
+        self.args = args
+        self.steps: Dict[str, List[float]] = defaultdict(list)
+        self.completed = 0
+        self.failed = 0
+        self.rejected_updates = 0
+
+    async def step(self, name: str, update: Dict[str, Any], method: str,
+                   predicate: Callable[[Dict[str, Any]], bool]) -> Dict[str, Any]:
+        """Отправка обновления и ожидание ответного вызова Bot API"""
+        expected = self.fake.expect(method, predicate)
+        start = time.perf_counter()
+        while await self.fake.push_update(update) == 503:
+            # очередь webhook переполнена, Telegram повторил бы доставку
+            self.rejected_updates += 1
+            await asyncio.sleep(0.05)
+        params = await asyncio.wait_for(expected, self.args.timeout)
+        self.steps[name].append(time.perf_counter() - start)
+        return params
+
+    async def article(self, author_id: int, reviewer_id: int, number: int):
+        fake = self.fake
+        marker = f"bench{author_id}x{number}"
+        await self.step(
+            "create", fake.message_update(author_id, "📝 Создать статью"), "sendMessage",
+            lambda p: chat_is(author_id)(p) and str(p.get("text", "")).startswith("📝")
+        )
+        reply = await self.step(
+            "draft", fake.message_update(author_id, f"Статья {marker}\n\n{BODY}"), "sendMessage",
+            lambda p: chat_is(author_id)(p) and article_from_markup(p, ArticleAction.REVIEW) is not None
+        )
+        article_id = article_from_markup(reply, ArticleAction.REVIEW)
+
+        def pack(action: ArticleAction) -> str:
+            return ArticleCallback(action=action, article_id=article_id).pack()
+
+        await self.step(
+            "review", fake.callback_update(author_id, pack(ArticleAction.REVIEW)), "sendDocument",
+            lambda p: chat_is(REVIEWER_CHAT_ID)(p) and f"#{article_id} " in str(p.get("caption", ""))
+        )
+        await self.step(
+            "approve", fake.callback_update(reviewer_id, pack(ArticleAction.APPROVE), REVIEWER_CHAT_ID),
+            "editMessageText", lambda p: str(p.get("text", "")).startswith(f"✅ Статья #{article_id} ")
+        )
+        await self.step(
+            "publish", fake.callback_update(reviewer_id, pack(ArticleAction.PUBLISH), REVIEWER_CHAT_ID),
+            "sendMessage", lambda p: chat_is(CHANNEL_ID)(p) and marker in str(p.get("text", ""))
+        )
+
+    async def author(self, author_id: int, reviewer_ids: List[int]):
+        for number in range(self.args.articles):
+            try:
+                await self.article(author_id, random.choice(reviewer_ids), number)
+                self.completed += 1
+            except asyncio.TimeoutError:
+                self.failed += 1
+
+
+def make_settings(args: argparse.Namespace, fake: FakeTelegram, vault_path: Path) -> Settings:
+    base = get_settings() if args.postgres else Settings(
+        bot_token="",
+        encryption_key=Fernet.generate_key().decode(),
+        vault_path=vault_path,
+        reviewer_chat_id=REVIEWER_CHAT_ID,
+    )
+    return dataclasses.replace(
+        base,
+        bot_token="123456:load-benchmark",
+        vault_path=vault_path,
+        reviewer_chat_id=REVIEWER_CHAT_ID,
+        channel_id=CHANNEL_ID,
+        bot_mode="webhook",
+        telegram_api_url=fake.base_url,
+        webhook_url=f"http://127.0.0.1:{args.webhook_port}/webhook",
+        webhook_secret=WEBHOOK_SECRET,
+        webhook_host="127.0.0.1",
+        webhook_port=args.webhook_port,
+        webhook_path="/webhook",
+        metrics_port=0,
+        log_file=None,
+    )
+
+
+async def run(args: argparse.Namespace) -> dict:
+    fake = FakeTelegram(port=args.api_port, latency=args.api_latency)
+    await fake.start()
+    with tempfile.TemporaryDirectory() as vault_dir:
+        settings = make_settings(args, fake, Path(vault_dir))
+        if args.postgres:
+            bot = NewsBot(settings)
+        else:
+            bot = NewsBot(settings, db=MemoryDatabase(latency=args.db_latency), storage=MemoryStorage())
+        if not args.telegram_limits:
+            bot.sender = Sender(bot.bot, workers=settings.sender_workers,
+                                global_rate=1e6, chat_rate=1e6, group_rate=1e6)
+        handlers: Dict[str, List[float]] = defaultdict(list)
+        for observer in (bot.dp.message, bot.dp.callback_query):
+            observer.middleware(SampleMiddleware(handlers))
+
+        task = asyncio.create_task(bot.run())
+        try:
+            while fake.webhook_url is None:
+                if task.done():
+                    raise RuntimeError("Бот не запустился, см. лог")
+                await asyncio.sleep(0.05)
+
+            load = LoadRun(fake, args)
+            reviewer_ids = [REVIEWER_IDS + i for i in range(args.reviewers)]
+            start = time.perf_counter()
+            await asyncio.gather(*(load.author(AUTHOR_IDS + i, reviewer_ids) for i in range(args.authors)))
+            elapsed = time.perf_counter() - start
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await fake.stop()
+
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "articles_completed": load.completed,
+        "articles_failed": load.failed,
+        "articles_per_s": round(load.completed / elapsed, 3),
+        "updates_per_s": round(sum(len(v) for v in load.steps.values()) / elapsed, 3),
+        "webhook_rejected": load.rejected_updates,
+        "steps": summary(load.steps),
+        "handlers": summary(handlers),
+        "db": totals(DB_QUERY_LATENCY),
+        "crypto": totals(CRYPTO_LATENCY),
+        "bot_api_calls": {method: len(calls) for method, calls in sorted(fake.calls.items())},
+    }
+
+
+def previous_result(params: dict) -> Optional[dict]:
+    if not RESULTS.exists():
+        return None
+    previous = None
+    for line in RESULTS.read_text(encoding="utf-8").splitlines():
+        entry = json.loads(line)
+        if entry.get("params") == params:
+            previous = entry
+    return previous
+
+
+def compare(result: dict, previous: dict) -> List[str]:
+    """Изменения относительно прошлого прогона с теми же параметрами"""
+    lines = [f"Сравнение с {previous['revision']}:"]
+    before, after = previous["articles_per_s"], result["articles_per_s"]
+    change = (after - before) / before if before else 0.0
+    flag = "  РЕГРЕССИЯ" if change < -REGRESSION_THRESHOLD else ""
+    lines.append(f"  articles/s: {before} -> {after} ({change:+.1%}){flag}")
+    for name, stats in result["handlers"].items():
+        old = previous["handlers"].get(name)
+        if not old or not old["p99_ms"]:
+            continue
+        change = (stats["p99_ms"] - old["p99_ms"]) / old["p99_ms"]
+        flag = "  РЕГРЕССИЯ" if change > REGRESSION_THRESHOLD else ""
+        lines.append(f"  {name} p99: {old['p99_ms']} -> {stats['p99_ms']} ms ({change:+.1%}){flag}")
+    return lines
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--authors", type=int, default=20)
+    parser.add_argument("--reviewers", type=int, default=5)
+    parser.add_argument("--articles", type=int, default=5, help="статей на автора")
+    parser.add_argument("--postgres", action="store_true", help="PostgreSQL из .env вместо БД в памяти")
+    parser.add_argument("--db-latency", type=float, default=0.0005, help="задержка запроса БД в памяти, с")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="задержка ответа заглушки Bot API, с")
+    parser.add_argument("--telegram-limits", action="store_true", help="оставить лимиты отправки Sender")
+    parser.add_argument("--timeout", type=float, default=30.0, help="ожидание ответа бота на шаг, с")
+    parser.add_argument("--api-port", type=int, default=8181)
+    parser.add_argument("--webhook-port", type=int, default=8180)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    params = {
+        "authors": args.authors,
+        "reviewers": args.reviewers,
+        "articles": args.articles,
+        "database": "postgres" if args.postgres else "memory",
+        "db_latency": None if args.postgres else args.db_latency,
+        "api_latency": args.api_latency,
+        "telegram_limits": args.telegram_limits,
+    }
+    result = {
+        "revision": git_revision(),
+        "timestamp": time.time(),
+        "python": sys.version.split()[0],
+        "params": params,
+        **asyncio.run(run(args)),
+    }
+    previous = previous_result(params)
+
+    RESULTS.parent.mkdir(parents=True, exist_ok=True)
+    with RESULTS.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(result, ensure_ascii=False) + "\n")
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    if previous:
+        print("\n".join(compare(result, previous)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""AsyncDatabase в памяти для нагрузочных прогонов без PostgreSQL.
+
+Повторяет семантику запросов AsyncDatabase: проверку переходов статусов
+по ARTICLE_TRANSITIONS, атомарный захват публикаций и счетчики статистики.
+``latency`` добавляет задержку на каждый запрос, имитируя сеть до БД.
+"""
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from collections import Counter
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Set, Tuple
+
+from database import AsyncDatabase, TransitionError
+from schema import ARTICLE_TRANSITIONS
+
+
+class MemoryDatabase(AsyncDatabase):
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.articles: Dict[int, dict] = {}
+        self.tables: Dict[str, List[tuple]] = {}
+        self.files: Dict[int, tuple] = {}
+        self.revisions: Dict[int, List[dict]] = {}
+        self.search_terms: Dict[Tuple[int, bytes], Set[int]] = {}
+        self.mac_key: Optional[str] = None
+        self._ids = itertools.count(1)
+        self._transitions = set(ARTICLE_TRANSITIONS)
+
+    async def _roundtrip(self):
+        await asyncio.sleep(self.latency)
+
+    async def connect(self, settings=None):
+        pass
+
+    async def close(self):
+        pass
+
+    async def migrate(self):
+        pass
+
+    async def pin_mac_key(self, fingerprint: str) -> str:
+        await self._roundtrip()
+        if self.mac_key is None:
+            self.mac_key = fingerprint
+        return self.mac_key
+
+    @asynccontextmanager
+    async def advisory_lock(self, lock_id: int) -> AsyncIterator[bool]:
+        yield True
+
+    async def add_article(self, user_id: int, file_path: str) -> int:
+        await self._roundtrip()
+        article_id = next(self._ids)
+        self.articles[article_id] = {
+            'id': article_id, 'user_id': user_id, 'file_path': file_path, 'status': 'draft',
+            'reviewer_id': None, 'publish_time': None, 'submitted_at': None, 'payload': None,
+            'revision': 1, 'reviewed_revision': None, 'search_revision': None,
+            'claimed_at': None, 'sent_chunks': 0, 'publish_attempts': 0,
+            'created_at': datetime.now(timezone.utc).replace(tzinfo=None),
+        }
+        self.revisions[article_id] = [{'revision': 1, 'file_path': file_path, 'delta': None}]
+        return article_id
+
+    async def get_article(self, article_id: int) -> Optional[dict]:
+        await self._roundtrip()
+        article = self.articles.get(article_id)
+        return dict(article) if article else None
+
+    async def transition(self, article_id: int, expected: Sequence[str], status: str, **fields) -> dict:
+        await self._roundtrip()
+        article = self.articles.get(article_id)
+        if article is None or article['status'] not in expected:
+            raise TransitionError(article_id, expected, article and article['status'])
+        self._set_status(article, status)
+        article.update(fields)
+        return dict(article)
+
+    def _set_status(self, article: dict, status: str):
+        if (article['status'], status) not in self._transitions:
+            raise TransitionError(article['id'], [article['status']], article['status'])
+        if status == 'review':
+            article['submitted_at'] = datetime.now(timezone.utc).replace(tzinfo=None)
+        article['status'] = status
+
+    async def delete_article(self, article_id: int) -> Optional[int]:
+        await self._roundtrip()
+        article = self.articles.pop(article_id, None)
+        self.files.pop(article_id, None)
+        self.revisions.pop(article_id, None)
+        self._drop_search_terms(article_id)
+        return article['user_id'] if article else None
+
+    async def get_file_id(self, article_id: int, content_hash: str) -> Optional[str]:
+        await self._roundtrip()
+        content = self.files.get(article_id)
+        return content[1] if content and content[0] == content_hash else None
+
+    async def save_file_id(self, article_id: int, content_hash: str, file_id: str):
+        await self._roundtrip()
+        self.files[article_id] = (content_hash, file_id)
+
+    async def save_revision(self, article_id: int, revision: int, file_path: str,
+                            delta: Optional[bytes], size: int) -> dict:
+        await self._roundtrip()
+        article = self.articles.get(article_id)
+        if article is None or article['status'] != 'draft' or article['revision'] != revision - 1:
+            raise TransitionError(article_id, ['draft'], article and article['status'])
+        article.update(file_path=file_path, revision=revision)
+        self.revisions[article_id].append({
+            'revision': revision, 'file_path': file_path if delta is None else None, 'delta': delta,
+        })
+        return dict(article)
+
+    async def get_revision_chain(self, article_id: int, revision: int) -> List[dict]:
+        await self._roundtrip()
+        rows = [row for row in self.revisions.get(article_id, []) if row['revision'] <= revision]
+        bases = [i for i, row in enumerate(rows) if row['file_path'] is not None]
+        return [dict(row) for row in rows[bases[-1]:]] if bases else []
+
+    async def referenced_names(self, names: List[str]) -> Set[str]:
+        await self._roundtrip()
+        referenced = {a['file_path'] for a in self.articles.values()}
+        referenced.update(row['file_path'] for rows in self.revisions.values() for row in rows)
+        return {path.rsplit('/', 1)[-1] for path in referenced if path} & set(names)
+
+    async def sample_file_paths(self, limit: int) -> List[str]:
+        await self._roundtrip()
+        articles = sorted(self.articles.values(), key=lambda a: a['id'], reverse=True)
+        return [a['file_path'] for a in articles if a['file_path']][:limit]
+
+    async def update_search_terms(self, article_id: int, user_id: int, revision: int,
+                                  added: List[bytes], removed: List[bytes]) -> bool:
+        await self._roundtrip()
+        article = self.articles.get(article_id)
+        if article is None or article['search_revision'] != revision - 1:
+            return False
+        for token in removed:
+            self.search_terms.get((user_id, token), set()).discard(article_id)
+        for token in added:
+            self.search_terms.setdefault((user_id, token), set()).add(article_id)
+        article['search_revision'] = revision
+        return True
+
+    async def replace_search_terms(self, article_id: int, user_id: int, revision: int,
+                                   tokens: List[bytes]) -> Set[bytes]:
+        await self._roundtrip()
+        article = self.articles.get(article_id)
+        if article is None or (article['search_revision'] or 0) > revision:
+            return set()
+        removed = self._drop_search_terms(article_id)
+        for token in tokens:
+            self.search_terms.setdefault((user_id, token), set()).add(article_id)
+        article['search_revision'] = revision
+        return removed
+
+    def _drop_search_terms(self, article_id: int) -> Set[bytes]:
+        removed = set()
+        for (_, token), ids in self.search_terms.items():
+            if article_id in ids:
+                ids.discard(article_id)
+                removed.add(token)
+        return removed
+
+    async def search_postings(self, user_id: int, tokens: List[bytes]) -> Dict[bytes, List[int]]:
+        await self._roundtrip()
+        postings = {token: self.search_terms.get((user_id, token)) for token in tokens}
+        return {token: sorted(ids) for token, ids in postings.items() if ids}
+
+    async def get_user_drafts(self, user_id: int, article_ids: List[int], limit: int) -> List[dict]:
+        await self._roundtrip()
+        drafts = sorted(
+            ((a['created_at'], a['id']) for a in map(self.articles.get, article_ids)
+             if a and a['user_id'] == user_id and a['status'] == 'draft'),
+            reverse=True
+        )
+        return [{'created_at': created_at, 'id': article_id} for created_at, article_id in drafts[:limit]]
+
+    async def search_backlog(self, after: int, limit: int) -> List[dict]:
+        await self._roundtrip()
+        rows = [
+            {'id': a['id'], 'user_id': a['user_id'], 'file_path': a['file_path'], 'revision': a['revision']}
+            for a in sorted(self.articles.values(), key=lambda a: a['id'])
+            if a['id'] > after and a['search_revision'] != a['revision']
+        ]
+        return rows[:limit]
+
+    async def get_drafts_page(self, user_id: int, limit: int, after: Optional[tuple] = None,
+                              before: Optional[tuple] = None) -> List[dict]:
+        await self._roundtrip()
+        drafts = sorted(
+            ((a['created_at'], a['id']) for a in self.articles.values()
+             if a['user_id'] == user_id and a['status'] == 'draft'),
+            reverse=before is None
+        )
+        if before is not None:
+            drafts = [key for key in drafts if key > tuple(before)]
+        elif after is not None:
+            drafts = [key for key in drafts if key < tuple(after)]
+        return [{'created_at': created_at, 'id': article_id} for created_at, article_id in drafts[:limit + 1]]
+
+    async def schedule_article(self, article_id: int, publish_time: datetime) -> bool:
+        await self._roundtrip()
+        article = self.articles.get(article_id)
+        if article is None or article['status'] not in ('approved', 'scheduled'):
+            return False
+        article['status'] = 'scheduled'
+        article['publish_time'] = publish_time
+        return True
+
+    async def get_scheduled(self) -> List[dict]:
+        await self._roundtrip()
+        scheduled = [a for a in self.articles.values() if a['status'] == 'scheduled']
+        return [{'id': a['id'], 'publish_time': a['publish_time']}
+                for a in sorted(scheduled, key=lambda a: a['publish_time'])]
+
+    async def claim_due_articles(self, now: datetime, limit: int) -> Dict[int, int]:
+        await self._roundtrip()
+        due = sorted(
+            (a for a in self.articles.values() if a['status'] == 'scheduled' and a['publish_time'] <= now),
+            key=lambda a: a['publish_time']
+        )[:limit]
+        for article in due:
+            article.update(status='publishing', claimed_at=now, publish_attempts=article['publish_attempts'] + 1)
+        return {article['id']: article['publish_attempts'] for article in due}
+
+    async def claim_article(self, article_id: int, now: datetime) -> int:
+        article = await self.transition(article_id, ["approved"], "publishing", claimed_at=now)
+        self.articles[article_id]['publish_attempts'] += 1
+        return article['publish_attempts'] + 1
+
+    def _claimed(self, article_id: int, attempt: int) -> Optional[dict]:
+        article = self.articles.get(article_id)
+        if article and article['status'] == 'publishing' and article['publish_attempts'] == attempt:
+            return article
+        return None
+
+    async def save_sent_chunks(self, article_id: int, attempt: int, count: int, now: datetime) -> bool:
+        await self._roundtrip()
+        article = self._claimed(article_id, attempt)
+        if article:
+            article.update(sent_chunks=count, claimed_at=now)
+        return article is not None
+
+    async def mark_published(self, claims: Dict[int, int]) -> List[int]:
+        await self._roundtrip()
+        articles = [a for a in (self._claimed(*claim) for claim in claims.items()) if a]
+        for article in articles:
+            article.update(status='published', payload=None, claimed_at=None, sent_chunks=0)
+        return [article['id'] for article in articles]
+
+    async def reschedule_articles(self, claims: Dict[int, int], publish_time: datetime,
+                                  max_attempts: int) -> Dict[int, str]:
+        await self._roundtrip()
+        articles = [a for a in (self._claimed(*claim) for claim in claims.items()) if a]
+        self._release(articles, publish_time, max_attempts)
+        return {article['id']: article['status'] for article in articles}
+
+    async def release_stale_claims(self, claimed_before: datetime, publish_time: datetime,
+                                   max_attempts: int) -> List[int]:
+        await self._roundtrip()
+        stale = [a for a in self.articles.values()
+                 if a['status'] == 'publishing' and a['claimed_at'] is not None and a['claimed_at'] < claimed_before]
+        return self._release(stale, publish_time, max_attempts)
+
+    def _release(self, articles: List[dict], publish_time: datetime, max_attempts: int) -> List[int]:
+        for article in articles:
+            status = 'approved' if article['publish_attempts'] >= max_attempts else 'scheduled'
+            article.update(status=status, publish_time=publish_time, claimed_at=None)
+        return [article['id'] for article in articles if article['status'] == 'scheduled']
+
+    async def get_stats(self, user_id: int) -> dict:
+        await self._roundtrip()
+        user_counts = Counter(a['status'] for a in self.articles.values() if a['user_id'] == user_id)
+        total_counts = Counter(a['status'] for a in self.articles.values())
+        return {
+            'user_counts': dict(user_counts),
+            'total_counts': dict(total_counts),
+            'user_turnaround': None,
+            'total_turnaround': None,
+            'user_today': user_counts.get('published', 0),
+            'total_today': total_counts.get('published', 0),
+            'daily_avg': total_counts.get('published', 0) / 30.0,
+        }
+
+    async def copy_records(self, table: str, columns: Sequence[str], records: List[tuple]):
+        await self._roundtrip()
+        self.tables.setdefault(table, []).extend(records)
+
+    async def insert_records(self, table: str, columns: Sequence[str], records: List[tuple]) -> List[tuple]:
+        await self.copy_records(table, columns, records)
+        return []
@@ -0,0 +1,104 @@
+"""Замер стоимости импорта и холодного старта бота.
+
+Запуск из корня репозитория:
+
+    python benchmarks/startup.py [--runs 5] [--db]
+
+Каждый замер выполняется в отдельном процессе. Результат дописывается
+строкой JSON в benchmarks/results/startup.jsonl, чтобы сравнивать версии.
+С ``--db`` дополнительно замеряется подключение к PostgreSQL и миграции.
+"""
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+BOT_DIR = ROOT / "bot"
+RESULTS = Path(__file__).resolve().parent / "results" / "startup.jsonl"
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import main
+print(time.perf_counter() - start)
+"""
+
+COLD_START_SNIPPET = """
+import time
+start = time.perf_counter()
+import main
+bot = main.NewsBot()
+print(time.perf_counter() - start)
+"""
+
+DB_SNIPPET = """
+import time
+import asyncio
+from config import get_settings
+from database import AsyncDatabase
+from schema import migrate
+
+async def run():
+    start = time.perf_counter()
+    db = AsyncDatabase()
+    await db.connect(get_settings())
+    await migrate(db.pool)
+    await db.close()
+    return time.perf_counter() - start
+
+print(asyncio.run(run()))
+"""
+
+
+def measure(snippet: str, runs: int) -> dict:
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", snippet],
+            cwd=BOT_DIR, capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(float(output.strip().splitlines()[-1]))
+    return {
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "max": max(samples),
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--db", action="store_true", help="замерить подключение к БД и миграции")
+    args = parser.parse_args()
+
+    result = {
+        "revision": git_revision(),
+        "timestamp": time.time(),
+        "python": sys.version.split()[0],
+        "import": measure(IMPORT_SNIPPET, args.runs),
+        "cold_start": measure(COLD_START_SNIPPET, args.runs),
+    }
+    if args.db:
+        result["db_bootstrap"] = measure(DB_SNIPPET, args.runs)
+
+    RESULTS.parent.mkdir(parents=True, exist_ok=True)
+    with RESULTS.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(result) + "\n")
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import json
+import asyncio
+import logging
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
+from database import AsyncDatabase, IntegrityError
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class WriteBehindBuffer:
+    """Буфер отложенной записи в таблицу через ``COPY``.
+
+    Записи копятся в ограниченной очереди и сбрасываются пачкой, когда
+    набралось ``max_batch`` записей или прошло ``flush_interval`` секунд.
+    Если очередь заполнена, ``add`` ждет (backpressure). Если пачка
+    нарушает ограничения таблицы (комментарий к уже удаленной статье),
+    она пишется по одной записи и отбрасываются только нарушившие.
+    """
+
+    def __init__(self, db: AsyncDatabase, table: str, columns: Sequence[str],
+                 max_batch: int = 500, flush_interval: float = 1.0,
+                 max_pending: int = 10000, retries: int = 3):
+        self.db = db
+        self.table = table
+        self.columns = list(columns)
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.dropped = 0
+
+    async def add(self, *record):
+        await self._queue.put(tuple(record))
+
+    async def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        """Остановка с записью всего, что осталось в очереди"""
+        if self._task:
+            await self._queue.put(_STOP)
+            await self._task
+        while not self._queue.empty():
+            await self._write(self._take(self.max_batch))
+
+    def _take(self, limit: int) -> List[Tuple]:
+        batch = []
+        while len(batch) < limit and not self._queue.empty():
+            record = self._queue.get_nowait()
+            if record is not _STOP:
+                batch.append(record)
+        return batch
+
+    async def _loop(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            record = await self._queue.get()
+            if record is _STOP:
+                return
+            batch = [record]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    record = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    break
+                if record is _STOP:
+                    stopping = True
+                    break
+                batch.append(record)
+            await self._write(batch)
+
+    async def _write(self, batch: List[Tuple]):
+        if not batch:
+            return
+        attempt = 0
+        one_by_one = False
+        while attempt < self.retries:
+            try:
+                if one_by_one:
+                    rejected = await self.db.insert_records(self.table, self.columns, batch)
+                else:
+                    await self.db.copy_records(self.table, self.columns, batch)
+                    rejected = []
+                self.written += len(batch) - len(rejected)
+                if rejected:
+                    self.dropped += len(rejected)
+                    logger.error(f"Отброшено {len(rejected)} записей {self.table}, нарушающих ограничения")
+                return
+            except IntegrityError as e:
+                logger.warning(f"Пачка {self.table} нарушает ограничения, запись по одной: {e}")
+                one_by_one = True
+            except Exception as e:
+                attempt += 1
+                logger.error(f"Ошибка записи в {self.table} (попытка {attempt}): {e}")
+                await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+        self.dropped += len(batch)
+        logger.error(f"Потеряно {len(batch)} записей {self.table}")
+
+
+class AuditLog:
+    """Комментарии ревьюеров и события аудита с отложенной записью"""
+
+    def __init__(self, db: AsyncDatabase, **buffer_options):
+        self.comments = WriteBehindBuffer(
+            db, "review_comments", ("article_id", "reviewer_id", "comment", "created_at"), **buffer_options
+        )
+        self.events = WriteBehindBuffer(
+            db, "audit_events", ("event", "article_id", "user_id", "payload", "created_at"), **buffer_options
+        )
+
+    async def start(self):
+        await self.comments.start()
+        await self.events.start()
+
+    async def stop(self):
+        await self.comments.stop()
+        await self.events.stop()
+
+    async def log_review(self, article_id: int, comment: str, reviewer_id: Optional[int] = None):
+        """Комментарий ревьюера"""
+        await self.comments.add(article_id, reviewer_id, comment, datetime.utcnow())
+
+    async def event(self, event: str, article_id: Optional[int] = None, user_id: Optional[int] = None, **payload):
+        """Событие аудита"""
+        await self.events.add(
+            event, article_id, user_id, json.dumps(payload, ensure_ascii=False), datetime.utcnow()
+        )
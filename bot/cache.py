@@ -0,0 +1,134 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class ArticleCache:
+    """LRU-кэш с ограничением по объему в байтах и TTL.
+
+    Значения bytes/bytearray хранятся как bytearray, поэтому при вытеснении
+    их можно затереть нулями (``zeroize=True``). Копии, уже отданные
+    вызывающему коду, этим не затрагиваются.
+
+    Чтение из источника при промахе берет ``version()`` до запроса и
+    передает ее в ``put``: если ключ за это время сбросили или записали
+    заново, устаревшее значение в кэш не попадает.
+
+    Выключенный кэш (``enabled = False``) ничего не отдает и не запоминает.
+    """
+
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024, ttl: float = 300.0,
+                 zeroize: bool = False, sizeof: Optional[Callable[[Any], int]] = None,
+                 max_stamps: int = 10000):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.zeroize = zeroize
+        self.max_stamps = max_stamps
+        self.enabled = True
+        self._sizeof = sizeof or _default_sizeof
+        self._items: "OrderedDict[Hashable, Tuple[Any, int, float]]" = OrderedDict()
+        # версия последнего сброса или записи ключа; для вытесненных отметок - _floor
+        self._stamps: "OrderedDict[Hashable, int]" = OrderedDict()
+        self._clock = 0
+        self._floor = 0
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale_puts = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        item = self._items.get(key) if self.enabled else None
+        if item is None:
+            self.misses += 1
+            return None
+        value, _, expires_at = item
+        if expires_at < time.monotonic():
+            self._drop(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def version(self) -> int:
+        """Версия кэша перед чтением из источника, для ``put(..., version=)``"""
+        return self._clock
+
+    def _bump(self, key: Hashable):
+        self._clock += 1
+        self._stamps[key] = self._clock
+        self._stamps.move_to_end(key)
+        if len(self._stamps) > self.max_stamps:
+            _, self._floor = self._stamps.popitem(last=False)
+
+    def put(self, key: Hashable, value: Any, version: Optional[int] = None):
+        """Запись в кэш; с ``version`` - только если ключ не менялся после нее"""
+        if version is None:
+            self._bump(key)
+        elif self._stamps.get(key, self._floor) > version:
+            self.stale_puts += 1
+            return
+        if not self.enabled:
+            return
+        if isinstance(value, bytes):
+            value = bytearray(value)
+        size = self._sizeof(value)
+        if key in self._items:
+            self._drop(key)
+        if size > self.max_bytes:
+            return
+        self._items[key] = (value, size, time.monotonic() + self.ttl)
+        self.size += size
+        while self.size > self.max_bytes:
+            oldest = next(iter(self._items))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        self._bump(key)
+        if key in self._items:
+            self._drop(key)
+
+    def clear(self):
+        for key in list(self._items):
+            self._drop(key)
+
+    def _drop(self, key: Hashable):
+        value, size, _ = self._items.pop(key)
+        self.size -= size
+        if self.zeroize and isinstance(value, bytearray):
+            value[:] = b"\x00" * len(value)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики для мониторинга"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "stale_puts": self.stale_puts,
+            "expirations": self.expirations,
+            "hit_rate": self.hit_rate,
+            "items": len(self._items),
+            "bytes": self.size,
+        }
+
+    def __len__(self):
+        return len(self._items)
+
+
+def _default_sizeof(value: Any) -> int:
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, dict):
+        return sum(len(str(k)) + len(str(v)) for k, v in value.items())
+    return len(str(value))
@@ -0,0 +1,103 @@
+import logging
+from enum import Enum
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Tuple
+
+from aiogram.filters.callback_data import CallbackData
+from aiogram.fsm.context import FSMContext
+from aiogram.types import CallbackQuery
+
+logger = logging.getLogger(__name__)
+
+
+class ArticleAction(str, Enum):
+    EDIT = "edit"
+    REVIEW = "review"
+    DELETE = "delete"
+    APPROVE = "approve"
+    REJECT = "reject"
+    REQUEST_CHANGES = "changes"
+    COMMENT = "comment"
+    PUBLISH = "publish"
+    SCHEDULE = "schedule"
+    OPEN = "open"
+
+
+class ArticleCallback(CallbackData, prefix="a"):
+    """Действие над статьей: ``a:<action>:<article_id>``"""
+    action: ArticleAction
+    article_id: int
+
+
+class ConfirmCallback(CallbackData, prefix="c"):
+    """Подтверждение действия: ``c:<action>:<item_id>``"""
+    action: str
+    item_id: int
+
+
+class PageCallback(CallbackData, prefix="p"):
+    """Страница списка: ``p:<kind>:<direction>:<cursor>``
+
+    ``direction`` - ``n`` (старше курсора) или ``p`` (новее курсора),
+    курсор - ``created_at`` и ``id`` последней показанной строки.
+    """
+    kind: str
+    direction: str
+    cursor: str
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _base36(value: int) -> str:
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    result = ""
+    while True:
+        value, rest = divmod(value, 36)
+        result = digits[rest] + result
+        if not value:
+            return result
+
+
+def encode_cursor(created_at: datetime, article_id: int) -> str:
+    """Компактный курсор для callback_data (лимит Telegram - 64 байта)"""
+    micros = (created_at.replace(tzinfo=None) - _EPOCH) // timedelta(microseconds=1)
+    return f"{_base36(micros)}.{_base36(article_id)}"
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    micros, article_id = cursor.split(".")
+    try:
+        return _EPOCH + timedelta(microseconds=int(micros, 36)), int(article_id, 36)
+    except OverflowError:
+        raise ValueError(f"Курсор вне диапазона: {cursor}")
+
+
+ArticleHandler = Callable[[CallbackQuery, FSMContext, int], Awaitable]
+
+
+class CallbackRouter:
+    """Диспетчеризация кнопок статей по действию за O(1).
+
+    Данные кнопки разбираются один раз фильтром ``ArticleCallback.filter()``;
+    некорректные payload отсекаются до обращения к БД.
+    """
+
+    def __init__(self):
+        self._routes: Dict[ArticleAction, ArticleHandler] = {}
+
+    def register(self, action: ArticleAction, handler: ArticleHandler):
+        self._routes[action] = handler
+
+    async def dispatch(self, callback: CallbackQuery, callback_data: ArticleCallback, state: FSMContext):
+        handler = self._routes.get(callback_data.action)
+        if handler is None or callback_data.article_id <= 0:
+            await callback.answer("⚠️ Действие недоступно")
+            return
+        await handler(callback, state, callback_data.article_id)
+
+    @staticmethod
+    async def reject(callback: CallbackQuery):
+        """Ответ на нажатие кнопки с некорректными данными"""
+        logger.warning(f"Некорректные данные кнопки: {callback.data!r}")
+        await callback.answer("⚠️ Устаревшая или некорректная кнопка")
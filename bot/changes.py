@@ -0,0 +1,82 @@
+import asyncio
+import logging
+from typing import Callable, List, Optional, Tuple
+
+from cache import ArticleCache
+from database import AsyncDatabase
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "article_changes"
+
+# (статья, автор)
+OnChange = Callable[[int, int], None]
+
+
+class ArticleChanges:
+    """Сброс локальных кэшей при изменении статей в любом процессе бота.
+
+    Триггер ``articles_notify_change`` рассылает ``<id>:<автор>`` через
+    NOTIFY при каждой записи в ``articles`` (включая изменения поискового
+    индекса, которые обновляют ``search_revision``). Подписчики сбрасывают
+    свои записи. Пока подписка LISTEN не работает, кэши подписчиков очищены
+    и выключены, и данные читаются из БД.
+    """
+
+    def __init__(self, db: AsyncDatabase, max_retry_delay: float = 30.0):
+        self.db = db
+        self.max_retry_delay = max_retry_delay
+        self._subscribers: List[Tuple[ArticleCache, OnChange]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, cache: ArticleCache, on_change: OnChange):
+        self._subscribers.append((cache, on_change))
+
+    async def start(self):
+        self._set_enabled(False)
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def _set_enabled(self, enabled: bool):
+        for cache, _ in self._subscribers:
+            if not enabled:
+                cache.clear()
+            cache.enabled = enabled
+
+    async def _listen(self):
+        delay = 1.0
+        while True:
+            lost = asyncio.Event()
+            try:
+                async with self.db.pool.acquire() as conn:
+                    conn.add_termination_listener(lambda _: lost.set())
+                    await conn.add_listener(CHANNEL, self._on_notify)
+                    self._set_enabled(True)
+                    delay = 1.0
+                    try:
+                        await lost.wait()
+                    finally:
+                        # пропущенные уведомления не восстановить
+                        self._set_enabled(False)
+                        if not conn.is_closed():
+                            await conn.remove_listener(CHANNEL, self._on_notify)
+                logger.error("Подписка на изменения статей потеряна, кэши выключены до переподключения")
+            except Exception as e:
+                logger.error(f"Подписка на изменения статей недоступна, кэши выключены: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_retry_delay)
+
+    def _on_notify(self, conn, pid, channel, payload: str):
+        article_id, _, user_id = payload.partition(":")
+        for _, on_change in self._subscribers:
+            try:
+                on_change(int(article_id), int(user_id))
+            except Exception as e:
+                logger.error(f"Ошибка сброса кэша статьи #{article_id}: {e}")
@@ -0,0 +1,169 @@
+import os
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+_settings = None
+
+
+def _int_list(value: Optional[str]) -> List[int]:
+    return [int(item) for item in (value or "").split(",") if item.strip()]
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Настройки бота из окружения и .env, загружаются один раз"""
+    bot_token: str
+    encryption_key: str
+    vault_path: Path
+    reviewer_chat_id: int
+    channel_id: Optional[int] = None
+    admin_ids: List[int] = field(default_factory=list)
+    editor_ids: List[int] = field(default_factory=list)
+    encryption_keys: List[str] = field(default_factory=list)
+    mac_key: Optional[str] = None
+    key_rotation_batch: int = 100
+    key_rotation_concurrency: int = 2
+    key_rotation_pause: float = 0.5
+
+    db_user: Optional[str] = None
+    db_password: Optional[str] = None
+    db_host: str = "localhost"
+    db_port: int = 5432
+    db_name: Optional[str] = None
+    db_pool_min: int = 2
+    db_pool_max: int = 10
+
+    vault_workers: int = 4
+    vault_gc_interval: float = 3600.0
+    vault_gc_batch: int = 500
+    vault_gc_grace: float = 3600.0
+    revision_base_every: int = 10
+    edit_workspace: Optional[Path] = None
+    edit_debounce: float = 2.0
+    edit_idle_timeout: float = 1800.0
+    cache_max_bytes: int = 16 * 1024 * 1024
+    cache_ttl: float = 300.0
+    cache_zeroize: bool = True
+    schedule_tz: str = "Europe/Moscow"
+    scheduler_batch_size: int = 20
+    scheduler_lease: float = 600.0
+    scheduler_max_attempts: int = 5
+    sender_workers: int = 4
+    stats_ttl: float = 30.0
+    drafts_page_size: int = 5
+    search_cache_bytes: int = 2 * 1024 * 1024
+
+    bot_mode: str = "polling"
+    telegram_api_url: Optional[str] = None
+    webhook_url: Optional[str] = None
+    webhook_secret: Optional[str] = None
+    webhook_host: str = "0.0.0.0"
+    webhook_port: int = 8080
+    webhook_path: str = "/webhook"
+    webhook_workers: int = 8
+    webhook_queue_size: int = 100
+
+    metrics_host: str = "127.0.0.1"
+    metrics_port: int = 0
+    metrics_profiling: bool = False
+
+    log_file: Optional[str] = "bot.log"
+    log_level: str = "INFO"
+    log_json: bool = True
+    log_max_bytes: int = 10 * 1024 * 1024
+    log_backup_count: int = 5
+    log_rotate_interval: float = 86400.0
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """Чтение и проверка переменных окружения"""
+        env = os.environ
+        required = ['BOT_TOKEN', 'VAULT_PATH', 'REVIEWER_CHAT_ID']
+        missing = [var for var in required if not env.get(var)]
+        if not env.get('ENCRYPTION_KEY') and not env.get('ENCRYPTION_KEYS'):
+            missing.append('ENCRYPTION_KEY')
+        if missing:
+            raise ValueError(f"Отсутствуют переменные окружения: {', '.join(missing)}")
+
+        try:
+            # ENCRYPTION_KEYS: новый ключ первым, затем старые
+            keys = [key.strip() for key in env.get('ENCRYPTION_KEYS', '').split(',') if key.strip()]
+            keys = keys or [env['ENCRYPTION_KEY']]
+            settings = cls(
+                bot_token=env['BOT_TOKEN'],
+                encryption_key=keys[0],
+                encryption_keys=keys,
+                mac_key=env.get('MAC_KEY') or None,
+                key_rotation_batch=int(env.get('KEY_ROTATION_BATCH', 100)),
+                key_rotation_concurrency=int(env.get('KEY_ROTATION_CONCURRENCY', 2)),
+                key_rotation_pause=float(env.get('KEY_ROTATION_PAUSE', 0.5)),
+                vault_path=Path(env['VAULT_PATH'].strip()),
+                reviewer_chat_id=int(env['REVIEWER_CHAT_ID']),
+                channel_id=int(env['CHANNEL_ID']) if env.get('CHANNEL_ID') else None,
+                admin_ids=_int_list(env.get('ADMIN_IDS')),
+                editor_ids=_int_list(env.get('EDITOR_IDS')),
+                db_user=env.get('DB_USER', '').strip() or None,
+                db_password=env.get('DB_PASSWORD'),
+                db_host=env.get('DB_HOST', 'localhost').strip(),
+                db_port=int(env.get('DB_PORT', 5432)),
+                db_name=env.get('DB_NAME', '').strip() or None,
+                db_pool_min=int(env.get('DB_POOL_MIN', 2)),
+                db_pool_max=int(env.get('DB_POOL_MAX', 10)),
+                vault_workers=int(env.get('VAULT_WORKERS', 4)),
+                vault_gc_interval=float(env.get('VAULT_GC_INTERVAL', 3600)),
+                vault_gc_batch=int(env.get('VAULT_GC_BATCH', 500)),
+                vault_gc_grace=float(env.get('VAULT_GC_GRACE', 3600)),
+                revision_base_every=int(env.get('REVISION_BASE_EVERY', 10)),
+                edit_workspace=Path(env['EDIT_WORKSPACE'].strip()) if env.get('EDIT_WORKSPACE') else None,
+                edit_debounce=float(env.get('EDIT_DEBOUNCE', 2)),
+                edit_idle_timeout=float(env.get('EDIT_IDLE_TIMEOUT', 1800)),
+                cache_max_bytes=int(env.get('CACHE_MAX_BYTES', 16 * 1024 * 1024)),
+                cache_ttl=float(env.get('CACHE_TTL', 300)),
+                cache_zeroize=env.get('CACHE_ZEROIZE', '1') == '1',
+                schedule_tz=env.get('SCHEDULE_TZ', 'Europe/Moscow'),
+                scheduler_batch_size=int(env.get('SCHEDULER_BATCH_SIZE', 20)),
+                scheduler_lease=float(env.get('SCHEDULER_LEASE', 600)),
+                scheduler_max_attempts=int(env.get('SCHEDULER_MAX_ATTEMPTS', 5)),
+                sender_workers=int(env.get('SENDER_WORKERS', 4)),
+                stats_ttl=float(env.get('STATS_TTL', 30)),
+                drafts_page_size=int(env.get('DRAFTS_PAGE_SIZE', 5)),
+                search_cache_bytes=int(env.get('SEARCH_CACHE_BYTES', 2 * 1024 * 1024)),
+                bot_mode=env.get('BOT_MODE', 'polling'),
+                telegram_api_url=env.get('TELEGRAM_API_URL') or None,
+                webhook_url=env.get('WEBHOOK_URL') or None,
+                webhook_secret=env.get('WEBHOOK_SECRET') or None,
+                webhook_host=env.get('WEBHOOK_HOST', '0.0.0.0'),
+                webhook_port=int(env.get('WEBHOOK_PORT', 8080)),
+                webhook_path=env.get('WEBHOOK_PATH', '/webhook'),
+                webhook_workers=int(env.get('WEBHOOK_WORKERS', 8)),
+                webhook_queue_size=int(env.get('WEBHOOK_QUEUE_SIZE', 100)),
+                metrics_host=env.get('METRICS_HOST', '127.0.0.1'),
+                metrics_port=int(env.get('METRICS_PORT', 0)),
+                metrics_profiling=env.get('METRICS_PROFILING', '0') == '1',
+                log_file=env.get('LOG_FILE', 'bot.log') or None,
+                log_level=env.get('LOG_LEVEL', 'INFO').upper(),
+                log_json=env.get('LOG_JSON', '1') == '1',
+                log_max_bytes=int(env.get('LOG_MAX_BYTES', 10 * 1024 * 1024)),
+                log_backup_count=int(env.get('LOG_BACKUP_COUNT', 5)),
+                log_rotate_interval=float(env.get('LOG_ROTATE_INTERVAL', 86400)),
+            )
+        except ValueError as e:
+            raise ValueError(f"Некорректное значение переменной окружения: {e}")
+
+        if settings.bot_mode not in ("polling", "webhook"):
+            raise ValueError(f"BOT_MODE должен быть polling или webhook, получено {settings.bot_mode}")
+        if settings.bot_mode == "webhook" and not settings.webhook_secret:
+            raise ValueError("Для BOT_MODE=webhook требуется WEBHOOK_SECRET")
+        return settings
+
+
+def get_settings() -> Settings:
+    """Настройки процесса; .env читается при первом вызове"""
+    global _settings
+    if _settings is None:
+        load_dotenv()
+        _settings = Settings.from_env()
+    return _settings
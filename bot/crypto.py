@@ -1,32 +1,172 @@
+import io
+import os
+import hmac
+import hashlib
+import struct
 from pathlib import Path
-from cryptography.fernet import Fernet
+from typing import BinaryIO, Iterator, List, Optional, Sequence, Union
+from cryptography.fernet import Fernet, MultiFernet
 import base64
 
+STREAM_MAGIC = b"NBS1"
+CHUNK_SIZE = 64 * 1024
+STREAM_ID_SIZE = 16
+_FRAME_LENGTH = struct.Struct(">I")
+_FRAME_HEADER = struct.Struct(f">{STREAM_ID_SIZE}sI?")
+
+
+def _key_bytes(key: str) -> bytes:
+    key = key.strip()
+
+    padding = len(key) % 4
+    if padding:
+        key += "=" * (4 - padding)
+
+    key_bytes = base64.urlsafe_b64decode(key)
+    if len(key_bytes) != 32:
+        raise ValueError(f"Некорректная длина ключа: {len(key_bytes)} байт (требуется 32)")
+    return key_bytes
+
 
 class Crypto:
-    def __init__(self, key: str):
+    """Шифрование связкой ключей.
+
+    Первый ключ шифрует, расшифровка пробует все (MultiFernet), поэтому
+    при смене ключа старые файлы читаются до их перешифрования. Ключ HMAC
+    (адреса объектов хранилища, поисковый индекс) не должен меняться при
+    смене ключа шифрования: по умолчанию он выводится из последнего ключа
+    связки, то есть из самого старого. Отпечаток ключа HMAC (``mac_id``)
+    хранится в БД, и бот не запускается, если ключ сменился.
+    """
+
+    def __init__(self, keys: Union[str, Sequence[str]], mac_key: Optional[str] = None):
         try:
-            key = key.strip()
-            
-            padding = len(key) % 4
-            if padding:
-                key += "=" * (4 - padding)
-            
-            key_bytes = base64.urlsafe_b64decode(key)
-            if len(key_bytes) != 32:
-                raise ValueError(f"Некорректная длина ключа: {len(key_bytes)} байт (требуется 32)")
-                
-            self.cipher = Fernet(base64.urlsafe_b64encode(key_bytes))
+            keys = [keys] if isinstance(keys, str) else list(keys)
+            if not keys:
+                raise ValueError("Не задан ни один ключ")
+            keys_bytes = [_key_bytes(key) for key in keys]
+
+            self._fernets = [Fernet(base64.urlsafe_b64encode(key_bytes)) for key_bytes in keys_bytes]
+            self.cipher = MultiFernet(self._fernets)
+            self.key_id = hashlib.sha256(keys_bytes[0]).hexdigest()[:16]
+            # отдельный ключ для HMAC, выведенный из ключа шифрования
+            mac_source = _key_bytes(mac_key) if mac_key else keys_bytes[-1]
+            self.mac_pinned = bool(mac_key)
+            self._mac_key = hashlib.sha256(b"news-bot:mac:" + mac_source).digest()
+            self.mac_id = self.mac(b"", purpose=b"fingerprint")[:16]
         except Exception as e:
             raise ValueError(f"Ошибка инициализации шифрования. Проверьте ENCRYPTION_KEY: {str(e)}")
+
+    @property
+    def rotating(self) -> bool:
+        """В связке есть старые ключи, данные нужно перешифровать"""
+        return len(self._fernets) > 1
         
+    def encrypt(self, data: bytes) -> bytes:
+        """Шифрование данных в памяти"""
+        return self.cipher.encrypt(data)
+
+    def decrypt(self, token: bytes) -> bytes:
+        """Дешифрование данных в памяти"""
+        return self.cipher.decrypt(token)
+
+    def hasher(self, purpose: bytes = b"vault"):
+        """HMAC-SHA256 с ключом из ENCRYPTION_KEY для данных назначения ``purpose``"""
+        return hmac.new(self._mac_key, purpose + b"\0", hashlib.sha256)
+
+    def mac(self, data: bytes, purpose: bytes = b"vault") -> str:
+        """Адрес данных, не раскрывающий их содержимое"""
+        hasher = self.hasher(purpose)
+        hasher.update(data)
+        return hasher.hexdigest()
+
     def encrypt_file(self, file_path: Path) -> bytes:
         """Шифрование файла"""
         if not file_path.exists():
             raise FileNotFoundError(f"File {file_path} not found")
-        return self.cipher.encrypt(file_path.read_bytes())
+        return self.encrypt(file_path.read_bytes())
 
     def decrypt_file(self, encrypted_data: bytes) -> str:
         """Дешифрование данных"""
-        return self.cipher.decrypt(encrypted_data).decode('utf-8')
-    
\ No newline at end of file
+        return self.decrypt_data(encrypted_data).decode('utf-8')
+
+    def decrypt_data(self, encrypted_data: bytes) -> bytes:
+        """Дешифрование содержимого файла в любом из форматов.
+
+        Формат различается по началу файла: токен Fernet всегда начинается
+        с ``gAAAAA``, потоковый формат - с ``STREAM_MAGIC``.
+        """
+        if encrypted_data.startswith(STREAM_MAGIC):
+            return b"".join(self.decrypt_stream(io.BytesIO(encrypted_data)))
+        return self.decrypt(encrypted_data)
+
+    def encrypt_stream(self, source: BinaryIO, target: BinaryIO, chunk_size: int = CHUNK_SIZE) -> int:
+        """Потоковое шифрование: source читается кусками, в target пишутся фреймы.
+
+        Формат: STREAM_MAGIC, случайный id потока, затем фреймы
+        ``<длина токена: 4 байта><токен>``. Каждый токен содержит id потока,
+        номер куска и флаг последнего куска, поэтому перестановка, обрезка
+        фреймов или подстановка фрейма из другого потока обнаруживаются при
+        дешифровании. Возвращает количество записанных байт.
+        """
+        stream_id = os.urandom(STREAM_ID_SIZE)
+        written = target.write(STREAM_MAGIC + stream_id)
+        index = 0
+        chunk = source.read(chunk_size)
+        while True:
+            next_chunk = source.read(chunk_size)
+            last = not next_chunk
+            token = self.cipher.encrypt(_FRAME_HEADER.pack(stream_id, index, last) + chunk)
+            written += target.write(_FRAME_LENGTH.pack(len(token)))
+            written += target.write(token)
+            if last:
+                return written
+            chunk = next_chunk
+            index += 1
+
+    def rotate_data(self, encrypted_data: bytes) -> bytes:
+        """Перешифрование содержимого файла первым ключом без смены формата"""
+        if not encrypted_data.startswith(STREAM_MAGIC):
+            return self.cipher.rotate(encrypted_data)
+        source = io.BytesIO(encrypted_data)
+        frames: List[bytes] = [source.read(len(STREAM_MAGIC) + STREAM_ID_SIZE)]
+        while True:
+            length_bytes = source.read(_FRAME_LENGTH.size)
+            if not length_bytes:
+                return b"".join(frames)
+            (length,) = _FRAME_LENGTH.unpack(length_bytes)
+            token = self.cipher.rotate(source.read(length))
+            frames.append(_FRAME_LENGTH.pack(len(token)))
+            frames.append(token)
+
+    def decrypt_stream(self, source: BinaryIO) -> Iterator[bytes]:
+        """Потоковое дешифрование, отдает расшифрованные куски по мере чтения.
+
+        Файл из одного токена (не потокового формата) расшифровывается целиком.
+        """
+        magic = source.read(len(STREAM_MAGIC))
+        if magic != STREAM_MAGIC:
+            yield self.decrypt(magic + source.read())
+            return
+        stream_id = source.read(STREAM_ID_SIZE)
+        if len(stream_id) != STREAM_ID_SIZE:
+            raise ValueError("Зашифрованный поток обрезан")
+        expected = 0
+        while True:
+            length_bytes = source.read(_FRAME_LENGTH.size)
+            if len(length_bytes) != _FRAME_LENGTH.size:
+                raise ValueError("Зашифрованный поток обрезан")
+            (length,) = _FRAME_LENGTH.unpack(length_bytes)
+            token = source.read(length)
+            if len(token) != length:
+                raise ValueError("Зашифрованный поток обрезан")
+            frame = self.cipher.decrypt(token)
+            frame_stream, index, last = _FRAME_HEADER.unpack_from(frame)
+            if frame_stream != stream_id:
+                raise ValueError("Кусок из другого зашифрованного потока")
+            if index != expected:
+                raise ValueError("Нарушен порядок кусков зашифрованного потока")
+            yield frame[_FRAME_HEADER.size:]
+            if last:
+                return
+            expected += 1
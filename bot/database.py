@@ -1,52 +1,616 @@
-import os
+import json
 import asyncpg
-from dotenv import load_dotenv
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Set
 
-load_dotenv()
+from cache import ArticleCache
+from config import Settings
+from schema import migrate
+
+
+class TransitionError(Exception):
+    """Статья не найдена или ее статус уже изменен другим запросом"""
+
+    def __init__(self, article_id: int, expected: Sequence[str], actual: Optional[str]):
+        self.article_id = article_id
+        self.expected = tuple(expected)
+        self.actual = actual
+        super().__init__(
+            f"Статья #{article_id}: ожидался статус {'/'.join(expected)}, текущий {actual or 'нет статьи'}"
+        )
+
+
+class IntegrityError(Exception):
+    """Пачка записей нарушает ограничения таблицы (например, статья уже удалена)"""
 
 
 class AsyncDatabase:
-    def __init__(self):
+    def __init__(self, cache: Optional[ArticleCache] = None):
         self.pool = None
+        self.cache = cache
 
-    async def connect(self):
+    async def connect(self, settings: Settings):
         self.pool = await asyncpg.create_pool(
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            host=os.getenv("DB_HOST"),
-            port=os.getenv("DB_PORT"),
-            database=os.getenv("DB_NAME")
+            user=settings.db_user,
+            password=settings.db_password,
+            host=settings.db_host,
+            port=settings.db_port,
+            database=settings.db_name,
+            min_size=settings.db_pool_min,
+            max_size=settings.db_pool_max
         )
 
+    async def close(self):
+        if self.pool:
+            await self.pool.close()
+
+    async def migrate(self):
+        """Создание и обновление схемы БД"""
+        await migrate(self.pool)
+
     async def add_article(self, user_id: int, file_path: str) -> int:
+        """Новый черновик; его текст - базовая ревизия 1"""
         async with self.pool.acquire() as conn:
-            return await conn.fetchval(
-                "INSERT INTO articles (user_id, file_path, status) VALUES ($1, $2, 'draft') RETURNING id",
-                user_id, file_path
-            )
+            async with conn.transaction():
+                article_id = await conn.fetchval(
+                    "INSERT INTO articles (user_id, file_path, status) VALUES ($1, $2, 'draft') RETURNING id",
+                    user_id, file_path
+                )
+                await conn.execute(
+                    "INSERT INTO article_revisions (article_id, revision, file_path) VALUES ($1, 1, $2)",
+                    article_id, file_path
+                )
+        return article_id
 
     async def get_article(self, article_id: int) -> dict:
+        if self.cache is not None:
+            cached = self.cache.get(("article", article_id))
+            if cached is not None:
+                return dict(cached)
+            version = self.cache.version()
         async with self.pool.acquire() as conn:
             article = await conn.fetchrow("SELECT * FROM articles WHERE id = $1", article_id)
-            return dict(article) if article else None
+        if not article:
+            return None
+        article = dict(article)
+        if self.cache is not None:
+            # параллельный transition мог уже положить более свежую строку
+            self.cache.put(("article", article_id), article, version=version)
+        return dict(article)
         
-    async def update_status(self, article_id: int, status: str):
+    async def transition(self, article_id: int, expected: Sequence[str], status: str, **fields) -> dict:
+        """Атомарная смена статуса с проверкой текущего, возвращает строку статьи.
+
+        Один запрос ``UPDATE ... WHERE status = ANY(expected) RETURNING *``
+        (asyncpg кэширует его как подготовленный). Допустимость перехода
+        дополнительно проверяет триггер ``articles_check_transition``.
+        """
+        self.invalidate(article_id)
+        columns = list(fields)
+        assignments = "".join(f", {column} = ${i}" for i, column in enumerate(columns, start=4))
+        async with self.pool.acquire() as conn:
+            try:
+                row = await conn.fetchrow(
+                    f"UPDATE articles SET status = $3{assignments} "
+                    "WHERE id = $1 AND status = ANY($2::text[]) RETURNING *",
+                    article_id, list(expected), status, *fields.values()
+                )
+            except asyncpg.RaiseError as e:
+                raise TransitionError(article_id, expected, None) from e
+            if row is None:
+                actual = await conn.fetchval("SELECT status FROM articles WHERE id = $1", article_id)
+                raise TransitionError(article_id, expected, actual)
+        article = dict(row)
+        if self.cache is not None:
+            self.cache.put(("article", article_id), article)
+        return dict(article)
+
+    async def submit_for_review(self, article_id: int, revision: Optional[int] = None) -> dict:
+        """Отправка на ревью; ``revision`` запоминается как последняя показанная редакторам"""
+        if revision is None:
+            return await self.transition(article_id, ["draft"], "review")
+        return await self.transition(article_id, ["draft"], "review", reviewed_revision=revision)
+
+    async def approve(self, article_id: int, reviewer_id: int, payload: Optional[bytes] = None) -> dict:
+        """Одобрение с сохранением зашифрованных кусков для публикации"""
+        return await self.transition(
+            article_id, ["review"], "approved",
+            reviewer_id=reviewer_id, payload=payload, sent_chunks=0, publish_attempts=0
+        )
+
+    async def reject(self, article_id: int, reviewer_id: int) -> dict:
+        return await self.transition(article_id, ["review"], "rejected", reviewer_id=reviewer_id)
+
+    async def return_to_draft(self, article_id: int) -> dict:
+        return await self.transition(article_id, ["review"], "draft")
+
+    async def delete_article(self, article_id: int) -> Optional[int]:
+        """Удаление статьи из БД, возвращает id автора"""
+        self.invalidate(article_id)
+        async with self.pool.acquire() as conn:
+            return await conn.fetchval("DELETE FROM articles WHERE id = $1 RETURNING user_id", article_id)
+
+    async def get_drafts_page(self, user_id: int, limit: int, after: Optional[tuple] = None,
+                              before: Optional[tuple] = None) -> List[dict]:
+        """Страница черновиков по курсору ``(created_at, id)``, от новых к старым.
+
+        ``after`` - строки старше курсора, ``before`` - новее. Возвращает до
+        ``limit + 1`` строк, лишняя означает, что в этом направлении есть еще.
+        Запрос покрывается индексом ``ix_articles_user_drafts``.
+        """
+        async with self.pool.acquire() as conn:
+            if before is not None:
+                rows = await conn.fetch(
+                    "SELECT id, created_at FROM articles "
+                    "WHERE user_id = $1 AND status = 'draft' AND (created_at, id) > ($2, $3) "
+                    "ORDER BY created_at, id LIMIT $4",
+                    user_id, before[0], before[1], limit + 1
+                )
+            elif after is not None:
+                rows = await conn.fetch(
+                    "SELECT id, created_at FROM articles "
+                    "WHERE user_id = $1 AND status = 'draft' AND (created_at, id) < ($2, $3) "
+                    "ORDER BY created_at DESC, id DESC LIMIT $4",
+                    user_id, after[0], after[1], limit + 1
+                )
+            else:
+                rows = await conn.fetch(
+                    "SELECT id, created_at FROM articles "
+                    "WHERE user_id = $1 AND status = 'draft' "
+                    "ORDER BY created_at DESC, id DESC LIMIT $2",
+                    user_id, limit + 1
+                )
+        return [dict(row) for row in rows]
+
+    async def schedule_article(self, article_id: int, publish_time: datetime) -> bool:
+        """Перевод одобренной статьи в отложенную публикацию"""
+        self.invalidate(article_id)
+        async with self.pool.acquire() as conn:
+            result = await conn.execute(
+                "UPDATE articles SET status = 'scheduled', publish_time = $2 "
+                "WHERE id = $1 AND status IN ('approved', 'scheduled')",
+                article_id, publish_time
+            )
+        return result != "UPDATE 0"
+
+    async def get_scheduled(self) -> List[dict]:
+        """Все ожидающие публикации (по частичному индексу)"""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT id, publish_time FROM articles "
+                "WHERE status = 'scheduled' ORDER BY publish_time"
+            )
+        return [dict(row) for row in rows]
+
+    async def claim_due_articles(self, now: datetime, limit: int) -> Dict[int, int]:
+        """Захват наступивших публикаций; параллельные процессы их пропускают.
+
+        Возвращает id статьи -> номер попытки: он однозначно определяет захват
+        и передается в ``save_sent_chunks``, ``mark_published`` и ``reschedule_articles``.
+        """
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                UPDATE articles
+                SET status = 'publishing', claimed_at = $1, publish_attempts = publish_attempts + 1
+                WHERE id IN (
+                    SELECT id FROM articles
+                    WHERE status = 'scheduled' AND publish_time <= $1
+                    ORDER BY publish_time
+                    LIMIT $2
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, publish_attempts
+                """,
+                now, limit
+            )
+        claims = {row['id']: row['publish_attempts'] for row in rows}
+        for article_id in claims:
+            self.invalidate(article_id)
+        return claims
+
+    async def claim_article(self, article_id: int, now: datetime) -> int:
+        """Захват одобренной статьи для ручной публикации, возвращает номер попытки.
+
+        Попытка засчитывается как и при захвате планировщиком: зависшая ручная
+        публикация по истечении аренды дописывается планировщиком, а не заново.
+        """
+        self.invalidate(article_id)
+        async with self.pool.acquire() as conn:
+            try:
+                attempt = await conn.fetchval(
+                    "UPDATE articles SET status = 'publishing', claimed_at = $2, "
+                    "publish_attempts = publish_attempts + 1 "
+                    "WHERE id = $1 AND status = 'approved' RETURNING publish_attempts",
+                    article_id, now
+                )
+            except asyncpg.RaiseError as e:
+                raise TransitionError(article_id, ["approved"], None) from e
+            if attempt is None:
+                actual = await conn.fetchval("SELECT status FROM articles WHERE id = $1", article_id)
+                raise TransitionError(article_id, ["approved"], actual)
+        return attempt
+
+    async def save_sent_chunks(self, article_id: int, attempt: int, count: int, now: datetime) -> bool:
+        """Число отправленных кусков публикации; заодно продлевает аренду.
+
+        False - захват ``attempt`` потерян (аренда истекла, статью взял другой процесс).
+        """
+        self.invalidate(article_id)
+        async with self.pool.acquire() as conn:
+            status = await conn.execute(
+                "UPDATE articles SET sent_chunks = $3, claimed_at = $4 "
+                "WHERE id = $1 AND status = 'publishing' AND publish_attempts = $2",
+                article_id, attempt, count, now
+            )
+        return status != "UPDATE 0"
+
+    async def mark_published(self, claims: Dict[int, int]) -> List[int]:
+        """Завершение публикаций, возвращает отмеченные.
+
+        Статья отмечается, только если ее захват ``claims[id]`` еще действует.
+        """
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                "UPDATE articles SET status = 'published', payload = NULL, claimed_at = NULL, sent_chunks = 0 "
+                "FROM unnest($1::int[], $2::int[]) AS c(id, attempt) "
+                "WHERE articles.id = c.id AND articles.status = 'publishing' "
+                "AND articles.publish_attempts = c.attempt RETURNING articles.id",
+                list(claims), list(claims.values())
+            )
+        for article_id in claims:
+            self.invalidate(article_id)
+        return [row['id'] for row in rows]
+
+    async def reschedule_articles(self, claims: Dict[int, int], publish_time: datetime,
+                                  max_attempts: int) -> Dict[int, str]:
+        """Повтор неудавшихся публикаций, возвращает id -> новый статус.
+
+        Статьи, исчерпавшие ``max_attempts`` попыток, возвращаются в одобренные.
+        Статьи с потерянным захватом не трогаются и в результат не попадают.
+        """
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                "UPDATE articles SET publish_time = $3, claimed_at = NULL, "
+                "status = CASE WHEN publish_attempts >= $4 THEN 'approved' ELSE 'scheduled' END "
+                "FROM unnest($1::int[], $2::int[]) AS c(id, attempt) "
+                "WHERE articles.id = c.id AND articles.status = 'publishing' "
+                "AND articles.publish_attempts = c.attempt RETURNING articles.id, articles.status",
+                list(claims), list(claims.values()), publish_time, max_attempts
+            )
+        for article_id in claims:
+            self.invalidate(article_id)
+        return {row['id']: row['status'] for row in rows}
+
+    async def release_stale_claims(self, claimed_before: datetime, publish_time: datetime,
+                                   max_attempts: int) -> List[int]:
+        """Возврат публикаций с истекшей арендой (процесс упал), возвращает перенесенные.
+
+        Запрос покрывается индексом ``ix_articles_publishing_claimed_at``.
+        """
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                "UPDATE articles SET publish_time = $2, claimed_at = NULL, "
+                "status = CASE WHEN publish_attempts >= $3 THEN 'approved' ELSE 'scheduled' END "
+                "WHERE status = 'publishing' AND claimed_at < $1 RETURNING id, status",
+                claimed_before, publish_time, max_attempts
+            )
+        for row in rows:
+            self.invalidate(row['id'])
+        return [row['id'] for row in rows if row['status'] == 'scheduled']
+
+    async def get_file_id(self, article_id: int, content_hash: str) -> Optional[str]:
+        """file_id Telegram для загруженной версии файла статьи"""
+        async with self.pool.acquire() as conn:
+            return await conn.fetchval(
+                "SELECT file_id FROM telegram_files WHERE article_id = $1 AND content_hash = $2",
+                article_id, content_hash
+            )
+
+    async def save_file_id(self, article_id: int, content_hash: str, file_id: str):
+        """Запоминание file_id; записи прежних версий файла удаляются"""
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    "DELETE FROM telegram_files WHERE article_id = $1 AND content_hash <> $2",
+                    article_id, content_hash
+                )
+                await conn.execute(
+                    "INSERT INTO telegram_files (article_id, content_hash, file_id) VALUES ($1, $2, $3) "
+                    "ON CONFLICT (article_id, content_hash) DO UPDATE SET file_id = EXCLUDED.file_id",
+                    article_id, content_hash, file_id
+                )
+
+    async def save_revision(self, article_id: int, revision: int, file_path: str,
+                            delta: Optional[bytes], size: int) -> dict:
+        """Новая ревизия черновика: база (``delta is None``) или дельта к предыдущей.
+
+        ``size`` - байт в хранилище: зашифрованный объект базы или дельта.
+        Текущий текст статьи переключается на ``file_path``. Ревизия должна
+        быть следующей по номеру, иначе параллельная правка уже сохранена.
+        """
+        self.invalidate(article_id)
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                row = await conn.fetchrow(
+                    "UPDATE articles SET file_path = $2, revision = $3 "
+                    "WHERE id = $1 AND revision = $3 - 1 AND status = 'draft' RETURNING *",
+                    article_id, file_path, revision
+                )
+                if row is None:
+                    actual = await conn.fetchval("SELECT status FROM articles WHERE id = $1", article_id)
+                    raise TransitionError(article_id, ["draft"], actual)
+                await conn.execute(
+                    "INSERT INTO article_revisions (article_id, revision, file_path, delta, size) "
+                    "VALUES ($1, $2, $3, $4, $5)",
+                    article_id, revision, file_path if delta is None else None, delta, size
+                )
+        return dict(row)
+
+    async def get_revision_chain(self, article_id: int, revision: int) -> List[dict]:
+        """Ближайшая к ``revision`` база и все дельты после нее по порядку"""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT revision, file_path, delta FROM article_revisions
+                WHERE article_id = $1 AND revision <= $2 AND revision >= (
+                    SELECT max(revision) FROM article_revisions
+                    WHERE article_id = $1 AND revision <= $2 AND file_path IS NOT NULL
+                )
+                ORDER BY revision
+                """,
+                article_id, revision
+            )
+        return [dict(row) for row in rows]
+
+    async def referenced_names(self, names: List[str]) -> Set[str]:
+        """Имена файлов из ``names``, на которые ссылаются статьи и их ревизии.
+
+        Сравниваются имена, а не пути целиком, поэтому ответ не зависит от
+        того, как записан ``VAULT_PATH``. Запрос покрывается индексами
+        ``ix_articles_file_name`` и ``ix_article_revisions_file_name``.
+        """
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT regexp_replace(file_path, '^.*/', '') AS name FROM articles "
+                "WHERE regexp_replace(file_path, '^.*/', '') = ANY($1::text[]) "
+                "UNION SELECT regexp_replace(file_path, '^.*/', '') FROM article_revisions "
+                "WHERE file_path IS NOT NULL AND regexp_replace(file_path, '^.*/', '') = ANY($1::text[])",
+                names
+            )
+        return {row['name'] for row in rows}
+
+    async def sample_file_paths(self, limit: int) -> List[str]:
+        """Несколько путей файлов живых статей для проверки хранилища"""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT file_path FROM articles WHERE file_path IS NOT NULL ORDER BY id DESC LIMIT $1", limit
+            )
+        return [row['file_path'] for row in rows]
+
+    async def update_search_terms(self, article_id: int, user_id: int, revision: int,
+                                  added: List[bytes], removed: List[bytes]) -> bool:
+        """Изменения поискового индекса статьи между соседними ревизиями.
+
+        Применяются, только если индекс построен по ревизии ``revision - 1``;
+        иначе возвращает False и индекс нужно пересобрать целиком.
+        """
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                indexed = await conn.fetchval(
+                    "SELECT search_revision FROM articles WHERE id = $1 FOR UPDATE", article_id
+                )
+                if indexed != revision - 1:
+                    return False
+                await conn.execute(
+                    "DELETE FROM search_terms WHERE user_id = $1 AND article_id = $2 AND token = ANY($3::bytea[])",
+                    user_id, article_id, removed
+                )
+                await conn.execute(
+                    "INSERT INTO search_terms (user_id, token, article_id) "
+                    "SELECT $1, token, $2 FROM unnest($3::bytea[]) AS token ON CONFLICT DO NOTHING",
+                    user_id, article_id, added
+                )
+                await conn.execute("UPDATE articles SET search_revision = $2 WHERE id = $1", article_id, revision)
+        return True
+
+    async def replace_search_terms(self, article_id: int, user_id: int, revision: int,
+                                   tokens: List[bytes]) -> Set[bytes]:
+        """Полная пересборка индекса статьи, возвращает удаленные токены.
+
+        Индекс более новой ревизии не перезаписывается.
+        """
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                row = await conn.fetchrow(
+                    "SELECT search_revision FROM articles WHERE id = $1 FOR UPDATE", article_id
+                )
+                if row is None or (row['search_revision'] or 0) > revision:
+                    return set()
+                removed = await conn.fetch(
+                    "DELETE FROM search_terms WHERE article_id = $1 RETURNING token", article_id
+                )
+                await conn.execute(
+                    "INSERT INTO search_terms (user_id, token, article_id) "
+                    "SELECT $1, token, $2 FROM unnest($3::bytea[]) AS token",
+                    user_id, article_id, tokens
+                )
+                await conn.execute("UPDATE articles SET search_revision = $2 WHERE id = $1", article_id, revision)
+        return {bytes(row['token']) for row in removed}
+
+    async def search_postings(self, user_id: int, tokens: List[bytes]) -> Dict[bytes, List[int]]:
+        """Статьи автора для каждого из токенов"""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT token, array_agg(article_id) AS ids FROM search_terms "
+                "WHERE user_id = $1 AND token = ANY($2::bytea[]) GROUP BY token",
+                user_id, tokens
+            )
+        return {bytes(row['token']): list(row['ids']) for row in rows}
+
+    async def get_user_drafts(self, user_id: int, article_ids: List[int], limit: int) -> List[dict]:
+        """Черновики автора из ``article_ids``, от новых к старым"""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT id, created_at FROM articles "
+                "WHERE user_id = $1 AND id = ANY($2::int[]) AND status = 'draft' "
+                "ORDER BY created_at DESC, id DESC LIMIT $3",
+                user_id, article_ids, limit
+            )
+        return [dict(row) for row in rows]
+
+    async def search_backlog(self, after: int, limit: int) -> List[dict]:
+        """Статьи после ``after``, чей поисковый индекс отстает от текущей ревизии"""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT id, user_id, file_path, revision FROM articles "
+                "WHERE id > $1 AND file_path IS NOT NULL AND search_revision IS DISTINCT FROM revision "
+                "ORDER BY id LIMIT $2",
+                after, limit
+            )
+        return [dict(row) for row in rows]
+
+    @asynccontextmanager
+    async def advisory_lock(self, lock_id: int) -> AsyncIterator[bool]:
+        """Сессионная advisory-блокировка на время блока; False - ее держит другой процесс"""
+        async with self.pool.acquire() as conn:
+            locked = await conn.fetchval("SELECT pg_try_advisory_lock($1)", lock_id)
+            try:
+                yield locked
+            finally:
+                if locked:
+                    await conn.execute("SELECT pg_advisory_unlock($1)", lock_id)
+
+    async def pin_mac_key(self, fingerprint: str) -> str:
+        """Отпечаток ключа HMAC из БД; при первом запуске сохраняется ``fingerprint``"""
         async with self.pool.acquire() as conn:
             await conn.execute(
-                "UPDATE articles SET status = $1 WHERE id = $2",
-                status, article_id
+                "INSERT INTO mac_key (fingerprint) VALUES ($1) ON CONFLICT (id) DO NOTHING", fingerprint
             )
-        
-    async def delete_article(self, article_id: int):
-        """Удаление статьи из БД"""
+            return await conn.fetchval("SELECT fingerprint FROM mac_key")
+
+    async def get_rotation(self, key_id: str) -> Optional[dict]:
+        """Контрольная точка перешифрования ключом ``key_id``"""
         async with self.pool.acquire() as conn:
-            await conn.execute("DELETE FROM articles WHERE id = $1", article_id)
+            row = await conn.fetchrow("SELECT * FROM key_rotations WHERE key_id = $1", key_id)
+        return dict(row) if row else None
 
-    async def log_review(self, article_id: int, comment: str):
-        """Логирование комментариев ревьюера"""
+    async def save_rotation(self, key_id: str, stage: str, cursor: str, done: bool = False):
         async with self.pool.acquire() as conn:
             await conn.execute(
-                "INSERT INTO review_comments (article_id, comment) VALUES ($1, $2)",
-                article_id, comment
-        )
-            
\ No newline at end of file
+                "INSERT INTO key_rotations (key_id, stage, cursor, done) VALUES ($1, $2, $3, $4) "
+                "ON CONFLICT (key_id) DO UPDATE SET stage = EXCLUDED.stage, cursor = EXCLUDED.cursor, "
+                "done = EXCLUDED.done, updated_at = now()",
+                key_id, stage, cursor, done
+            )
+
+    async def rotation_files(self, after: str, limit: int) -> List[str]:
+        """Пути файлов статей и ревизий по порядку, после ``after``.
+
+        Каждая таблица отдает не больше ``limit`` строк по своему индексу по
+        ``file_path``, так что пачка не сортирует все оставшиеся строки.
+        """
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT DISTINCT file_path FROM (
+                    (SELECT file_path FROM articles WHERE file_path > $1 ORDER BY file_path LIMIT $2)
+                    UNION ALL
+                    (SELECT file_path FROM article_revisions WHERE file_path > $1 ORDER BY file_path LIMIT $2)
+                ) AS batch
+                ORDER BY file_path LIMIT $2
+                """,
+                after, limit
+            )
+        return [row['file_path'] for row in rows]
+
+    async def rotation_payloads(self, after: int, limit: int) -> List[dict]:
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT id, payload FROM articles WHERE id > $1 AND payload IS NOT NULL ORDER BY id LIMIT $2",
+                after, limit
+            )
+        return [dict(row) for row in rows]
+
+    async def replace_payload(self, article_id: int, old: bytes, new: bytes):
+        """Замена токена публикации, если его не изменили параллельно"""
+        self.invalidate(article_id)
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                "UPDATE articles SET payload = $3 WHERE id = $1 AND payload = $2", article_id, old, new
+            )
+
+    async def rotation_deltas(self, after: tuple, limit: int) -> List[dict]:
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT article_id, revision, delta FROM article_revisions "
+                "WHERE (article_id, revision) > ($1, $2) AND delta IS NOT NULL "
+                "ORDER BY article_id, revision LIMIT $3",
+                after[0], after[1], limit
+            )
+        return [dict(row) for row in rows]
+
+    async def replace_delta(self, article_id: int, revision: int, old: bytes, new: bytes):
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                "UPDATE article_revisions SET delta = $4 WHERE article_id = $1 AND revision = $2 AND delta = $3",
+                article_id, revision, old, new
+            )
+
+    def invalidate(self, article_id: int):
+        """Сброс строки статьи в кэше (в том числе по уведомлению ArticleChanges)"""
+        if self.cache is not None:
+            self.cache.invalidate(("article", article_id))
+
+    async def get_stats(self, user_id: int) -> dict:
+        """Счетчики автора и всей редакции одним запросом"""
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow(
+                """
+                SELECT
+                    (SELECT coalesce(json_object_agg(status, count), '{}') FROM article_status_counts
+                     WHERE user_id = $1) AS user_counts,
+                    (SELECT coalesce(json_object_agg(status, count), '{}') FROM article_status_counts
+                     WHERE user_id = 0) AS total_counts,
+                    (SELECT total_seconds / NULLIF(reviews, 0) FROM review_turnaround
+                     WHERE user_id = $1) AS user_turnaround,
+                    (SELECT total_seconds / NULLIF(reviews, 0) FROM review_turnaround
+                     WHERE user_id = 0) AS total_turnaround,
+                    coalesce((SELECT count FROM publish_daily
+                     WHERE user_id = $1 AND day = current_date), 0) AS user_today,
+                    coalesce((SELECT count FROM publish_daily
+                     WHERE user_id = 0 AND day = current_date), 0) AS total_today,
+                    coalesce((SELECT sum(count) / 30.0 FROM publish_daily
+                     WHERE user_id = 0 AND day > current_date - 30), 0) AS daily_avg
+                """,
+                user_id
+            )
+        stats = dict(row)
+        stats['user_counts'] = json.loads(stats['user_counts'])
+        stats['total_counts'] = json.loads(stats['total_counts'])
+        stats['daily_avg'] = float(stats['daily_avg'])
+        return stats
+
+    async def copy_records(self, table: str, columns: Sequence[str], records: List[tuple]):
+        """Пакетная вставка через COPY"""
+        async with self.pool.acquire() as conn:
+            try:
+                await conn.copy_records_to_table(table, records=records, columns=list(columns))
+            except asyncpg.IntegrityConstraintViolationError as e:
+                raise IntegrityError(str(e)) from e
+
+    async def insert_records(self, table: str, columns: Sequence[str], records: List[tuple]) -> List[tuple]:
+        """Вставка по одной записи в одной транзакции, возвращает нарушившие ограничения"""
+        placeholders = ", ".join(f"${i}" for i in range(1, len(columns) + 1))
+        query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+        rejected = []
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                for record in records:
+                    try:
+                        async with conn.transaction():
+                            await conn.execute(query, *record)
+                    except asyncpg.IntegrityConstraintViolationError:
+                        rejected.append(record)
+        return rejected
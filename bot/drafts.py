@@ -0,0 +1,58 @@
+from typing import Optional, Tuple
+
+from aiogram.types import InlineKeyboardMarkup
+
+from cache import ArticleCache
+from callbacks import decode_cursor, encode_cursor
+from database import AsyncDatabase
+from keyboards import Keyboards
+
+
+class DraftsBrowser:
+    """Список черновиков автора с пагинацией по курсору.
+
+    Готовые страницы кэшируются; ключ включает версию списка автора, так что
+    ``invalidate`` просто увеличивает версию, а старые страницы вытесняются LRU.
+    """
+
+    def __init__(self, db: AsyncDatabase, page_size: int = 5, cache: Optional[ArticleCache] = None):
+        self.db = db
+        self.page_size = page_size
+        self.cache = cache or ArticleCache(max_bytes=2 * 1024 * 1024, ttl=300)
+        self._versions = {}
+
+    def invalidate(self, user_id: int):
+        """Сброс страниц после изменения черновиков автора"""
+        self._versions[user_id] = self._versions.get(user_id, 0) + 1
+
+    async def page(self, user_id: int, direction: Optional[str] = None,
+                   cursor: Optional[str] = None) -> Tuple[str, InlineKeyboardMarkup]:
+        """Текст и клавиатура страницы; ``cursor`` - из ``PageCallback``"""
+        key = ("drafts", user_id, self._versions.get(user_id, 0), direction, cursor)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        position = decode_cursor(cursor) if cursor else None
+        rows = await self.db.get_drafts_page(
+            user_id,
+            self.page_size,
+            after=position if direction == "n" else None,
+            before=position if direction == "p" else None
+        )
+        more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if direction == "p":
+            rows.reverse()
+            has_newer, has_older = more, True
+        else:
+            has_newer, has_older = position is not None, more
+
+        if not rows:
+            result = ("📚 Черновиков нет", Keyboards.pagination("d", None, None))
+        else:
+            prev_cursor = encode_cursor(rows[0]['created_at'], rows[0]['id']) if has_newer else None
+            next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id']) if has_older else None
+            result = ("📚 Ваши черновики:", Keyboards.drafts_page(rows, prev_cursor, next_cursor))
+        self.cache.put(key, result)
+        return result
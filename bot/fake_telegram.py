@@ -0,0 +1,208 @@
+"""Локальная заглушка Telegram Bot API для прогонов без сети.
+
+Бот подключается к ней через ``TELEGRAM_API_URL=http://127.0.0.1:<port>``.
+Заглушка отвечает на методы Bot API, запоминает отправленные запросы и
+доставляет обновления либо в webhook бота (с секретным токеном), либо через
+``getUpdates`` при long polling.
+"""
+import json
+import time
+import asyncio
+import itertools
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+from aiohttp import web
+
+from webhook import SECRET_HEADER
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "news_bot", "username": "news_bot"}
+
+
+class FakeTelegram:
+    """Заглушка Bot API"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8081, latency: float = 0.0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.calls: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self.webhook_url: Optional[str] = None
+        self.webhook_secret: Optional[str] = None
+        self._updates: asyncio.Queue = asyncio.Queue()
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._flood: Optional[int] = None
+        self._waiters: List[Tuple[str, Callable[[Dict[str, Any]], bool], asyncio.Future]] = []
+        self._runner: Optional[web.AppRunner] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_route("*", "/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self._session = aiohttp.ClientSession()
+
+    async def stop(self):
+        if self._session:
+            await self._session.close()
+        if self._runner:
+            await self._runner.cleanup()
+
+    def expect(self, method: str, predicate: Callable[[Dict[str, Any]], bool]) -> asyncio.Future:
+        """Future, который завершится параметрами первого подходящего вызова.
+
+        Ожидание нужно зарегистрировать до отправки обновления.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((method, predicate, future))
+        return future
+
+    def _notify(self, method: str, params: Dict[str, Any]):
+        for waiter in list(self._waiters):
+            waiter_method, predicate, future = waiter
+            if future.done():
+                self._waiters.remove(waiter)
+            elif waiter_method == method and predicate(params):
+                future.set_result(params)
+                self._waiters.remove(waiter)
+                return
+
+    def inject_flood(self, retry_after: int = 1):
+        """Следующий запрос получит 429 с retry_after"""
+        self._flood = retry_after
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = await self._params(request)
+        self.calls[method].append(params)
+        self._notify(method, params)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self._flood is not None and method != "getUpdates":
+            retry_after, self._flood = self._flood, None
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {retry_after}",
+                "parameters": {"retry_after": retry_after},
+            })
+        handler = getattr(self, f"_api_{method}", None)
+        result = await handler(params) if handler else True
+        return web.json_response({"ok": True, "result": result})
+
+    @staticmethod
+    async def _params(request: web.Request) -> Dict[str, Any]:
+        if request.content_type == "application/json":
+            return await request.json()
+        params = {}
+        for key, value in (await request.post()).items():
+            if isinstance(value, str):
+                try:
+                    value = json.loads(value)
+                except ValueError:
+                    pass
+            else:
+                value = {"filename": value.filename, "size": len(value.file.read())}
+            params[key] = value
+        return params
+
+    def _message(self, params: Dict[str, Any], **extra) -> Dict[str, Any]:
+        chat_id = int(params.get("chat_id", 0))
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "channel" if chat_id < 0 else "private"},
+            "from": BOT_USER,
+            **extra,
+        }
+
+    async def _api_getMe(self, params):
+        return BOT_USER
+
+    async def _api_sendMessage(self, params):
+        return self._message(params, text=params.get("text", ""))
+
+    async def _api_editMessageText(self, params):
+        return self._message(params, text=params.get("text", ""))
+
+    async def _api_sendDocument(self, params):
+        document = params.get("document")
+        file_id = document if isinstance(document, str) else f"file_{next(self._message_ids)}"
+        return self._message(params, caption=params.get("caption"), document={
+            "file_id": file_id,
+            "file_unique_id": file_id,
+        })
+
+    async def _api_setWebhook(self, params):
+        self.webhook_url = params.get("url")
+        self.webhook_secret = params.get("secret_token")
+        return True
+
+    async def _api_deleteWebhook(self, params):
+        self.webhook_url = None
+        return True
+
+    async def _api_getUpdates(self, params):
+        timeout = float(params.get("timeout") or 0)
+        updates = []
+        try:
+            updates.append(await asyncio.wait_for(self._updates.get(), timeout=timeout or 0.01))
+        except asyncio.TimeoutError:
+            return []
+        while not self._updates.empty():
+            updates.append(self._updates.get_nowait())
+        return updates
+
+    def message_update(self, user_id: int, text: str, chat_id: Optional[int] = None) -> Dict[str, Any]:
+        """Обновление с текстовым сообщением пользователя"""
+        user = {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+        return {
+            "update_id": next(self._update_ids),
+            "message": {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": chat_id or user_id, "type": "private"},
+                "from": user,
+                "text": text,
+            },
+        }
+
+    def callback_update(self, user_id: int, data: str, chat_id: Optional[int] = None) -> Dict[str, Any]:
+        """Обновление с нажатием inline-кнопки"""
+        user = {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+        return {
+            "update_id": next(self._update_ids),
+            "callback_query": {
+                "id": str(next(self._update_ids)),
+                "from": user,
+                "chat_instance": str(chat_id or user_id),
+                "data": data,
+                "message": {
+                    "message_id": next(self._message_ids),
+                    "date": int(time.time()),
+                    "chat": {"id": chat_id or user_id, "type": "private"},
+                    "from": BOT_USER,
+                    "text": "",
+                },
+            },
+        }
+
+    async def push_update(self, update: Dict[str, Any]) -> int:
+        """Доставка обновления: в webhook, если он задан, иначе в getUpdates.
+
+        Возвращает HTTP-статус ответа webhook (200 для getUpdates).
+        """
+        if not self.webhook_url:
+            await self._updates.put(update)
+            return 200
+        headers = {SECRET_HEADER: self.webhook_secret} if self.webhook_secret else {}
+        async with self._session.post(self.webhook_url, json=update, headers=headers) as response:
+            return response.status
@@ -1,6 +1,9 @@
+from typing import List, Optional
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder, ReplyKeyboardBuilder
 
+from callbacks import ArticleAction, ArticleCallback, ConfirmCallback, PageCallback
+
 
 class Keyboards:
     """Класс для генерации всех клавиатур бота"""
@@ -20,9 +23,9 @@ class Keyboards:
     def editor_keyboard(article_id: int) -> InlineKeyboardMarkup:
         """Клавиатура автора статьи"""
         builder = InlineKeyboardBuilder()
-        builder.button(text="✏️ Редактировать", callback_data=f"edit_{article_id}")
-        builder.button(text="📤 На ревью", callback_data=f"review_{article_id}")
-        builder.button(text="🗑 Удалить", callback_data=f"delete_{article_id}")
+        builder.button(text="✏️ Редактировать", callback_data=ArticleCallback(action=ArticleAction.EDIT, article_id=article_id))
+        builder.button(text="📤 На ревью", callback_data=ArticleCallback(action=ArticleAction.REVIEW, article_id=article_id))
+        builder.button(text="🗑 Удалить", callback_data=ArticleCallback(action=ArticleAction.DELETE, article_id=article_id))
         builder.adjust(2, 1)
         return builder.as_markup()
 
@@ -30,10 +33,10 @@ class Keyboards:
     def reviewer_keyboard(article_id: int) -> InlineKeyboardMarkup:
         """Клавиатура ревьюера"""
         builder = InlineKeyboardBuilder()
-        builder.button(text="✅ Одобрить", callback_data=f"approve_{article_id}")
-        builder.button(text="❌ Отклонить", callback_data=f"reject_{article_id}")
-        builder.button(text="✏️ Правки", callback_data=f"request_changes_{article_id}")
-        builder.button(text="💬 Комментарий", callback_data=f"comment_{article_id}")
+        builder.button(text="✅ Одобрить", callback_data=ArticleCallback(action=ArticleAction.APPROVE, article_id=article_id))
+        builder.button(text="❌ Отклонить", callback_data=ArticleCallback(action=ArticleAction.REJECT, article_id=article_id))
+        builder.button(text="✏️ Правки", callback_data=ArticleCallback(action=ArticleAction.REQUEST_CHANGES, article_id=article_id))
+        builder.button(text="💬 Комментарий", callback_data=ArticleCallback(action=ArticleAction.COMMENT, article_id=article_id))
         builder.adjust(2, 2)
         return builder.as_markup()
 
@@ -41,8 +44,8 @@ class Keyboards:
     def publish_keyboard(article_id: int) -> InlineKeyboardMarkup:
         """Клавиатура публикации"""
         builder = InlineKeyboardBuilder()
-        builder.button(text="🚀 Опубликовать", callback_data=f"publish_{article_id}")
-        builder.button(text="⏰ Запланировать", callback_data=f"schedule_{article_id}")
+        builder.button(text="🚀 Опубликовать", callback_data=ArticleCallback(action=ArticleAction.PUBLISH, article_id=article_id))
+        builder.button(text="⏰ Запланировать", callback_data=ArticleCallback(action=ArticleAction.SCHEDULE, article_id=article_id))
         builder.button(text="🔙 Назад", callback_data="back_to_review")
         builder.adjust(2, 1)
         return builder.as_markup()
@@ -58,7 +61,7 @@ class Keyboards:
     def confirmation_keyboard(action: str, item_id: int) -> InlineKeyboardMarkup:
         """Клавиатура подтверждения действий"""
         builder = InlineKeyboardBuilder()
-        builder.button(text="✅ Подтвердить", callback_data=f"confirm_{action}_{item_id}")
+        builder.button(text="✅ Подтвердить", callback_data=ConfirmCallback(action=action, item_id=item_id))
         builder.button(text="❌ Отменить", callback_data="cancel_action")
         return builder.as_markup()
 
@@ -74,11 +77,30 @@ class Keyboards:
         return builder.as_markup()
 
     @staticmethod
-    def pagination(page: int, total_pages: int, prefix: str) -> InlineKeyboardMarkup:
-        """Клавиатура пагинации"""
-        builder = InlineKeyboardBuilder()
-        builder.button(text="⬅️", callback_data=f"{prefix}_prev_{page}")
-        builder.button(text=f"{page}/{total_pages}", callback_data="current_page")
-        builder.button(text="➡️", callback_data=f"{prefix}_next_{page}")
+    def pagination(kind: str, prev_cursor: Optional[str], next_cursor: Optional[str],
+                   builder: Optional[InlineKeyboardBuilder] = None) -> InlineKeyboardMarkup:
+        """Клавиатура пагинации по курсору"""
+        builder = builder or InlineKeyboardBuilder()
+        nav = []
+        if prev_cursor:
+            nav.append(InlineKeyboardButton(
+                text="⬅️", callback_data=PageCallback(kind=kind, direction="p", cursor=prev_cursor).pack()
+            ))
+        if next_cursor:
+            nav.append(InlineKeyboardButton(
+                text="➡️", callback_data=PageCallback(kind=kind, direction="n", cursor=next_cursor).pack()
+            ))
+        if nav:
+            builder.row(*nav)
         return builder.as_markup()
-    
\ No newline at end of file
+
+    @staticmethod
+    def drafts_page(drafts: List[dict], prev_cursor: Optional[str], next_cursor: Optional[str]) -> InlineKeyboardMarkup:
+        """Список черновиков с пагинацией"""
+        builder = InlineKeyboardBuilder()
+        for draft in drafts:
+            builder.row(InlineKeyboardButton(
+                text=f"📝 #{draft['id']} от {draft['created_at']:%d.%m.%Y %H:%M}",
+                callback_data=ArticleCallback(action=ArticleAction.OPEN, article_id=draft['id']).pack()
+            ))
+        return Keyboards.pagination("d", prev_cursor, next_cursor, builder)
@@ -1,20 +1,135 @@
+import json
+import time
+import queue
 import logging
+import threading
+import contextvars
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, Optional, Tuple
 
+from aiogram import BaseMiddleware
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("bot.log"),
-        logging.StreamHandler()
-    ]
-)
-logger = logging.getLogger(__name__)
-
-async def log_review(self, article_id: int, comment: str):
-    """Логирование комментариев ревьюера"""
-    async with self.pool.acquire() as conn:
-        await conn.execute(
-            "INSERT INTO review_comments (article_id, comment) VALUES ($1, $2)",
-            article_id, comment
-        )
+correlation_id: contextvars.ContextVar[str] = contextvars.ContextVar("correlation_id", default="-")
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на запись"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "correlation_id": getattr(record, "correlation_id", "-"),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class CorrelationFilter(logging.Filter):
+    """Добавляет к записи id текущего обновления"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.correlation_id = correlation_id.get()
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """Ограничение повторяющихся предупреждений и ошибок.
+
+    Записи из одного места кода (файл и строка) уровня WARNING и выше
+    пропускаются не чаще ``burst`` раз за ``period`` секунд; число
+    подавленных добавляется к следующей пропущенной записи.
+    """
+
+    def __init__(self, burst: int = 10, period: float = 60.0):
+        super().__init__()
+        self.burst = burst
+        self.period = period
+        self._windows: Dict[Tuple[str, int], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.period:
+                suppressed = window[2] if window else 0
+                self._windows[key] = [now, 1, 0]
+                if suppressed:
+                    record.msg = f"{record.msg} (подавлено повторов: {suppressed})"
+                return True
+            if window[1] < self.burst:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+
+class SizeAndTimeRotatingFileHandler(RotatingFileHandler):
+    """Ротация по размеру файла и по времени (каждые ``interval`` секунд)"""
+
+    def __init__(self, filename: str, max_bytes: int, backup_count: int, interval: float, **kwargs):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", **kwargs)
+        self.interval = interval
+        self.rollover_at = time.time() + interval
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.interval and time.time() >= self.rollover_at:
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self):
+        super().doRollover()
+        self.rollover_at = time.time() + self.interval
+
+
+class CorrelationMiddleware(BaseMiddleware):
+    """Outer-middleware обновлений: id обновления как correlation id"""
+
+    async def __call__(self, handler, event, data: Dict[str, Any]):
+        token = correlation_id.set(f"u{getattr(event, 'update_id', '-')}")
+        try:
+            return await handler(event, data)
+        finally:
+            correlation_id.reset(token)
+
+
+def setup_logging(path: Optional[str] = "bot.log", level: str = "INFO", json_output: bool = True,
+                  max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5,
+                  rotate_interval: float = 86400.0) -> QueueListener:
+    """Единая настройка логирования.
+
+    Обработчики логов только кладут запись в очередь; запись на диск и в
+    консоль выполняет поток ``QueueListener``. Возвращает запущенный
+    listener, его нужно остановить при завершении процесса.
+    """
+    formatter = JsonFormatter() if json_output else logging.Formatter(
+        "%(asctime)s - %(name)s - %(levelname)s - [%(correlation_id)s] %(message)s"
+    )
+    handlers = [logging.StreamHandler()]
+    if path:
+        handlers.append(SizeAndTimeRotatingFileHandler(path, max_bytes, backup_count, rotate_interval))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: queue.Queue = queue.Queue(-1)
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(CorrelationFilter())
+    queue_handler.addFilter(RateLimitFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
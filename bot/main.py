@@ -1,37 +1,57 @@
 """news_bot v0.1"""
-import os
+import signal
 import asyncio
 import logging
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Optional
+from zoneinfo import ZoneInfo
 from aiogram import Bot, Dispatcher, F
-from aiogram.filters import Command
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters import Command, CommandObject
 from aiogram.types import Message
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
-from aiogram.types import Message, InputFile, CallbackQuery
-from dotenv import load_dotenv
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.types import Message, FSInputFile, CallbackQuery
 
+from config import Settings, get_settings
 from crypto import Crypto
-from database import AsyncDatabase
+from database import AsyncDatabase, TransitionError
 from keyboards import Keyboards
-
-ADMINS = list(map(int, os.getenv("ADMIN_IDS").split(',')))
+from callbacks import ArticleAction, ArticleCallback, CallbackRouter, PageCallback
+from vault import Vault
+from vault_gc import VaultGC
+from revisions import RevisionStore
+from workspace import EditWorkspace
+from rotation import KeyRotation
+from search import SearchIndex
+from changes import ArticleChanges
+from cache import ArticleCache
+from scheduler import PublishScheduler
+from storage import PostgresStorage
+from webhook import WebhookServer
+from audit import AuditLog
+from stats import StatsService
+from drafts import DraftsBrowser
+from logger import CorrelationMiddleware, setup_logging
+from metrics import (
+    REGISTRY, HandlerMetricsMiddleware, MetricsServer, TelegramMetricsMiddleware,
+    instrument_crypto, instrument_database, mark_failed
+)
+from sender import Sender, PRIORITY_CHANNEL, PRIORITY_REVIEW
 
 def admin_required(func):
     async def wrapper(message: Message, *args, **kwargs):
-        if message.from_user.id not in ADMINS:
+        if message.from_user.id not in get_settings().admin_ids:
             await message.answer("⛔ Доступ запрещен")
             return
         return await func(message, *args, **kwargs)
     return wrapper
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
 logger = logging.getLogger(__name__)
-load_dotenv()
 
 class ArticleStates(StatesGroup):
     DRAFT = State()
@@ -40,31 +60,101 @@ class ArticleStates(StatesGroup):
     REJECTED = State()
     REQUEST_CHANGES = State()
     SCHEDULED = State()
+    EDIT = State()
 
 class NewsBot:
-    def __init__(self):
-        self._check_env_vars()
-        self.bot = Bot(token=os.getenv("BOT_TOKEN"))
-        self.storage = MemoryStorage()
+    def __init__(self, settings: Optional[Settings] = None, db: Optional[AsyncDatabase] = None,
+                 storage: Optional[BaseStorage] = None):
+        self.settings = settings = settings or get_settings()
+        session = (
+            AiohttpSession(api=TelegramAPIServer.from_base(settings.telegram_api_url))
+            if settings.telegram_api_url else None
+        )
+        self.bot = Bot(token=settings.bot_token, session=session)
+        self.sender = Sender(self.bot, workers=settings.sender_workers)
+        self.cache = ArticleCache(
+            max_bytes=settings.cache_max_bytes,
+            ttl=settings.cache_ttl,
+            zeroize=settings.cache_zeroize
+        )
+        self.db = db or AsyncDatabase(cache=self.cache)
+        self.storage = storage or PostgresStorage(self.db)
+        self.audit = AuditLog(self.db)
+        self.stats = StatsService(self.db, ttl=settings.stats_ttl)
+        self.drafts = DraftsBrowser(self.db, page_size=settings.drafts_page_size)
         self.dp = Dispatcher(storage=self.storage)
-        self.db = AsyncDatabase()
-        self.crypto = Crypto(os.getenv("ENCRYPTION_KEY"))
-        self.vault_path = Path(os.getenv("VAULT_PATH"))
+        self.mode = settings.bot_mode
+        self.crypto = Crypto(settings.encryption_keys or settings.encryption_key, mac_key=settings.mac_key)
+        self.rotation = KeyRotation(
+            self.db,
+            self.crypto,
+            batch_size=settings.key_rotation_batch,
+            concurrency=settings.key_rotation_concurrency,
+            pause=settings.key_rotation_pause
+        )
+        self.vault_path = settings.vault_path
+        self.vault = Vault(
+            self.vault_path,
+            self.crypto,
+            max_workers=settings.vault_workers,
+            cache=self.cache
+        )
+        self.revisions = RevisionStore(self.db, self.vault, base_every=settings.revision_base_every)
+        self.search = SearchIndex(self.db, self.crypto, self.vault, cache_bytes=settings.search_cache_bytes)
+        # изменения статей в других процессах бота
+        self.changes = ArticleChanges(self.db)
+        self.changes.subscribe(self.cache, lambda article_id, user_id: self.db.invalidate(article_id))
+        self.changes.subscribe(self.drafts.cache, lambda article_id, user_id: self.drafts.invalidate(user_id))
+        self.changes.subscribe(self.search.cache, lambda article_id, user_id: self.search.forget_user(user_id))
+        self.workspace = EditWorkspace(
+            settings.edit_workspace or self.vault_path / "editing",
+            self.vault,
+            self._sync_edit,
+            debounce=settings.edit_debounce,
+            idle_timeout=settings.edit_idle_timeout,
+            on_failure=self._edit_failed
+        )
+        self.vault_gc = VaultGC(
+            self.vault,
+            self.db,
+            interval=settings.vault_gc_interval,
+            batch_size=settings.vault_gc_batch,
+            grace=settings.vault_gc_grace
+        )
         self.keyboards = Keyboards()
+        self.callbacks = CallbackRouter()
+        self.scheduler = PublishScheduler(
+            self.db,
+            self._publish_to_channel,
+            batch_size=settings.scheduler_batch_size,
+            lease=settings.scheduler_lease,
+            max_attempts=settings.scheduler_max_attempts
+        )
+        self.timezone = ZoneInfo(settings.schedule_tz)
+        self.metrics = MetricsServer(
+            host=settings.metrics_host,
+            port=settings.metrics_port,
+            profiling=settings.metrics_profiling
+        )
+        self._setup_metrics()
         
         self._register_handlers()
 
-    def _check_env_vars(self):
-        """Проверка обязательных переменных окружения"""
-        required_vars = [
-            'BOT_TOKEN', 
-            'ENCRYPTION_KEY', 
-            'VAULT_PATH', 
-            'REVIEWER_CHAT_ID'
-        ]
-        missing = [var for var in required_vars if not os.getenv(var)]
-        if missing:
-            raise ValueError(f"Отсутствуют переменные окружения: {', '.join(missing)}")
+    def _setup_metrics(self):
+        """Middleware и таймеры для метрик"""
+        self.dp.update.outer_middleware(CorrelationMiddleware())
+        self.dp.message.middleware(HandlerMetricsMiddleware())
+        self.dp.callback_query.middleware(HandlerMetricsMiddleware())
+        self.bot.session.middleware(TelegramMetricsMiddleware())
+        instrument_crypto(self.crypto)
+        REGISTRY.gauge("newsbot_sender_queue_depth", "Очередь исходящих сообщений",
+                       lambda: self.sender.stats()["queue_depth"])
+        REGISTRY.gauge("newsbot_sender_latency_seconds", "Задержка отправки (очередь + запрос)",
+                       lambda: {(q,): self.sender.stats()[f"latency_{q}"] for q in ("p50", "p99")},
+                       labels=("quantile",))
+        REGISTRY.gauge("newsbot_cache_hit_rate", "Доля попаданий в кэш статей",
+                       lambda: self.cache.hit_rate)
+        REGISTRY.gauge("newsbot_cache_bytes", "Объем кэша статей", lambda: self.cache.size)
 
     async def _get_channel_id_handler(self, message: Message):
         """
@@ -92,6 +182,93 @@ class NewsBot:
             reply_markup=self.keyboards.main_menu()
         )
 
+    async def _create_handler(self, message: Message, state: FSMContext):
+        """Обработка кнопки 'Создать статью'"""
+        await state.set_state(ArticleStates.DRAFT)
+        await message.answer("📝 Отправьте текст статьи")
+
+    async def _stats_handler(self, message: Message):
+        """Обработка кнопки 'Статистика'"""
+        try:
+            stats = await self.stats.get(message.from_user.id)
+            await message.answer(self.stats.render(stats))
+            
+        except Exception as e:
+            logger.error(f"Error in _stats_handler: {e}")
+            mark_failed()
+            await message.answer("❌ Ошибка при получении статистики")
+
+    async def _drafts_handler(self, message: Message):
+        """Обработка кнопки 'Мои черновики'"""
+        try:
+            text, markup = await self.drafts.page(message.from_user.id)
+            await message.answer(text, reply_markup=markup)
+            
+        except Exception as e:
+            logger.error(f"Error in _drafts_handler: {e}")
+            mark_failed()
+            await message.answer("❌ Ошибка при загрузке черновиков")
+
+    async def _settings_handler(self, message: Message):
+        """Обработка кнопки 'Настройки'"""
+        await message.answer("⚙️ Настройки пока недоступны", reply_markup=self.keyboards.main_menu())
+
+    async def _search_handler(self, message: Message, command: CommandObject):
+        """Поиск по своим черновикам: /search слова"""
+        try:
+            if not command.args:
+                await message.answer("🔎 Использование: /search слова из статьи")
+                return
+            drafts = await self.search.search(message.from_user.id, command.args)
+            if not drafts:
+                await message.answer("🔎 Ничего не найдено")
+                return
+            await message.answer(
+                "🔎 Найденные черновики:",
+                reply_markup=self.keyboards.drafts_page(drafts, None, None)
+            )
+            
+        except Exception as e:
+            logger.error(f"Error in _search_handler: {e}")
+            mark_failed()
+            await message.answer("❌ Ошибка поиска")
+
+    async def _drafts_page_handler(self, callback: CallbackQuery, callback_data: PageCallback):
+        """Переход по страницам черновиков"""
+        try:
+            text, markup = await self.drafts.page(
+                callback.from_user.id, callback_data.direction, callback_data.cursor
+            )
+            await callback.message.edit_text(text=text, reply_markup=markup)
+            await callback.answer()
+            
+        except ValueError:
+            await self.callbacks.reject(callback)
+        except Exception as e:
+            logger.error(f"Error in _drafts_page_handler: {e}")
+            mark_failed()
+            await callback.answer("❌ Ошибка при загрузке черновиков")
+
+    async def _open_handler(self, callback: CallbackQuery, state: FSMContext, article_id: int):
+        """Открытие черновика из списка"""
+        try:
+            article = await self.db.get_article(article_id)
+            if not article or article['user_id'] != callback.from_user.id or article['status'] != "draft":
+                await callback.answer("Черновик не найден!")
+                return
+            
+            await callback.message.edit_text(
+                text=f"📝 Черновик #{article_id}",
+                reply_markup=self.keyboards.editor_keyboard(article_id)
+            )
+            await state.set_state(ArticleStates.DRAFT)
+            await state.update_data(article_id=article_id)
+            
+        except Exception as e:
+            logger.error(f"Error in _open_handler: {e}")
+            mark_failed()
+            await callback.answer("❌ Ошибка при открытии черновика")
+
     async def _text_handler(self, message: Message, state: FSMContext):
         """Обработка текстовых сообщений"""
         try:
@@ -99,13 +276,12 @@ class NewsBot:
                 return
 
             user_id = message.from_user.id
-            draft_path = self.vault_path / f"draft_{user_id}_{message.message_id}.md"
-            
-            draft_path.write_text(message.text, encoding='utf-8')
-            encrypted_path = self.vault_path / f"{draft_path.name}.enc"
-            encrypted_path.write_bytes(self.crypto.encrypt_file(draft_path))
+            encrypted_path = await self.vault.save_draft(message.text)
             
             article_id = await self.db.add_article(user_id, str(encrypted_path))
+            await self.audit.event("created", article_id, user_id)
+            await self.search.index(article_id, user_id, 1, message.text)
+            self.drafts.invalidate(user_id)
             
             await state.set_state(ArticleStates.DRAFT)
             await state.update_data(article_id=article_id)
@@ -116,58 +292,171 @@ class NewsBot:
             
         except Exception as e:
             logger.error(f"Error in _text_handler: {e}")
+            mark_failed()
             await message.answer("❌ Произошла ошибка при сохранении черновика")
 
-    async def _edit_handler(self, callback: CallbackQuery, state: FSMContext):
+    async def _edit_text_handler(self, message: Message, state: FSMContext):
+        """Исправленный текст черновика - новая ревизия"""
+        try:
+            data = await state.get_data()
+            article_id = data['article_id']
+            revision = await self._update_article(article_id, message.text, message.from_user.id)
+            if revision is None:
+                await message.answer("⛔ Это не ваша статья")
+                return
+
+            await message.answer(
+                f"✅ Ревизия {revision} статьи #{article_id} сохранена",
+                reply_markup=self.keyboards.editor_keyboard(article_id)
+            )
+            await state.set_state(ArticleStates.DRAFT)
+
+        except TransitionError as e:
+            await state.set_state(ArticleStates.DRAFT)
+            await message.answer(f"⚠️ Статья #{e.article_id} сейчас не черновик")
+        except Exception as e:
+            logger.error(f"Error in _edit_text_handler: {e}")
+            mark_failed()
+            await message.answer("❌ Ошибка при сохранении правки")
+
+    async def _update_article(self, article_id: int, text: str, user_id: int) -> Optional[int]:
+        """Сохранение нового текста черновика, возвращает номер ревизии (None - чужая статья)"""
+        article = await self.db.get_article(article_id)
+        if not article:
+            raise TransitionError(article_id, ["draft"], None)
+        if article['user_id'] != user_id:
+            return None
+        old_text = await self.vault.read_text(Path(article['file_path']))
+        if text == old_text:
+            return article['revision']
+        path = await self.vault.save_draft(text)
+        revision = await self.revisions.commit(article, old_text, text, path)
+        await self.audit.event("revised", article_id, user_id, revision=revision)
+        await self.search.index(article_id, user_id, revision, text, old_text)
+        return revision
+
+    async def _sync_edit(self, article_id: int, user_id: Optional[int], text: str):
+        """Правка из рабочего каталога: новая ревизия и уведомление автора"""
+        article = await self.db.get_article(article_id)
+        if not article:
+            return
+        user_id = user_id or article['user_id']
+        revision = await self._update_article(article_id, text, user_id)
+        if revision is None or revision == article['revision']:
+            return
+        await self.sender.send_message(
+            chat_id=user_id,
+            text=f"💾 Правка статьи #{article_id} сохранена (ревизия {revision})"
+        )
+
+    async def _edit_failed(self, article_id: int, user_id: Optional[int], kept: Optional[Path]):
+        """Уведомление автора о правке, которую не удалось сохранить"""
+        if user_id is None:
+            article = await self.db.get_article(article_id)
+            if not article:
+                return
+            user_id = article['user_id']
+        text = f"⚠️ Правка статьи #{article_id} не сохранена: статья уже не черновик или недоступна БД"
+        if kept is not None:
+            text += f"\nКопия с правкой отложена: {kept}"
+        await self.sender.send_message(chat_id=user_id, text=text)
+
+    async def _edit_handler(self, callback: CallbackQuery, state: FSMContext, article_id: int):
         """Обработка кнопки редактирования"""
         try:
-            article_id = int(callback.data.split("_")[1])
             article = await self.db.get_article(article_id)
             
-            if not article or not Path(article.file_path).exists():
+            if not article or not await self.vault.exists(Path(article['file_path'])):
                 await callback.answer("Файл статьи не найден!")
                 return
             
-            decrypted = self.crypto.decrypt_file(Path(article.file_path).read_bytes())
-            temp_path = Path("/tmp") / f"{article_id}.md"
-            temp_path.write_text(decrypted, encoding='utf-8')
+            if article['user_id'] != callback.from_user.id:
+                await callback.answer("⛔ Это не ваша статья")
+                return
+
+            path = await self.workspace.open(
+                article_id, callback.from_user.id, self.vault.iter_plain(Path(article['file_path']))
+            )
             
-            os.system(f"open -a Obsidian {temp_path}")
-            await callback.answer("Файл открыт в Obsidian")
+            await state.set_state(ArticleStates.EDIT)
+            await state.update_data(article_id=article_id)
+            await callback.message.answer(
+                f"✏️ Копия для правки: {path}\n"
+                "Сохраненные изменения попадают в статью автоматически. "
+                "Исправленный текст можно также прислать сообщением."
+            )
+            await callback.answer()
             
         except Exception as e:
             logger.error(f"Error in _edit_handler: {e}")
+            mark_failed()
             await callback.answer("❌ Ошибка при открытии файла")
 
-    async def _review_handler(self, callback: CallbackQuery, state: FSMContext):
+    async def _review_handler(self, callback: CallbackQuery, state: FSMContext, article_id: int):
         """Обработка отправки на ревью"""
         try:
-            article_id = int(callback.data.split("_")[1])
-            await self.db.update_status(article_id, "review")
-            
-            article = await self.db.get_article(article_id)
-            if not article or not Path(article.file_path).exists():
+            current = await self.db.get_article(article_id)
+            if not current:
+                await callback.answer("Статья не найдена!")
+                return
+            article = await self.db.submit_for_review(article_id, current['revision'])
+            await self.audit.event("submitted", article_id, callback.from_user.id)
+            self.drafts.invalidate(article['user_id'])
+            if not await self.vault.exists(Path(article['file_path'])):
                 await callback.answer("Статья не найдена!")
                 return
             
-            await self.bot.send_document(
-                chat_id=os.getenv("REVIEWER_CHAT_ID"),
-                document=InputFile(article.file_path),
-                caption=f"📄 Статья #{article_id} на ревью",
-                reply_markup=self.keyboards.reviewer_keyboard(article_id)
-            )
+            reviewed = current['reviewed_revision']
+            changed = reviewed is not None and reviewed < article['revision']
+            await self._send_for_review(article_id, Path(article['file_path']), with_keyboard=not changed)
+            if changed:
+                text = await self.vault.read_text(Path(article['file_path']))
+                await self.sender.send_message(
+                    chat_id=self.settings.reviewer_chat_id,
+                    text=await self.revisions.diff(article_id, reviewed, article['revision'], text),
+                    priority=PRIORITY_REVIEW,
+                    parse_mode="HTML",
+                    reply_markup=self.keyboards.reviewer_keyboard(article_id)
+                )
             await callback.answer("Отправлено на ревью!")
             await state.set_state(ArticleStates.REVIEW)
             
+        except TransitionError:
+            await callback.answer("⚠️ Статья уже на ревью или не найдена")
         except Exception as e:
             logger.error(f"Error in _review_handler: {e}")
+            mark_failed()
             await callback.answer("❌ Ошибка при отправке на ревью")
 
-    async def _approve_handler(self, callback: CallbackQuery, state: FSMContext):
+    async def _send_for_review(self, article_id: int, path: Path, with_keyboard: bool = True):
+        """Отправка файла статьи редакторам; повторно загружается только измененный файл"""
+        content_hash = await self.vault.digest(path)
+        file_id = await self.db.get_file_id(article_id, content_hash)
+        options = dict(
+            chat_id=self.settings.reviewer_chat_id,
+            priority=PRIORITY_REVIEW,
+            caption=f"📄 Статья #{article_id} на ревью",
+            reply_markup=self.keyboards.reviewer_keyboard(article_id) if with_keyboard else None
+        )
+        if file_id:
+            try:
+                await self.sender.send_document(document=file_id, **options)
+                return
+            except TelegramBadRequest as e:
+                logger.warning(f"file_id статьи #{article_id} отклонен, загрузка заново: {e}")
+        message = await self.sender.send_document(document=FSInputFile(path), **options)
+        await self.db.save_file_id(article_id, content_hash, message.document.file_id)
+
+    async def _approve_handler(self, callback: CallbackQuery, state: FSMContext, article_id: int):
         """Обработка одобрения статьи"""
         try:
-            article_id = int(callback.data.split("_")[1])
-            await self.db.update_status(article_id, "approved")
+            article = await self.db.get_article(article_id)
+            if not article:
+                await callback.answer("Статья не найдена!")
+                return
+            payload = await self.vault.build_payload(Path(article['file_path']))
+            await self.db.approve(article_id, callback.from_user.id, payload)
+            await self.audit.event("approved", article_id, callback.from_user.id)
             
             await callback.message.edit_text(
                 text=f"✅ Статья #{article_id} одобрена. Выберите действие:",
@@ -175,15 +464,20 @@ class NewsBot:
             )
             await state.set_state(ArticleStates.APPROVED)
             
+        except TransitionError:
+            await callback.answer(f"⚠️ Статья #{article_id} уже не на ревью")
+        except ValueError as e:
+            await callback.answer(f"⚠️ Статья не подготовлена к публикации: {e}")
         except Exception as e:
             logger.error(f"Error in _approve_handler: {e}")
+            mark_failed()
             await callback.answer("❌ Ошибка при одобрении статьи")
 
-    async def _reject_handler(self, callback: CallbackQuery, state: FSMContext):
+    async def _reject_handler(self, callback: CallbackQuery, state: FSMContext, article_id: int):
         """Обработка отклонения статьи"""
         try:
-            article_id = int(callback.data.split("_")[1])
-            await self.db.update_status(article_id, "rejected")
+            await self.db.reject(article_id, callback.from_user.id)
+            await self.audit.event("rejected", article_id, callback.from_user.id)
             
             await callback.message.edit_text(
                 text=f"❌ Статья #{article_id} отклонена",
@@ -191,28 +485,32 @@ class NewsBot:
             )
             await state.set_state(ArticleStates.REJECTED)
             
+        except TransitionError:
+            await callback.answer(f"⚠️ Статья #{article_id} уже не на ревью")
         except Exception as e:
             logger.error(f"Error in _reject_handler: {e}")
+            mark_failed()
             await callback.answer("❌ Ошибка при отклонении статьи")
 
-    async def _delete_handler(self, callback: CallbackQuery, state: FSMContext):
+    async def _delete_handler(self, callback: CallbackQuery, state: FSMContext, article_id: int):
         """Обработка удаления статьи"""
         try:
-            article_id = int(callback.data.split("_")[1])
-            await self.db.delete_article(article_id)
+            author_id = await self.db.delete_article(article_id)
+            await self.audit.event("deleted", article_id, callback.from_user.id)
+            if author_id:
+                self.drafts.invalidate(author_id)
             
             await callback.message.edit_text("🗑 Статья удалена")
             await state.clear()
             
         except Exception as e:
             logger.error(f"Error in _delete_handler: {e}")
+            mark_failed()
             await callback.answer("❌ Ошибка при удалении статьи")
 
-    async def _request_changes_handler(self, callback: CallbackQuery, state: FSMContext):
+    async def _request_changes_handler(self, callback: CallbackQuery, state: FSMContext, article_id: int):
         """Обработка запроса правок"""
         try:
-            article_id = int(callback.data.split("_")[1])
-            
             await callback.message.edit_text(
                 text=f"✏️ Введите комментарий с правками для статьи #{article_id}:",
                 reply_markup=self.keyboards.back_keyboard()
@@ -222,13 +520,17 @@ class NewsBot:
             
         except Exception as e:
             logger.error(f"Error in _request_changes_handler: {e}")
+            mark_failed()
             await callback.answer("❌ Ошибка при запросе правок")
 
     async def _changes_comment_handler(self, message: Message, state: FSMContext):
         """Обработка комментария с правками"""
         try:
             data = await state.get_data()
-            await self.db.log_review(data['article_id'], message.text)
+            article = await self.db.return_to_draft(data['article_id'])
+            self.drafts.invalidate(article['user_id'])
+            await self.audit.log_review(data['article_id'], message.text, message.from_user.id)
+            await self.audit.event("changes_requested", data['article_id'], message.from_user.id)
             
             await message.answer(
                 "📝 Комментарий по правкам сохранён",
@@ -236,8 +538,12 @@ class NewsBot:
             )
             await state.set_state(ArticleStates.DRAFT)
             
+        except TransitionError as e:
+            await state.clear()
+            await message.answer(f"⚠️ Статья #{e.article_id} уже не на ревью")
         except Exception as e:
             logger.error(f"Error in _changes_comment_handler: {e}")
+            mark_failed()
             await message.answer("❌ Ошибка при сохранении комментария")
 
     async def _back_handler(self, callback: CallbackQuery, state: FSMContext):
@@ -252,28 +558,117 @@ class NewsBot:
             
         except Exception as e:
             logger.error(f"Error in _back_handler: {e}")
+            mark_failed()
             await callback.answer("❌ Ошибка при возврате")
 
-    async def _publish_to_channel(self, article_id: int):
-        """Публикация статьи в DigitalCriticism"""
+    async def _publish_to_channel(self, article_id: int, attempt: int):
+        """Публикация статьи в DigitalCriticism по захвату ``attempt``"""
         try:
             article = await self.db.get_article(article_id)
             if not article:
                 raise ValueError("Статья не найдена")
             
-            decrypted = self.crypto.decrypt_file(Path(article.file_path).read_bytes())
-            
-            await self.bot.send_message(
-                chat_id=os.getenv("CHANNEL_ID"),  
-                text=decrypted,
-                parse_mode="Markdown",
-                disable_web_page_preview=True
-            )
+            payload = article.get('payload')
+            if payload is None:
+                # одобрена до появления подготовленных публикаций
+                payload = await self.vault.build_payload(Path(article['file_path']))
+            chunks = await self.vault.read_payload(payload)
+
+            # после частичной отправки продолжаем с первого неотправленного куска
+            sent = article.get('sent_chunks') or 0
+            for number, chunk in enumerate(chunks[sent:], start=sent + 1):
+                await self.sender.send_message(
+                    chat_id=self.settings.channel_id,
+                    text=chunk,
+                    priority=PRIORITY_CHANNEL,
+                    parse_mode="HTML",
+                    disable_web_page_preview=True
+                )
+                if not await self.db.save_sent_chunks(article_id, attempt, number, datetime.utcnow()):
+                    raise RuntimeError(f"захват статьи #{article_id} потерян")
             return True
         except Exception as e:
             logger.error(f"Ошибка публикации: {e}")
+            mark_failed()
             return False
 
+    async def _publish_handler(self, callback: CallbackQuery, state: FSMContext, article_id: int):
+        """Немедленная публикация одобренной статьи"""
+        try:
+            attempt = await self.db.claim_article(article_id, datetime.utcnow())
+            claim = {article_id: attempt}
+            if not await self._publish_to_channel(article_id, attempt):
+                # без попыток в запасе статья возвращается в одобренные
+                await self.db.reschedule_articles(claim, datetime.utcnow(), max_attempts=0)
+                await callback.answer("❌ Ошибка публикации")
+                return
+            if not await self.db.mark_published(claim):
+                await callback.answer(f"⚠️ Публикация статьи #{article_id} передана другому процессу")
+                return
+            await self.audit.event("published", article_id, callback.from_user.id)
+            await callback.message.edit_text(f"🚀 Статья #{article_id} опубликована")
+            
+        except TransitionError:
+            await callback.answer(f"⚠️ Статья #{article_id} уже публикуется или опубликована")
+        except Exception as e:
+            logger.error(f"Error in _publish_handler: {e}")
+            mark_failed()
+            await callback.answer("❌ Ошибка публикации")
+
+    async def _schedule_handler(self, callback: CallbackQuery, state: FSMContext, article_id: int):
+        """Запрос времени отложенной публикации"""
+        try:
+            await callback.message.edit_text(
+                text=f"⏰ Введите время публикации статьи #{article_id} в формате ДД.ММ.ГГГГ ЧЧ:ММ",
+                reply_markup=self.keyboards.back_keyboard()
+            )
+            await state.set_state(ArticleStates.SCHEDULED)
+            await state.update_data(article_id=article_id)
+            
+        except Exception as e:
+            logger.error(f"Error in _schedule_handler: {e}")
+            mark_failed()
+            await callback.answer("❌ Ошибка планирования")
+
+    async def _schedule_time_handler(self, message: Message, state: FSMContext):
+        """Обработка введенного времени публикации"""
+        try:
+            data = await state.get_data()
+            try:
+                local_time = datetime.strptime(message.text.strip(), "%d.%m.%Y %H:%M")
+            except ValueError:
+                await message.answer("⚠️ Неверный формат. Пример: 31.12.2025 18:30")
+                return
+            
+            publish_time = local_time.replace(tzinfo=self.timezone).astimezone(timezone.utc).replace(tzinfo=None)
+            if publish_time <= datetime.utcnow():
+                await message.answer("⚠️ Время публикации должно быть в будущем")
+                return
+            
+            if not await self.scheduler.schedule(data['article_id'], publish_time):
+                await message.answer("❌ Запланировать можно только одобренную статью")
+                return
+            
+            await self.audit.event(
+                "scheduled", data['article_id'], message.from_user.id, publish_time=publish_time.isoformat()
+            )
+            await message.answer(f"⏰ Статья #{data['article_id']} будет опубликована {message.text.strip()}")
+            await state.clear()
+            
+        except Exception as e:
+            logger.error(f"Error in _schedule_time_handler: {e}")
+            mark_failed()
+            await message.answer("❌ Ошибка планирования")
+
+    async def _profiling_handler(self, message: Message):
+        """Включение/выключение профилировщика: /profiling on|off"""
+        if message.from_user.id not in self.settings.admin_ids:
+            await message.answer("⛔ Доступ запрещен")
+            return
+        enabled = message.text.split()[-1].lower() != "off"
+        self.metrics.enable_profiling(enabled)
+        await message.answer(f"🔬 Профилировщик {'включен' if enabled else 'выключен'}")
+
     async def _get_channel_info(self, message: Message):
         """Обработчик команды получения информации о канале"""
         try:
@@ -295,57 +690,166 @@ class NewsBot:
         except Exception as e:
             await message.answer(f"❌ Ошибка: {str(e)}")
             logger.error(f"Ошибка в _get_channel_info_handler: {e}")
+            mark_failed()
 
     async def _test_channel(self, message: Message):
         """Тестовая публикация"""
-        test_msg = await self.bot.send_message(
-            chat_id=os.getenv("CHANNEL_ID"),
-            text="🔧 Тестовое сообщение от бота"
+        test_msg = await self.sender.send_message(
+            chat_id=self.settings.channel_id,
+            text="🔧 Тестовое сообщение от бота",
+            priority=PRIORITY_CHANNEL
         )
         await message.answer(f"✅ Тест успешен. Сообщение ID: {test_msg.message_id}")
 
     def _register_handlers(self):
         """Регистрация всех обработчиков"""
-        handlers = [
+        message_handlers = [
             (self._start_handler, Command("start")),
             (self._get_channel_info, Command("get_channel_info")),
+            (self._profiling_handler, Command("profiling")),
+            (self._search_handler, Command("search")),
+            # кнопки меню остаются на экране в любом состоянии и не должны попасть в текст
+            (self._create_handler, F.text == "📝 Создать статью"),
+            (self._stats_handler, F.text == "📊 Статистика"),
+            (self._drafts_handler, F.text == "📚 Мои черновики"),
+            (self._settings_handler, F.text == "⚙️ Настройки"),
+            (self._schedule_time_handler, ArticleStates.SCHEDULED, F.text),
+            (self._changes_comment_handler, ArticleStates.REQUEST_CHANGES, F.text),
+            (self._edit_text_handler, ArticleStates.EDIT, F.text),
             (self._text_handler, F.text),
-            (self._edit_handler, F.data.startswith("edit_")),
-            (self._review_handler, F.data.startswith("review_")),
-            (self._approve_handler, F.data.startswith("approve_")),
-            (self._reject_handler, F.data.startswith("reject_")),
-            (self._delete_handler, F.data.startswith("delete_")),
-            (self._request_changes_handler, F.data.startswith("request_changes_")),
-            (self._back_handler, F.data == "back"),
-            (self._changes_comment_handler, ArticleStates.REQUEST_CHANGES)
         ]
-        
-        for handler, *filters in handlers:
-            if filters:
-                if handler.__name__.startswith('_'):
-                    self.dp.message.register(handler, *filters)
-                else:
-                    self.dp.callback_query.register(handler, *filters)
+        for handler, *filters in message_handlers:
+            self.dp.message.register(handler, *filters)
+
+        routes = {
+            ArticleAction.EDIT: self._edit_handler,
+            ArticleAction.REVIEW: self._review_handler,
+            ArticleAction.APPROVE: self._approve_handler,
+            ArticleAction.REJECT: self._reject_handler,
+            ArticleAction.DELETE: self._delete_handler,
+            ArticleAction.REQUEST_CHANGES: self._request_changes_handler,
+            ArticleAction.PUBLISH: self._publish_handler,
+            ArticleAction.SCHEDULE: self._schedule_handler,
+            ArticleAction.OPEN: self._open_handler,
+        }
+        for action, handler in routes.items():
+            self.callbacks.register(action, handler)
+
+        self.dp.callback_query.register(self.callbacks.dispatch, ArticleCallback.filter())
+        self.dp.callback_query.register(self._drafts_page_handler, PageCallback.filter(F.kind == "d"))
+        self.dp.callback_query.register(self._back_handler, F.data == "back")
+        self.dp.callback_query.register(self.callbacks.reject, F.data.startswith(f"{ArticleCallback.__prefix__}:"))
+
+    def _webhook_server(self) -> WebhookServer:
+        settings = self.settings
+        return WebhookServer(
+            self.bot,
+            self.dp,
+            secret=settings.webhook_secret,
+            url=settings.webhook_url,
+            host=settings.webhook_host,
+            port=settings.webhook_port,
+            path=settings.webhook_path,
+            workers=settings.webhook_workers,
+            queue_size=settings.webhook_queue_size
+        )
+
+    async def _serve_webhook(self):
+        """Webhook до SIGTERM/SIGINT; start_polling ставит такие обработчики сам"""
+        serving = asyncio.create_task(self._webhook_server().serve())
+        loop = asyncio.get_running_loop()
+        stopped = []
+
+        def on_signal(sig: signal.Signals):
+            logger.info(f"Получен {sig.name}, остановка")
+            stopped.append(sig)
+            serving.cancel()
+
+        signals = (signal.SIGTERM, signal.SIGINT)
+        for sig in signals:
+            try:
+                loop.add_signal_handler(sig, on_signal, sig)
+            except NotImplementedError:  # Windows
+                pass
+        try:
+            await serving
+        except asyncio.CancelledError:
+            # отмена по сигналу - штатная остановка, отмену извне пробрасываем
+            if not stopped:
+                raise
+        finally:
+            for sig in signals:
+                try:
+                    loop.remove_signal_handler(sig)
+                except NotImplementedError:
+                    pass
 
     async def run(self):
         """Запуск бота"""
         try:
-            await self.db.connect()
+            await self.db.connect(self.settings)
+            await self.db.migrate()
+            if await self.db.pin_mac_key(self.crypto.mac_id) != self.crypto.mac_id:
+                raise RuntimeError(
+                    "ключ HMAC не совпадает с сохраненным в БД: задайте MAC_KEY равным "
+                    "прежнему ключу, иначе адреса хранилища и поисковый индекс станут неверными"
+                )
+            # MemoryDatabase бенчмарков работает без пула и уведомлений
+            if self.db.pool is not None:
+                await self.changes.start()
+            instrument_database(self.db)
+            if self.settings.metrics_port:
+                await self.metrics.start()
             self.vault_path.mkdir(parents=True, exist_ok=True)
-            logger.info("Бот запущен")
-            await self.dp.start_polling(self.bot)
+            if isinstance(self.storage, PostgresStorage):
+                await self.storage.start()
+            await self.audit.start()
+            await self.sender.start()
+            await self.scheduler.start()
+            await self.vault_gc.start()
+            await self.workspace.start()
+            await self.rotation.start()
+            await self.search.start()
+            logger.info(f"Бот запущен ({self.mode})")
+            if self.mode == "webhook":
+                await self._serve_webhook()
+            else:
+                await self.dp.start_polling(self.bot)
             
         except Exception as e:
             logger.critical(f"Ошибка при запуске бота: {e}")
             
         finally:
+            await self.scheduler.stop()
+            await self.vault_gc.stop()
+            await self.workspace.stop()
+            await self.rotation.stop()
+            await self.search.stop()
+            await self.sender.stop()
+            await self.vault.close()
+            await self.storage.close()
+            await self.changes.stop()
+            await self.audit.stop()
             await self.db.close()
+            await self.metrics.stop()
             await self.bot.session.close()
             logger.info("Бот остановлен")
 
 async def main():
-    bot = NewsBot()
-    await bot.run()
+    settings = get_settings()
+    listener = setup_logging(
+        path=settings.log_file,
+        level=settings.log_level,
+        json_output=settings.log_json,
+        max_bytes=settings.log_max_bytes,
+        backup_count=settings.log_backup_count,
+        rotate_interval=settings.log_rotate_interval
+    )
+    try:
+        bot = NewsBot(settings)
+        await bot.run()
+    finally:
+        listener.stop()
 
 
 if __name__ == "__main__":
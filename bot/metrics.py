@@ -0,0 +1,382 @@
+import sys
+import time
+import asyncio
+import logging
+import threading
+import functools
+from bisect import bisect_left
+from collections import Counter as StackCounter
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from aiohttp import web
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in self._values.items():
+                lines.append(f"{self.name}{_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                # счетчики по корзинам, затем sum и count
+                series = self._values[labels] = [0.0] * (len(self.buckets) + 2)
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def time(self, *labels):
+        return _Timer(self, labels)
+
+    def totals(self) -> Dict[Tuple[str, ...], Tuple[int, float]]:
+        """Количество и сумма наблюдений по меткам"""
+        with self._lock:
+            return {labels: (int(series[-1]), series[-2]) for labels, series in self._values.items()}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in self._values.items():
+                cumulative = 0.0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    le = _labels(self.label_names, labels, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                le = _labels(self.label_names, labels, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{le} {series[-1]}")
+                lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {series[-2]}")
+                lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {series[-1]}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Tuple[str, ...]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+class Registry:
+    """Набор метрик с выдачей в текстовом формате Prometheus"""
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self._gauges: List[Tuple[str, str, Callable[[], Dict[Tuple[str, ...], float]], Tuple[str, ...]]] = []
+
+    def counter(self, name: str, help: str, labels: Iterable[str] = ()) -> Counter:
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labels: Iterable[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, help: str, collect: Callable[[], Any], labels: Iterable[str] = ()):
+        """Значение считывается в момент запроса; ``collect`` возвращает число или dict по меткам"""
+        self._gauges.append((name, help, collect, tuple(labels)))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        for name, help, collect, label_names in self._gauges:
+            try:
+                values = collect()
+            except Exception as e:
+                logger.error(f"Ошибка сбора метрики {name}: {e}")
+                continue
+            if not isinstance(values, dict):
+                values = {(): values}
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+            for labels, value in values.items():
+                if value is not None:
+                    lines.append(f"{name}{_labels(label_names, labels)} {float(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HANDLER_LATENCY = REGISTRY.histogram(
+    "newsbot_handler_seconds", "Время обработки обновления", ("handler", "outcome")
+)
+DB_QUERY_LATENCY = REGISTRY.histogram(
+    "newsbot_db_query_seconds", "Время методов AsyncDatabase", ("method",)
+)
+DB_POOL_WAIT = REGISTRY.histogram(
+    "newsbot_db_pool_wait_seconds", "Ожидание соединения из пула"
+)
+CRYPTO_LATENCY = REGISTRY.histogram(
+    "newsbot_crypto_seconds", "Время шифрования и дешифрования", ("operation",)
+)
+TELEGRAM_CALLS = REGISTRY.counter(
+    "newsbot_telegram_calls_total", "Запросы к Telegram Bot API", ("method", "outcome")
+)
+TELEGRAM_LATENCY = REGISTRY.histogram(
+    "newsbot_telegram_call_seconds", "Время запросов к Telegram Bot API", ("method",)
+)
+
+
+# флаг ошибки текущего обработчика; обработчики сами ловят исключения и отвечают пользователю
+_handler_failed: ContextVar[Optional[List[bool]]] = ContextVar("handler_failed", default=None)
+
+
+def mark_failed():
+    """Отметить обработку текущего обновления как ошибочную (outcome="error")"""
+    failed = _handler_failed.get()
+    if failed is not None:
+        failed[0] = True
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Гистограмма задержки по обработчикам и исходу.
+
+    Исход "error" - исключение из обработчика или вызов ``mark_failed()``
+    в его ветке обработки ошибки.
+    """
+
+    async def __call__(self, handler, event, data: Dict[str, Any]):
+        name = handler_name(data)
+        start = time.perf_counter()
+        failed = [False]
+        token = _handler_failed.set(failed)
+        try:
+            return await handler(event, data)
+        except Exception:
+            failed[0] = True
+            raise
+        finally:
+            _handler_failed.reset(token)
+            HANDLER_LATENCY.observe(time.perf_counter() - start, name, "error" if failed[0] else "ok")
+
+
+def handler_name(data: Dict[str, Any]) -> str:
+    """Имя обработчика; для кнопок статей - с действием"""
+    handler = data.get("handler")
+    name = getattr(getattr(handler, "callback", None), "__name__", "unknown")
+    action = getattr(data.get("callback_data"), "action", None)
+    if action is not None:
+        name = f"{name}:{getattr(action, 'value', action)}"
+    return name
+
+
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    """Счетчики и время запросов к Bot API"""
+
+    async def __call__(self, make_request, bot, method):
+        name = type(method).__name__
+        start = time.perf_counter()
+        try:
+            response = await make_request(bot, method)
+        except Exception:
+            TELEGRAM_CALLS.inc(name, "error")
+            raise
+        finally:
+            TELEGRAM_LATENCY.observe(time.perf_counter() - start, name)
+        TELEGRAM_CALLS.inc(name, "ok")
+        return response
+
+
+class _TimedAcquire:
+    def __init__(self, context):
+        self._context = context
+
+    async def __aenter__(self):
+        start = time.perf_counter()
+        connection = await self._context.__aenter__()
+        DB_POOL_WAIT.observe(time.perf_counter() - start)
+        return connection
+
+    async def __aexit__(self, *exc):
+        return await self._context.__aexit__(*exc)
+
+
+class InstrumentedPool:
+    """Обертка пула asyncpg, замеряющая ожидание соединения"""
+
+    def __init__(self, pool):
+        self._pool = pool
+
+    def acquire(self, *args, **kwargs):
+        return _TimedAcquire(self._pool.acquire(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+
+class _TimedCipher:
+    def __init__(self, cipher):
+        self._cipher = cipher
+
+    def encrypt(self, data: bytes) -> bytes:
+        with CRYPTO_LATENCY.time("encrypt"):
+            return self._cipher.encrypt(data)
+
+    def decrypt(self, token: bytes, *args, **kwargs) -> bytes:
+        with CRYPTO_LATENCY.time("decrypt"):
+            return self._cipher.decrypt(token, *args, **kwargs)
+
+    def rotate(self, token: bytes) -> bytes:
+        with CRYPTO_LATENCY.time("rotate"):
+            return self._cipher.rotate(token)
+
+    def __getattr__(self, name):
+        return getattr(self._cipher, name)
+
+
+def instrument_database(db):
+    """Таймеры на публичные методы AsyncDatabase и ожидание пула (после connect)"""
+    db.pool = InstrumentedPool(db.pool)
+    for name in dir(type(db)):
+        method = getattr(db, name)
+        if name.startswith("_") or name in ("connect", "close") or not asyncio.iscoroutinefunction(method):
+            continue
+        setattr(db, name, _timed_method(method, name))
+
+
+def _timed_method(method: Callable[..., Awaitable], name: str):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        with DB_QUERY_LATENCY.time(name):
+            return await method(*args, **kwargs)
+    return wrapper
+
+
+def instrument_crypto(crypto):
+    """Таймеры на все операции Fernet, включая потоковые"""
+    crypto.cipher = _TimedCipher(crypto.cipher)
+
+
+class SamplingProfiler:
+    """Семплирующий профилировщик потока event loop.
+
+    Отдельный поток снимает стек через ``sys._current_frames`` с интервалом
+    ``interval`` и считает свернутые стеки (формат flamegraph.pl).
+    """
+
+    def __init__(self, thread_id: Optional[int] = None):
+        self.thread_id = thread_id or threading.get_ident()
+        self._lock = threading.Lock()
+        self._running = False
+
+    def sample(self, seconds: float, interval: float = 0.005) -> str:
+        with self._lock:
+            if self._running:
+                raise RuntimeError("Профилирование уже запущено")
+            self._running = True
+        stacks = StackCounter()
+        try:
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                frame = sys._current_frames().get(self.thread_id)
+                if frame is not None:
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}")
+                        frame = frame.f_back
+                    stacks[";".join(reversed(stack))] += 1
+                time.sleep(interval)
+        finally:
+            self._running = False
+        return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()) + "\n"
+
+
+class MetricsServer:
+    """HTTP-эндпоинт ``/metrics`` и ``/debug/profile?seconds=N``"""
+
+    def __init__(self, registry: Registry = REGISTRY, host: str = "127.0.0.1", port: int = 9100,
+                 profiling: bool = False):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.profiling = profiling
+        self.profiler: Optional[SamplingProfiler] = None
+        self._runner: Optional[web.AppRunner] = None
+
+    async def _metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.registry.render(), content_type="text/plain", charset="utf-8")
+
+    async def _profile(self, request: web.Request) -> web.Response:
+        if not self.profiling:
+            return web.Response(status=404)
+        try:
+            seconds = min(float(request.query.get("seconds", 10)), 120.0)
+            interval = max(float(request.query.get("interval", 0.005)), 0.001)
+        except ValueError:
+            return web.Response(status=400)
+        try:
+            result = await asyncio.to_thread(self.profiler.sample, seconds, interval)
+        except RuntimeError as e:
+            return web.Response(status=409, text=str(e))
+        return web.Response(text=result, content_type="text/plain", charset="utf-8")
+
+    def enable_profiling(self, enabled: bool = True):
+        """Включение профилировщика во время работы"""
+        self.profiling = enabled
+
+    async def start(self):
+        self.profiler = SamplingProfiler()
+        app = web.Application()
+        app.router.add_get("/metrics", self._metrics)
+        app.router.add_get("/debug/profile", self._profile)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Метрики доступны на http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
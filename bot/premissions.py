@@ -1,5 +1,6 @@
 from typing import List
-import os
+
+from config import get_settings
 
 
 class Permissions:
@@ -8,6 +9,6 @@ class Permissions:
         self.editors: List[int] = []
         
     def load(self):
-        self.admins = list(map(int, os.getenv("ADMIN_IDS").split(',')))
-        self.editors = list(map(int, os.getenv("EDITOR_IDS", "").split(',')))
-        
\ No newline at end of file
+        settings = get_settings()
+        self.admins = list(settings.admin_ids)
+        self.editors = list(settings.editor_ids)
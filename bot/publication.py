@@ -0,0 +1,223 @@
+"""Подготовка статьи к публикации: Obsidian Markdown → HTML Telegram.
+
+Текст делится на блоки (абзацы, цитаты, блоки кода). Каждый блок
+превращается в самостоятельный сбалансированный HTML, затем блоки
+упаковываются в сообщения не длиннее лимита Telegram по границам абзацев.
+"""
+import re
+import html
+from typing import Callable, List, Tuple
+
+TELEGRAM_LIMIT = 4096
+
+_FRONTMATTER = re.compile(r"\A---\n.*?\n---\n", re.S)
+_COMMENT = re.compile(r"%%.*?%%", re.S)
+_FENCE = re.compile(r"^\s*(```|~~~)\s*([\w+-]*)\s*$")
+_HEADING = re.compile(r"^#{1,6}\s+(.*?)\s*#*$")
+_TASK = re.compile(r"^(\s*)[-*+]\s+\[([ xX])\]\s+(.*)$")
+_BULLET = re.compile(r"^(\s*)[-*+]\s+(.*)$")
+_QUOTE = re.compile(r"^\s*>\s?(.*)$")
+_CALLOUT = re.compile(r"^\[!(\w+)\][+-]?\s*(.*)$")
+_RULE = re.compile(r"^\s*([-*_])(\s*\1){2,}\s*$")
+
+_CODE_SPAN = re.compile(r"`([^`\n]+)`")
+_IMAGE = re.compile(r"!\[[^\]]*\]\([^)]*\)|!\[\[[^\]]*\]\]")
+_LINK = re.compile(r"\[([^\]]+)\]\(((?:https?|tg)://[^)\s]+)\)")
+_WIKILINK = re.compile(r"\[\[([^\]|#]*)(?:#([^\]|]*))?(?:\|([^\]]+))?\]\]")
+_PLACEHOLDER = re.compile("\x00(\\d+)\x00")
+_STYLES = [
+    (re.compile(r"\*\*(?=\S)(.+?)(?<=\S)\*\*"), "b"),
+    (re.compile(r"__(?=\S)(.+?)(?<=\S)__"), "b"),
+    (re.compile(r"(?<![*\w])\*(?=\S)(.+?)(?<=\S)\*(?![*\w])"), "i"),
+    (re.compile(r"(?<![_\w])_(?=\S)(.+?)(?<=\S)_(?![_\w])"), "i"),
+    (re.compile(r"~~(?=\S)(.+?)(?<=\S)~~"), "s"),
+    (re.compile(r"==(?=\S)(.+?)(?<=\S)=="), "u"),
+]
+_TAG = re.compile(r"<(/?)(\w+)[^>]*>")
+
+
+def compile_message(markdown: str, limit: int = TELEGRAM_LIMIT) -> List[str]:
+    """Готовые к отправке с ``parse_mode="HTML"`` куски статьи"""
+    units: List[str] = []
+    for kind, payload in _blocks(markdown):
+        if kind == "code":
+            units.extend(_code_units(payload, limit))
+        else:
+            units.extend(_pack(_text_segments(payload), "\n", limit, _hard_split))
+    messages = _pack(units, "\n\n", limit, _hard_split)
+    if not messages:
+        raise ValueError("Статья пуста")
+    return messages
+
+
+def length(text: str) -> int:
+    """Длина в единицах UTF-16, как ее считает Telegram"""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _blocks(markdown: str) -> List[Tuple[str, object]]:
+    """Абзацы (списки строк) и блоки кода (язык, строки)"""
+    text = markdown.replace("\r\n", "\n")
+    text = _COMMENT.sub("", _FRONTMATTER.sub("", text))
+    blocks: List[Tuple[str, object]] = []
+    paragraph: List[str] = []
+    code = None
+    for line in text.split("\n"):
+        if code is not None:
+            if _FENCE.match(line) and line.strip().startswith(code[0]):
+                blocks.append(("code", (code[1], code[2])))
+                code = None
+            else:
+                code[2].append(line)
+            continue
+        fence = _FENCE.match(line)
+        if fence or not line.strip():
+            if paragraph:
+                blocks.append(("text", paragraph))
+                paragraph = []
+            if fence:
+                code = (fence.group(1), fence.group(2), [])
+            continue
+        paragraph.append(line)
+    if code is not None:
+        blocks.append(("code", (code[1], code[2])))
+    if paragraph:
+        blocks.append(("text", paragraph))
+    return blocks
+
+
+def _text_segments(lines: List[str]) -> List[str]:
+    """Строки абзаца; подряд идущие строки цитаты - один сегмент"""
+    segments: List[str] = []
+    quote: List[str] = []
+    for line in lines:
+        match = _QUOTE.match(line)
+        if match:
+            quote.append(match.group(1))
+            continue
+        if quote:
+            segments.append(_quote(quote))
+            quote = []
+        segments.append(_line(line))
+    if quote:
+        segments.append(_quote(quote))
+    return segments
+
+
+def _quote(lines: List[str]) -> str:
+    callout = _CALLOUT.match(lines[0])
+    if callout:
+        title = callout.group(2) or callout.group(1).capitalize()
+        lines = [f"**{title}**"] + lines[1:]
+    return f"<blockquote>{chr(10).join(_line(line) for line in lines)}</blockquote>"
+
+
+def _line(line: str) -> str:
+    if _RULE.match(line):
+        return "———"
+    heading = _HEADING.match(line)
+    task = _TASK.match(line)
+    bullet = _BULLET.match(line)
+    if heading:
+        result = f"<b>{_inline(heading.group(1))}</b>"
+    elif task:
+        mark = "☐" if task.group(2) == " " else "☑"
+        result = f"{task.group(1)}{mark} {_inline(task.group(3))}"
+    elif bullet:
+        result = f"{bullet.group(1)}• {_inline(bullet.group(2))}"
+    else:
+        result = _inline(line)
+    # несбалансированная разметка публикуется как обычный текст
+    return result if _balanced(result) else html.escape(line, quote=False)
+
+
+def _inline(text: str) -> str:
+    """Строчная разметка: код, ссылки, выделение"""
+    protected: List[str] = []
+
+    def protect(fragment: str) -> str:
+        protected.append(fragment)
+        return f"\x00{len(protected) - 1}\x00"
+
+    text = _CODE_SPAN.sub(lambda m: protect(f"<code>{html.escape(m.group(1), quote=False)}</code>"), text)
+    text = _IMAGE.sub("", text)
+    text = _LINK.sub(lambda m: protect(
+        f'<a href="{html.escape(m.group(2))}">{_styles(html.escape(m.group(1), quote=False))}</a>'
+    ), text)
+    text = _WIKILINK.sub(lambda m: m.group(3) or m.group(1) or m.group(2) or "", text)
+    text = _styles(html.escape(text, quote=False))
+    return _PLACEHOLDER.sub(lambda m: protected[int(m.group(1))], text)
+
+
+def _styles(text: str) -> str:
+    for pattern, tag in _STYLES:
+        text = pattern.sub(rf"<{tag}>\1</{tag}>", text)
+    return text
+
+
+def _balanced(fragment: str) -> bool:
+    stack = []
+    for closing, tag in _TAG.findall(fragment):
+        if not closing:
+            stack.append(tag)
+        elif not stack or stack.pop() != tag:
+            return False
+    return not stack
+
+
+def _code_units(payload, limit: int) -> List[str]:
+    language, lines = payload
+    opening = f'<pre><code class="language-{language}">' if language else "<pre><code>"
+    closing = "</code></pre>"
+    inner = limit - length(opening + closing)
+    escaped = [html.escape(line, quote=False) for line in lines]
+    pieces = _pack(escaped, "\n", inner, lambda piece, size: _split_words(html.unescape(piece), size))
+    return [f"{opening}{piece}{closing}" for piece in pieces]
+
+
+def _pack(items: List[str], separator: str, limit: int,
+          split: Callable[[str, int], List[str]]) -> List[str]:
+    """Жадная упаковка фрагментов в куски не длиннее ``limit``"""
+    chunks: List[str] = []
+    current = ""
+    for item in items:
+        parts = [item] if length(item) <= limit else split(item, limit)
+        for part in parts:
+            candidate = f"{current}{separator}{part}" if current else part
+            if length(candidate) <= limit:
+                current = candidate
+            else:
+                chunks.append(current)
+                current = part
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _hard_split(fragment: str, limit: int) -> List[str]:
+    """Фрагмент длиннее сообщения: режется по словам без разметки"""
+    return _split_words(html.unescape(_TAG.sub("", fragment)), limit)
+
+
+def _split_words(text: str, limit: int) -> List[str]:
+    # экранирование удлиняет текст до 5 раз, UTF-16 - еще вдвое
+    step = max(1, limit // 10)
+    # (разделитель, слово): куски длинного слова (например, URL) склеиваются без пробела
+    words: List[Tuple[str, str]] = []
+    for word in text.split(" "):
+        if length(html.escape(word, quote=False)) > limit:
+            words.extend(("" if i else " ", word[i:i + step]) for i in range(0, len(word), step))
+        else:
+            words.append((" ", word))
+    pieces: List[str] = []
+    current = ""
+    for separator, word in words:
+        candidate = f"{current}{separator}{word}" if current else word
+        if length(html.escape(candidate, quote=False)) <= limit:
+            current = candidate
+        else:
+            pieces.append(html.escape(current, quote=False))
+            current = word
+    if current:
+        pieces.append(html.escape(current, quote=False))
+    return pieces
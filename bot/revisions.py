@@ -0,0 +1,118 @@
+"""История ревизий статьи: база и сжатые дельты.
+
+Ревизия 1 и каждая ``base_every``-я ревизия - база, ссылка на неизменяемый
+объект хранилища с полным текстом. Остальные ревизии - построчная дельта к
+предыдущей, сжатая zlib и зашифрованная. Восстановление ревизии читает
+ближайшую базу и применяет не больше ``base_every - 1`` дельт.
+"""
+import json
+import html
+import difflib
+from pathlib import Path
+from typing import List, Union
+
+from database import AsyncDatabase
+from publication import TELEGRAM_LIMIT, length
+from vault import Vault
+
+# Операция дельты: n > 0 - взять n строк, n < 0 - пропустить, список - вставить строки
+Op = Union[int, List[str]]
+
+
+def make_delta(old: List[str], new: List[str]) -> List[Op]:
+    ops: List[Op] = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old, new).get_opcodes():
+        if tag == "equal":
+            ops.append(i2 - i1)
+            continue
+        if i2 > i1:
+            ops.append(i1 - i2)
+        if j2 > j1:
+            ops.append(new[j1:j2])
+    return ops
+
+
+def apply_delta(old: List[str], ops: List[Op]) -> List[str]:
+    result: List[str] = []
+    position = 0
+    for op in ops:
+        if isinstance(op, list):
+            result.extend(op)
+        elif op > 0:
+            result.extend(old[position:position + op])
+            position += op
+        else:
+            position -= op
+    return result
+
+
+def encode_delta(old_text: str, new_text: str) -> bytes:
+    ops = make_delta(old_text.splitlines(keepends=True), new_text.splitlines(keepends=True))
+    return json.dumps(ops, ensure_ascii=False, separators=(",", ":")).encode('utf-8')
+
+
+def unified_diff(old_text: str, new_text: str, old_revision: int, new_revision: int) -> List[str]:
+    return list(difflib.unified_diff(
+        old_text.splitlines(), new_text.splitlines(),
+        f"ревизия {old_revision}", f"ревизия {new_revision}", n=2, lineterm=""
+    ))
+
+
+def render_diff(article_id: int, lines: List[str], old_revision: int, new_revision: int,
+                limit: int = TELEGRAM_LIMIT) -> str:
+    """Сообщение с изменениями для редакторов; длинный diff обрезается"""
+    header = f"🔀 Статья #{article_id}: изменения ревизии {old_revision} → {new_revision}\n"
+    if not lines:
+        return header + "Текст не изменился"
+    opening, closing = '<pre><code class="language-diff">', "</code></pre>"
+    budget = limit - length(header + opening + closing) - 40
+    shown: List[str] = []
+    used = 0
+    # заголовки ---/+++ не нужны, ревизии указаны выше
+    body = lines[2:]
+    for line in body:
+        escaped = html.escape(line, quote=False)
+        if used + length(escaped) + 1 > budget:
+            break
+        shown.append(escaped)
+        used += length(escaped) + 1
+    hidden = len(body) - len(shown)
+    tail = f"\n… еще строк: {hidden}" if hidden else ""
+    return f"{header}{opening}{chr(10).join(shown)}{closing}{tail}"
+
+
+class RevisionStore:
+    """Запись и восстановление ревизий статьи"""
+
+    def __init__(self, db: AsyncDatabase, vault: Vault, base_every: int = 10):
+        self.db = db
+        self.vault = vault
+        self.base_every = base_every
+
+    async def commit(self, article: dict, old_text: str, new_text: str, path: Path) -> int:
+        """Новая ревизия черновика с текстом из объекта ``path``, возвращает ее номер"""
+        revision = article['revision'] + 1
+        if (revision - 1) % self.base_every == 0:
+            await self.db.save_revision(article['id'], revision, str(path), None, await self.vault.size(path))
+            return revision
+        delta = await self.vault.compute(encode_delta, old_text, new_text)
+        sealed = await self.vault.seal(delta)
+        await self.db.save_revision(article['id'], revision, str(path), sealed, len(sealed))
+        return revision
+
+    async def text(self, article_id: int, revision: int) -> str:
+        """Текст ревизии: ближайшая база и дельты после нее"""
+        rows = await self.db.get_revision_chain(article_id, revision)
+        if not rows or rows[0]['file_path'] is None or rows[-1]['revision'] != revision:
+            raise ValueError(f"Ревизия {revision} статьи #{article_id} не найдена")
+        lines = (await self.vault.read_text(Path(rows[0]['file_path']))).splitlines(keepends=True)
+        for row in rows[1:]:
+            ops = json.loads(await self.vault.unseal(row['delta']))
+            lines = apply_delta(lines, ops)
+        return "".join(lines)
+
+    async def diff(self, article_id: int, old_revision: int, new_revision: int, new_text: str) -> str:
+        """Сообщение с изменениями между ревизиями для редакторов"""
+        old_text = await self.text(article_id, old_revision)
+        lines = await self.vault.compute(unified_diff, old_text, new_text, old_revision, new_revision)
+        return render_diff(article_id, lines, old_revision, new_revision)
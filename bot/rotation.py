@@ -0,0 +1,168 @@
+import os
+import uuid
+import asyncio
+import logging
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from cryptography.fernet import InvalidToken
+
+from crypto import Crypto
+from database import AsyncDatabase
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("files", "payloads", "deltas")
+# перешифрование выполняет один процесс бота
+ROTATION_LOCK = 0x726F7461
+
+
+class KeyRotation:
+    """Фоновое перешифрование хранилища и БД первым ключом связки.
+
+    Проходит по файлам статей, подготовленным публикациям и дельтам ревизий
+    пачками по ``batch_size``, не больше ``concurrency`` операций сразу, с
+    паузой ``pause`` между пачками. Собственный небольшой пул потоков не
+    отнимает потоки у обработчиков. После каждой пачки позиция сохраняется
+    в ``key_rotations``, поэтому после перезапуска работа продолжается с
+    того же места. Из нескольких процессов бота работу выполняет тот, кто
+    взял advisory-блокировку ``ROTATION_LOCK``.
+    """
+
+    def __init__(self, db: AsyncDatabase, crypto: Crypto, batch_size: int = 100,
+                 concurrency: int = 2, pause: float = 0.5):
+        self.db = db
+        self.crypto = crypto
+        self.batch_size = batch_size
+        self.pause = pause
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="rotation")
+        self._limit = asyncio.Semaphore(concurrency)
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self.crypto.rotating:
+            self._task = asyncio.create_task(self._run_safely())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=True)
+
+    async def _run_safely(self):
+        try:
+            await self.run()
+        except Exception as e:
+            logger.error(f"Ошибка перешифрования: {e}")
+
+    async def run(self):
+        async with self.db.advisory_lock(ROTATION_LOCK) as locked:
+            if not locked:
+                logger.info("Перешифрование выполняет другой процесс")
+                return
+            await self._run_locked()
+
+    def _done_message(self) -> str:
+        if self.crypto.mac_pinned:
+            return "старые ключи можно убрать"
+        # ключ HMAC выводится из последнего ключа связки и сменится вместе с ним
+        return ("перед удалением старых ключей задайте MAC_KEY равным последнему ключу "
+                "ENCRYPTION_KEYS, иначе изменятся адреса хранилища и поисковый индекс")
+
+    async def _run_locked(self):
+        key_id = self.crypto.key_id
+        checkpoint = await self.db.get_rotation(key_id)
+        if checkpoint and checkpoint['done']:
+            logger.warning(f"Данные уже перешифрованы ключом {key_id}: {self._done_message()}")
+            return
+        stage = checkpoint['stage'] if checkpoint else STAGES[0]
+        cursor = checkpoint['cursor'] if checkpoint else ""
+        logger.info(f"Перешифрование ключом {key_id}: этап {stage}, позиция {cursor or 'начало'}")
+        for stage in STAGES[STAGES.index(stage):]:
+            await getattr(self, f"_rotate_{stage}")(key_id, cursor)
+            cursor = ""
+        await self.db.save_rotation(key_id, STAGES[-1], "", done=True)
+        logger.warning(f"Перешифрование ключом {key_id} завершено: {self._done_message()}")
+
+    async def _each(self, func, items):
+        async def limited(item):
+            async with self._limit:
+                await func(item)
+        await asyncio.gather(*(limited(item) for item in items))
+        await asyncio.sleep(self.pause)
+
+    async def _rotate_files(self, key_id: str, cursor: str):
+        while True:
+            paths = await self.db.rotation_files(cursor, self.batch_size)
+            if not paths:
+                return
+            await self._each(self._rotate_file, paths)
+            cursor = paths[-1]
+            await self.db.save_rotation(key_id, "files", cursor)
+
+    async def _rotate_file(self, path: str):
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._executor, self._rotate_file_sync, Path(path))
+        except FileNotFoundError:
+            pass
+        except InvalidToken:
+            logger.error(f"Файл {path} не расшифровывается ни одним ключом связки")
+
+    def _rotate_file_sync(self, path: Path):
+        # объекты хранилища неизменяемы, поэтому атомарная замена безопасна
+        data = self.crypto.rotate_data(path.read_bytes())
+        tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            with tmp_path.open("wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    async def _rotate_payloads(self, key_id: str, cursor: str):
+        after = int(cursor or 0)
+        while True:
+            rows = await self.db.rotation_payloads(after, self.batch_size)
+            if not rows:
+                return
+            await self._each(self._rotate_payload, rows)
+            after = rows[-1]['id']
+            await self.db.save_rotation(key_id, "payloads", str(after))
+
+    async def _rotate_payload(self, row: dict):
+        token = await self._rotate_token(row['payload'], f"публикация статьи #{row['id']}")
+        if token is not None:
+            await self.db.replace_payload(row['id'], row['payload'], token)
+
+    async def _rotate_deltas(self, key_id: str, cursor: str):
+        after = tuple(int(part) for part in cursor.split(":")) if cursor else (0, 0)
+        while True:
+            rows = await self.db.rotation_deltas(after, self.batch_size)
+            if not rows:
+                return
+            await self._each(self._rotate_delta, rows)
+            after = (rows[-1]['article_id'], rows[-1]['revision'])
+            await self.db.save_rotation(key_id, "deltas", f"{after[0]}:{after[1]}")
+
+    async def _rotate_delta(self, row: dict):
+        token = await self._rotate_token(
+            row['delta'], f"ревизия {row['revision']} статьи #{row['article_id']}"
+        )
+        if token is not None:
+            await self.db.replace_delta(row['article_id'], row['revision'], row['delta'], token)
+
+    async def _rotate_token(self, token: bytes, what: str) -> Optional[bytes]:
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor, self.crypto.cipher.rotate, bytes(token))
+        except InvalidToken:
+            logger.error(f"{what} не расшифровывается ни одним ключом связки")
+            return None
@@ -0,0 +1,128 @@
+import heapq
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from database import AsyncDatabase
+
+logger = logging.getLogger(__name__)
+
+
+class PublishScheduler:
+    """Планировщик отложенных публикаций.
+
+    Источник истины - ``articles.publish_time`` со статусом ``scheduled``.
+    Куча в памяти только подсказывает, когда проснуться; сами статьи
+    захватываются в БД через ``FOR UPDATE SKIP LOCKED``, поэтому при
+    нескольких процессах бота каждая публикация выполняется один раз.
+
+    Захват - аренда на ``lease`` секунд, продлеваемая каждым отправленным
+    куском. Публикации упавшего процесса по истечении аренды возвращаются
+    в очередь; после ``max_attempts`` попыток статья снова становится
+    одобренной и ждет ручной публикации. ``publish`` получает номер попытки:
+    итог публикации записывается, только если захват еще не перешел к другому.
+    """
+
+    def __init__(self, db: AsyncDatabase, publish: Callable[[int, int], Awaitable[bool]],
+                 batch_size: int = 20, poll_interval: float = 30.0, retry_delay: float = 60.0,
+                 lease: float = 600.0, max_attempts: int = 5):
+        self.db = db
+        self.publish = publish
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self._heap: List[Tuple[datetime, int]] = []
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Загрузка ожидающих публикаций и запуск цикла"""
+        await self._release_stale(datetime.utcnow())
+        for row in await self.db.get_scheduled():
+            heapq.heappush(self._heap, (row['publish_time'], row['id']))
+        logger.info(f"Планировщик: загружено {len(self._heap)} отложенных публикаций")
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def schedule(self, article_id: int, publish_time: datetime) -> bool:
+        """Планирование публикации одобренной статьи (время в UTC)"""
+        if not await self.db.schedule_article(article_id, publish_time):
+            return False
+        heapq.heappush(self._heap, (publish_time, article_id))
+        self._wakeup.set()
+        return True
+
+    def _timeout(self) -> float:
+        if not self._heap:
+            return self.poll_interval
+        delay = (self._heap[0][0] - datetime.utcnow()).total_seconds()
+        return max(0.0, min(delay, self.poll_interval))
+
+    async def _loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._timeout())
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self._run_due()
+            except Exception as e:
+                logger.error(f"Ошибка планировщика: {e}")
+
+    async def _release_stale(self, now: datetime):
+        released = await self.db.release_stale_claims(
+            now - timedelta(seconds=self.lease), now, self.max_attempts
+        )
+        for article_id in released:
+            heapq.heappush(self._heap, (now, article_id))
+        if released:
+            logger.warning(f"Планировщик: возвращены публикации с истекшей арендой {released}")
+
+    async def _run_due(self):
+        now = datetime.utcnow()
+        await self._release_stale(now)
+        while self._heap and self._heap[0][0] <= now:
+            heapq.heappop(self._heap)
+
+        while True:
+            claimed = await self.db.claim_due_articles(now, self.batch_size)
+            if not claimed:
+                return
+            results = await asyncio.gather(
+                *(self.publish(article_id, attempt) for article_id, attempt in claimed.items()),
+                return_exceptions=True
+            )
+            published = {a: claimed[a] for a, ok in zip(claimed, results) if ok is True}
+            failed = {a: claimed[a] for a, ok in zip(claimed, results) if ok is not True}
+            if published:
+                marked = await self.db.mark_published(published)
+                lost = sorted(set(published) - set(marked))
+                if lost:
+                    logger.error(f"Планировщик: захват статей {lost} истек до конца публикации")
+            if failed:
+                retry_at = now + timedelta(seconds=self.retry_delay)
+                released = await self.db.reschedule_articles(failed, retry_at, self.max_attempts)
+                retried = sorted(a for a, status in released.items() if status == 'scheduled')
+                for article_id in retried:
+                    heapq.heappush(self._heap, (retry_at, article_id))
+                if retried:
+                    logger.error(f"Планировщик: не опубликованы {retried}, повтор в {retry_at}")
+                abandoned = sorted(a for a, status in released.items() if status == 'approved')
+                if abandoned:
+                    logger.error(f"Планировщик: попытки исчерпаны, статьи {abandoned} возвращены в одобренные")
+                lost = sorted(set(failed) - set(released))
+                if lost:
+                    logger.error(f"Планировщик: захват статей {lost} истек во время публикации")
+            if len(claimed) < self.batch_size:
+                return
@@ -0,0 +1,304 @@
+import logging
+from typing import List, Tuple
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+# Ключ advisory lock, чтобы миграции не выполнялись параллельно несколькими процессами
+MIGRATION_LOCK = 0x6E657773
+
+ARTICLE_TRANSITIONS = [
+    ('draft', 'review'),
+    ('review', 'approved'),
+    ('review', 'rejected'),
+    ('review', 'draft'),
+    ('approved', 'scheduled'),
+    ('approved', 'publishing'),
+    ('scheduled', 'approved'),
+    ('scheduled', 'publishing'),
+    ('publishing', 'published'),
+    ('publishing', 'scheduled'),
+    ('publishing', 'approved'),
+]
+
+MIGRATIONS: List[Tuple[int, str, str]] = [
+    (1, "initial", """
+CREATE TABLE IF NOT EXISTS articles (
+    id SERIAL PRIMARY KEY,
+    user_id BIGINT,
+    file_path VARCHAR,
+    status VARCHAR,
+    reviewer_id BIGINT,
+    publish_time TIMESTAMP,
+    submitted_at TIMESTAMP,
+    created_at TIMESTAMP NOT NULL DEFAULT (now() at time zone 'utc')
+);
+ALTER TABLE articles ALTER COLUMN user_id TYPE BIGINT;
+ALTER TABLE articles ALTER COLUMN reviewer_id TYPE BIGINT;
+ALTER TABLE articles ADD COLUMN IF NOT EXISTS submitted_at TIMESTAMP;
+UPDATE articles SET created_at = (now() at time zone 'utc') WHERE created_at IS NULL;
+ALTER TABLE articles ALTER COLUMN created_at SET DEFAULT (now() at time zone 'utc');
+ALTER TABLE articles ALTER COLUMN created_at SET NOT NULL;
+
+CREATE INDEX IF NOT EXISTS ix_articles_user_drafts
+    ON articles (user_id, status, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_articles_scheduled_publish_time
+    ON articles (publish_time) WHERE status = 'scheduled';
+
+CREATE TABLE IF NOT EXISTS review_comments (
+    id BIGSERIAL PRIMARY KEY,
+    article_id INTEGER REFERENCES articles (id) ON DELETE CASCADE,
+    reviewer_id BIGINT,
+    comment TEXT,
+    created_at TIMESTAMP DEFAULT now()
+);
+ALTER TABLE review_comments ADD COLUMN IF NOT EXISTS reviewer_id BIGINT;
+ALTER TABLE review_comments ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT now();
+CREATE INDEX IF NOT EXISTS ix_review_comments_article_id ON review_comments (article_id);
+
+CREATE TABLE IF NOT EXISTS audit_events (
+    id BIGSERIAL PRIMARY KEY,
+    event VARCHAR NOT NULL,
+    article_id INTEGER,
+    user_id BIGINT,
+    payload JSONB NOT NULL DEFAULT '{}'::jsonb,
+    created_at TIMESTAMP DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS ix_audit_events_article_id ON audit_events (article_id);
+
+CREATE TABLE IF NOT EXISTS fsm_storage (
+    key VARCHAR PRIMARY KEY,
+    state VARCHAR,
+    data JSONB NOT NULL DEFAULT '{}'::jsonb,
+    updated_at TIMESTAMP DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS article_transitions (
+    from_status VARCHAR,
+    to_status VARCHAR,
+    PRIMARY KEY (from_status, to_status)
+);
+INSERT INTO article_transitions (from_status, to_status) VALUES
+""" + ",\n".join(f"    ('{a}', '{b}')" for a, b in ARTICLE_TRANSITIONS) + """
+ON CONFLICT DO NOTHING;
+
+CREATE OR REPLACE FUNCTION articles_check_transition() RETURNS trigger AS $$
+BEGIN
+    IF NEW.status IS DISTINCT FROM OLD.status AND NOT EXISTS (
+        SELECT 1 FROM article_transitions
+        WHERE from_status = OLD.status AND to_status = NEW.status
+    ) THEN
+        RAISE EXCEPTION 'invalid article transition % -> %', OLD.status, NEW.status;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS articles_check_transition ON articles;
+CREATE TRIGGER articles_check_transition
+    BEFORE UPDATE OF status ON articles
+    FOR EACH ROW EXECUTE FUNCTION articles_check_transition();
+
+CREATE TABLE IF NOT EXISTS article_status_counts (
+    user_id BIGINT,
+    status VARCHAR,
+    count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, status)
+);
+CREATE TABLE IF NOT EXISTS review_turnaround (
+    user_id BIGINT PRIMARY KEY,
+    total_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    reviews BIGINT NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS publish_daily (
+    user_id BIGINT,
+    day DATE,
+    count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day)
+);
+
+CREATE OR REPLACE FUNCTION articles_track_review() RETURNS trigger AS $$
+BEGIN
+    IF NEW.status = 'review' AND OLD.status IS DISTINCT FROM 'review' THEN
+        NEW.submitted_at := now();
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS articles_track_review ON articles;
+CREATE TRIGGER articles_track_review
+    BEFORE UPDATE OF status ON articles
+    FOR EACH ROW EXECUTE FUNCTION articles_track_review();
+
+CREATE OR REPLACE FUNCTION articles_bump_status(p_user bigint, p_status text, p_delta int) RETURNS void AS $$
+    INSERT INTO article_status_counts (user_id, status, count)
+    VALUES (p_user, p_status, p_delta), (0, p_status, p_delta)
+    ON CONFLICT (user_id, status) DO UPDATE SET count = article_status_counts.count + EXCLUDED.count;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION articles_update_stats() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM articles_bump_status(OLD.user_id, OLD.status, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM articles_bump_status(NEW.user_id, NEW.status, 1);
+    END IF;
+    IF TG_OP = 'UPDATE' AND NEW.status IS DISTINCT FROM OLD.status THEN
+        IF OLD.status = 'review' AND NEW.status IN ('approved', 'rejected') AND OLD.submitted_at IS NOT NULL THEN
+            INSERT INTO review_turnaround (user_id, total_seconds, reviews)
+            VALUES (NEW.user_id, extract(epoch FROM now() - OLD.submitted_at), 1),
+                   (0, extract(epoch FROM now() - OLD.submitted_at), 1)
+            ON CONFLICT (user_id) DO UPDATE SET
+                total_seconds = review_turnaround.total_seconds + EXCLUDED.total_seconds,
+                reviews = review_turnaround.reviews + 1;
+        END IF;
+        IF NEW.status = 'published' THEN
+            INSERT INTO publish_daily (user_id, day, count)
+            VALUES (NEW.user_id, current_date, 1), (0, current_date, 1)
+            ON CONFLICT (user_id, day) DO UPDATE SET count = publish_daily.count + 1;
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS articles_update_stats ON articles;
+CREATE TRIGGER articles_update_stats
+    AFTER INSERT OR DELETE OR UPDATE OF status ON articles
+    FOR EACH ROW EXECUTE FUNCTION articles_update_stats();
+
+DELETE FROM article_status_counts;
+INSERT INTO article_status_counts (user_id, status, count)
+SELECT user_id, status, count(*) FROM articles GROUP BY user_id, status
+UNION ALL
+SELECT 0, status, count(*) FROM articles GROUP BY status;
+"""),
+    (2, "publish_payload", """
+ALTER TABLE articles ADD COLUMN IF NOT EXISTS payload BYTEA;
+"""),
+    (3, "telegram_files", """
+CREATE TABLE IF NOT EXISTS telegram_files (
+    article_id INTEGER REFERENCES articles (id) ON DELETE CASCADE,
+    content_hash VARCHAR(64),
+    file_id VARCHAR NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT now(),
+    PRIMARY KEY (article_id, content_hash)
+);
+"""),
+    (4, "articles_file_path", """
+CREATE INDEX IF NOT EXISTS ix_articles_file_path ON articles (file_path);
+"""),
+    (5, "article_revisions", """
+ALTER TABLE articles ADD COLUMN IF NOT EXISTS revision INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE articles ADD COLUMN IF NOT EXISTS reviewed_revision INTEGER;
+
+CREATE TABLE IF NOT EXISTS article_revisions (
+    article_id INTEGER REFERENCES articles (id) ON DELETE CASCADE,
+    revision INTEGER,
+    file_path VARCHAR,
+    delta BYTEA,
+    size INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP NOT NULL DEFAULT now(),
+    PRIMARY KEY (article_id, revision),
+    CHECK ((file_path IS NULL) <> (delta IS NULL))
+);
+CREATE INDEX IF NOT EXISTS ix_article_revisions_file_path
+    ON article_revisions (file_path) WHERE file_path IS NOT NULL;
+
+INSERT INTO article_revisions (article_id, revision, file_path)
+SELECT id, 1, file_path FROM articles WHERE file_path IS NOT NULL
+ON CONFLICT DO NOTHING;
+"""),
+    (6, "key_rotations", """
+CREATE TABLE IF NOT EXISTS key_rotations (
+    key_id VARCHAR PRIMARY KEY,
+    stage VARCHAR NOT NULL,
+    cursor VARCHAR NOT NULL DEFAULT '',
+    done BOOLEAN NOT NULL DEFAULT false,
+    started_at TIMESTAMP NOT NULL DEFAULT now(),
+    updated_at TIMESTAMP NOT NULL DEFAULT now()
+);
+"""),
+    (7, "search_terms", """
+ALTER TABLE articles ADD COLUMN IF NOT EXISTS search_revision INTEGER;
+
+CREATE TABLE IF NOT EXISTS search_terms (
+    user_id BIGINT NOT NULL,
+    token BYTEA NOT NULL,
+    article_id INTEGER NOT NULL REFERENCES articles (id) ON DELETE CASCADE,
+    PRIMARY KEY (user_id, token, article_id)
+);
+CREATE INDEX IF NOT EXISTS ix_search_terms_article ON search_terms (article_id);
+"""),
+    (8, "publish_lease", """
+ALTER TABLE articles ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP;
+ALTER TABLE articles ADD COLUMN IF NOT EXISTS sent_chunks INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE articles ADD COLUMN IF NOT EXISTS publish_attempts INTEGER NOT NULL DEFAULT 0;
+
+CREATE INDEX IF NOT EXISTS ix_articles_publishing_claimed_at
+    ON articles (claimed_at) WHERE status = 'publishing';
+
+-- захваченные до появления аренды считаются брошенными
+UPDATE articles SET claimed_at = '-infinity' WHERE status = 'publishing' AND claimed_at IS NULL;
+"""),
+    (9, "file_names", """
+-- сборщик мусора сверяет имена объектов, а не пути: запись VAULT_PATH может меняться
+CREATE INDEX IF NOT EXISTS ix_articles_file_name
+    ON articles ((regexp_replace(file_path, '^.*/', '')));
+CREATE INDEX IF NOT EXISTS ix_article_revisions_file_name
+    ON article_revisions ((regexp_replace(file_path, '^.*/', ''))) WHERE file_path IS NOT NULL;
+"""),
+    (10, "mac_key", """
+-- отпечаток ключа HMAC: адреса хранилища и поисковый индекс действительны только с ним
+CREATE TABLE IF NOT EXISTS mac_key (
+    id BOOLEAN PRIMARY KEY DEFAULT true CHECK (id),
+    fingerprint VARCHAR NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT now()
+);
+"""),
+    (11, "article_changes", """
+-- процессы бота сбрасывают кэши статей по этим уведомлениям (ArticleChanges)
+CREATE OR REPLACE FUNCTION articles_notify_change() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('article_changes', OLD.id || ':' || OLD.user_id);
+        RETURN OLD;
+    END IF;
+    PERFORM pg_notify('article_changes', NEW.id || ':' || NEW.user_id);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS articles_notify_change ON articles;
+CREATE TRIGGER articles_notify_change
+    AFTER INSERT OR UPDATE OR DELETE ON articles
+    FOR EACH ROW EXECUTE FUNCTION articles_notify_change();
+"""),
+]
+
+
+async def migrate(pool: asyncpg.Pool) -> List[int]:
+    """Применение недостающих миграций, возвращает номера примененных"""
+    applied = []
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute("SELECT pg_advisory_xact_lock($1)", MIGRATION_LOCK)
+            await conn.execute(
+                "CREATE TABLE IF NOT EXISTS schema_migrations ("
+                "version INTEGER PRIMARY KEY, name VARCHAR NOT NULL, "
+                "applied_at TIMESTAMP NOT NULL DEFAULT now())"
+            )
+            done = {row['version'] for row in await conn.fetch("SELECT version FROM schema_migrations")}
+            for version, name, sql in MIGRATIONS:
+                if version in done:
+                    continue
+                await conn.execute(sql)
+                await conn.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES ($1, $2)", version, name
+                )
+                applied.append(version)
+                logger.info(f"Применена миграция {version}: {name}")
+    return applied
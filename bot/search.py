@@ -0,0 +1,149 @@
+import re
+import asyncio
+import logging
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set
+
+from cache import ArticleCache
+from crypto import Crypto
+from database import AsyncDatabase
+from vault import Vault
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w{2,}")
+# 16 байт HMAC хватает, чтобы случайные совпадения токенов не встречались
+TOKEN_SIZE = 16
+
+
+def terms(text: str) -> Set[str]:
+    """Слова текста в нижнем регистре, «ё» приравнена к «е»"""
+    return set(_WORD.findall(text.casefold().replace("ё", "е")))
+
+
+class SearchIndex:
+    """Слепой поисковый индекс по статьям.
+
+    В БД хранятся только HMAC-токены слов: ключ поиска - MAC-ключ связки,
+    а в токен подмешан id автора, так что одинаковые слова разных авторов
+    не совпадают. Индекс обновляется при сохранении статьи: при правке
+    пишутся только добавленные и удаленные слова. Списки статей для часто
+    запрашиваемых слов держатся в памяти. Статьи без индекса (созданные до
+    его появления) индексируются в фоне пачками по ``batch_size``.
+    """
+
+    def __init__(self, db: AsyncDatabase, crypto: Crypto, vault: Vault, cache_bytes: int = 2 * 1024 * 1024,
+                 batch_size: int = 100, pause: float = 0.5):
+        self.db = db
+        self.crypto = crypto
+        self.vault = vault
+        self.batch_size = batch_size
+        self.pause = pause
+        self.cache = ArticleCache(max_bytes=cache_bytes, ttl=600, sizeof=lambda ids: 64 + 8 * len(ids))
+        # поколение кэша автора: ключи прежних поколений больше не читаются и вытесняются LRU
+        self._generations: Dict[int, int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._backfill_safely())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def token(self, user_id: int, term: str) -> bytes:
+        hasher = self.crypto.hasher(b"search")
+        hasher.update(f"{user_id}:{term}".encode('utf-8'))
+        return hasher.digest()[:TOKEN_SIZE]
+
+    def _tokens(self, user_id: int, words: Iterable[str]) -> Set[bytes]:
+        return {self.token(user_id, word) for word in words}
+
+    async def index(self, article_id: int, user_id: int, revision: int, text: str,
+                    old_text: Optional[str] = None):
+        """Индексация ревизии статьи; ``old_text`` - текст предыдущей ревизии"""
+        new_terms = await self.vault.compute(terms, text)
+        if old_text is not None:
+            old_terms = await self.vault.compute(terms, old_text)
+            added = self._tokens(user_id, new_terms - old_terms)
+            removed = self._tokens(user_id, old_terms - new_terms)
+            if await self.db.update_search_terms(article_id, user_id, revision, list(added), list(removed)):
+                self._forget(user_id, added | removed)
+                return
+        # индекс отстал от предыдущей ревизии - пересобираем статью целиком
+        tokens = self._tokens(user_id, new_terms)
+        removed = await self.db.replace_search_terms(article_id, user_id, revision, list(tokens))
+        self._forget(user_id, tokens | removed)
+
+    def _key(self, user_id: int, token: bytes) -> tuple:
+        return user_id, self._generations.get(user_id, 0), token
+
+    def _forget(self, user_id: int, tokens: Iterable[bytes]):
+        for token in tokens:
+            self.cache.invalidate(self._key(user_id, token))
+
+    def forget_user(self, user_id: int):
+        """Сброс всех списков автора (индекс изменен другим процессом)"""
+        self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    async def search(self, user_id: int, query: str, limit: int = 10) -> List[dict]:
+        """Черновики автора, содержащие все слова запроса, от новых к старым"""
+        tokens = self._tokens(user_id, terms(query))
+        if not tokens:
+            return []
+        postings: Dict[bytes, FrozenSet[int]] = {}
+        missing = []
+        for token in tokens:
+            ids = self.cache.get(self._key(user_id, token))
+            if ids is None:
+                missing.append(token)
+            else:
+                postings[token] = ids
+        if missing:
+            version = self.cache.version()
+            found = await self.db.search_postings(user_id, missing)
+            for token in missing:
+                ids = frozenset(found.get(token, ()))
+                self.cache.put(self._key(user_id, token), ids, version=version)
+                postings[token] = ids
+        # сначала самые редкие слова: пересечение быстро становится маленьким
+        ordered = sorted(postings.values(), key=len)
+        matches = set(ordered[0])
+        for ids in ordered[1:]:
+            matches &= ids
+            if not matches:
+                return []
+        # статья могла быть удалена или уйти из черновиков после кэширования
+        return await self.db.get_user_drafts(user_id, list(matches), limit)
+
+    async def _backfill_safely(self):
+        try:
+            await self.backfill()
+        except Exception as e:
+            logger.error(f"Ошибка индексации статей для поиска: {e}")
+
+    async def backfill(self) -> int:
+        """Индексация статей, чей индекс отстает от текущей ревизии"""
+        indexed = 0
+        after = 0
+        while True:
+            rows = await self.db.search_backlog(after, self.batch_size)
+            if not rows:
+                break
+            for row in rows:
+                try:
+                    text = await self.vault.read_text(Path(row['file_path']))
+                except FileNotFoundError:
+                    logger.error(f"Файл статьи #{row['id']} не найден, статья не проиндексирована")
+                    continue
+                await self.index(row['id'], row['user_id'], row['revision'], text)
+                indexed += 1
+            after = rows[-1]['id']
+            await asyncio.sleep(self.pause)
+        if indexed:
+            logger.info(f"Проиндексировано статей для поиска: {indexed}")
+        return indexed
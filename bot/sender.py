@@ -0,0 +1,207 @@
+import time
+import asyncio
+import logging
+import itertools
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_CHANNEL = 0
+PRIORITY_REVIEW = 1
+PRIORITY_DEFAULT = 2
+
+
+class TokenBucket:
+    """Ведро токенов: ``rate`` токенов в секунду, не больше ``capacity``"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Сколько ждать до появления токена"""
+        now = time.monotonic()
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def idle(self, now: float) -> bool:
+        """Ведро полное и не на паузе - его можно удалить и создать заново"""
+        return now >= self.blocked_until and self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+    def block(self, seconds: float):
+        """Пауза после RetryAfter от Telegram"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+
+class Sender:
+    """Единая очередь исходящих запросов к Telegram.
+
+    Ограничивает скорость глобально и для каждого чата, отдает приоритет
+    публикациям в канал перед уведомлениями ревьюеров, выдерживает
+    ``retry_after`` и повторяет сетевые ошибки с экспоненциальной задержкой.
+
+    Воркер не ждет лимита отдельного чата: такой запрос откладывается и
+    возвращается в очередь по таймеру, а воркер берет следующий, так что
+    поток публикаций в канал не задерживает сообщения в другие чаты.
+    Полные ведра простаивающих чатов удаляются.
+    """
+
+    def __init__(self, bot: Bot, workers: int = 4, global_rate: float = 25.0,
+                 chat_rate: float = 1.0, group_rate: float = 20 / 60,
+                 max_retries: int = 5, backoff: float = 0.5):
+        self.bot = bot
+        self.workers = workers
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._chat_buckets: Dict[Any, TokenBucket] = {}
+        self._prune_at = 1024
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._seq = itertools.count()
+        self._tasks = []
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.parked = 0
+        self.latencies = deque(maxlen=1000)
+
+    async def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 10.0):
+        """Дожидается отправки очереди и останавливает воркеров"""
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Исходящая очередь не опустела, потеряно {self._queue.qsize()} сообщений")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def send_message(self, chat_id, text: str, priority: int = PRIORITY_DEFAULT, **kwargs):
+        return await self.call(chat_id, lambda: self.bot.send_message(chat_id=chat_id, text=text, **kwargs), priority)
+
+    async def send_document(self, chat_id, document, priority: int = PRIORITY_DEFAULT, **kwargs):
+        return await self.call(chat_id, lambda: self.bot.send_document(chat_id=chat_id, document=document, **kwargs), priority)
+
+    async def call(self, chat_id, request: Callable[[], Awaitable], priority: int = PRIORITY_DEFAULT):
+        """Постановка запроса в очередь; возвращает результат запроса"""
+        future = asyncio.get_running_loop().create_future()
+        # (приоритет, порядковый номер, чат, запрос, future, время постановки, попытка)
+        await self._queue.put((priority, next(self._seq), chat_id, request, future, time.monotonic(), 0))
+        return await future
+
+    def _bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= self._prune_at:
+                self._prune()
+            rate = self.group_rate if str(chat_id).startswith("-") else self.chat_rate
+            bucket = self._chat_buckets[chat_id] = TokenBucket(rate, max(1.0, rate * 3))
+        return bucket
+
+    def _prune(self):
+        now = time.monotonic()
+        for chat_id in [chat_id for chat_id, bucket in self._chat_buckets.items() if bucket.idle(now)]:
+            del self._chat_buckets[chat_id]
+        self._prune_at = max(1024, 2 * len(self._chat_buckets))
+
+    async def _acquire_global(self):
+        while True:
+            delay = self.global_bucket.delay()
+            if delay <= 0:
+                self.global_bucket.take()
+                return
+            await asyncio.sleep(delay)
+
+    def _park(self, item: tuple, delay: float):
+        """Возврат запроса в очередь через ``delay`` секунд, не занимая воркера"""
+        self.parked += 1
+
+        def requeue():
+            self.parked -= 1
+            # put до task_done: для join запрос не пропадает из очереди ни на миг
+            self._queue.put_nowait(item)
+            self._queue.task_done()
+
+        asyncio.get_running_loop().call_later(delay, requeue)
+
+    def _retry(self, item: tuple, delay: float):
+        self.retries += 1
+        self._park(item[:-1] + (item[-1] + 1,), delay)
+
+    async def _worker(self):
+        while True:
+            item = await self._queue.get()
+            _, _, chat_id, request, future, queued_at, attempt = item
+            bucket = self._bucket(chat_id)
+            delay = bucket.delay()
+            if delay > 0:
+                self._park(item, delay)
+                continue
+            bucket.take()
+            try:
+                await self._acquire_global()
+                result = await request()
+            except TelegramRetryAfter as e:
+                if attempt < self.max_retries:
+                    bucket.block(e.retry_after)
+                    logger.warning(f"Flood limit для {chat_id}, ожидание {e.retry_after} с")
+                    self._retry(item, e.retry_after)
+                    continue
+                self._fail(chat_id, future, e)
+            except (TelegramNetworkError, TelegramServerError) as e:
+                if attempt < self.max_retries:
+                    delay = self.backoff * 2 ** attempt
+                    logger.warning(f"Ошибка сети при отправке в {chat_id}: {e}, повтор через {delay} с")
+                    self._retry(item, delay)
+                    continue
+                self._fail(chat_id, future, e)
+            except Exception as e:
+                self._fail(chat_id, future, e)
+            else:
+                self.sent += 1
+                if not future.done():
+                    future.set_result(result)
+            self.latencies.append(time.monotonic() - queued_at)
+            self._queue.task_done()
+
+    def _fail(self, chat_id, future: asyncio.Future, error: Exception):
+        self.failed += 1
+        logger.error(f"Не удалось отправить сообщение в {chat_id}: {error}")
+        if not future.done():
+            future.set_exception(error)
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """Глубина очереди и задержка отправки"""
+        latencies = sorted(self.latencies)
+        return {
+            "queue_depth": self._queue.qsize() + self.parked,
+            "parked": self.parked,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "latency_p50": latencies[len(latencies) // 2] if latencies else None,
+            "latency_p99": latencies[int(len(latencies) * 0.99)] if latencies else None,
+        }
@@ -0,0 +1,65 @@
+import time
+from typing import Any, Dict, Tuple
+
+from database import AsyncDatabase
+
+STATUS_TITLES = {
+    "draft": "📝 Черновики",
+    "review": "🔍 На ревью",
+    "approved": "✅ Одобрены",
+    "scheduled": "⏰ Запланированы",
+    "published": "🚀 Опубликованы",
+    "rejected": "❌ Отклонены",
+}
+
+
+class StatsService:
+    """Статистика из счетчиков, которые ведут триггеры на ``articles``.
+
+    Запрос читает несколько строк по первичному ключу, поэтому не зависит от
+    объема истории; результат дополнительно кэшируется на ``ttl`` секунд.
+    """
+
+    def __init__(self, db: AsyncDatabase, ttl: float = 30.0):
+        self.db = db
+        self.ttl = ttl
+        self._cache: Dict[int, Tuple[float, Dict[str, Any]]] = {}
+
+    async def get(self, user_id: int) -> Dict[str, Any]:
+        cached = self._cache.get(user_id)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        stats = await self.db.get_stats(user_id)
+        self._cache[user_id] = (time.monotonic() + self.ttl, stats)
+        return stats
+
+    def invalidate(self, user_id: int):
+        self._cache.pop(user_id, None)
+
+    @staticmethod
+    def render(stats: Dict[str, Any]) -> str:
+        """Текст экрана статистики"""
+        lines = ["📊 Ваша статистика:"]
+        lines += _render_counts(stats["user_counts"])
+        lines.append(f"Публикаций сегодня: {stats['user_today']}")
+        lines.append(f"Среднее время ревью: {_format_duration(stats['user_turnaround'])}")
+        lines.append("")
+        lines.append("🌐 Всего в редакции:")
+        lines += _render_counts(stats["total_counts"])
+        lines.append(f"Публикаций сегодня: {stats['total_today']}")
+        lines.append(f"В среднем за день (30 дней): {stats['daily_avg']:.1f}")
+        lines.append(f"Среднее время ревью: {_format_duration(stats['total_turnaround'])}")
+        return "\n".join(lines)
+
+
+def _render_counts(counts: Dict[str, int]) -> list:
+    return [f"{title}: {counts.get(status, 0)}" for status, title in STATUS_TITLES.items()]
+
+
+def _format_duration(seconds) -> str:
+    if seconds is None:
+        return "—"
+    minutes = int(seconds // 60)
+    if minutes < 60:
+        return f"{minutes} мин"
+    return f"{minutes // 60} ч {minutes % 60} мин"
@@ -0,0 +1,195 @@
+import json
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional, Set, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from database import AsyncDatabase
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "fsm_storage"
+
+
+class PostgresStorage(BaseStorage):
+    """Хранилище FSM в PostgreSQL на пуле ``AsyncDatabase``.
+
+    Состояние и данные пользователя читаются одним запросом и кэшируются
+    локально (LRU на ``cache_size`` ключей, не дольше ``cache_ttl`` секунд).
+    Записи копятся в течение ``flush_delay`` и сбрасываются одним upsert
+    (write-behind), так что ``set_state`` + ``update_data`` в одном
+    обработчике стоят одного обращения к БД. Неудачная запись повторяется
+    с нарастающей паузой.
+
+    Каждая запись рассылает ключ через NOTIFY, и другие процессы бота
+    сбрасывают его из своего кэша. Пока подписка LISTEN не работает, кэш не
+    используется и состояние читается из БД.
+    """
+
+    def __init__(self, db: AsyncDatabase, cache_ttl: float = 60.0, flush_delay: float = 0.01,
+                 cache_size: int = 10000, max_retry_delay: float = 30.0):
+        self.db = db
+        self.cache_ttl = cache_ttl
+        self.flush_delay = flush_delay
+        self.cache_size = cache_size
+        self.max_retry_delay = max_retry_delay
+        self._cache: "OrderedDict[str, Tuple[Optional[str], Dict[str, Any], float]]" = OrderedDict()
+        self._dirty: Set[str] = set()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._origin = uuid.uuid4().hex
+        self._listener = None
+        self._listen_task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        return ":".join(str(part) for part in (
+            key.bot_id, key.chat_id, key.user_id, key.thread_id,
+            key.business_connection_id, key.destiny
+        ))
+
+    async def start(self):
+        """Подписка на изменения из других процессов"""
+        self._listen_task = asyncio.create_task(self._listen())
+
+    async def _listen(self):
+        delay = 1.0
+        while True:
+            lost = asyncio.Event()
+            try:
+                async with self.db.pool.acquire() as conn:
+                    conn.add_termination_listener(lambda _: lost.set())
+                    await conn.add_listener(CHANNEL, self._on_notify)
+                    self._listener = conn
+                    delay = 1.0
+                    try:
+                        await lost.wait()
+                    finally:
+                        self._listener = None
+                        # пропущенные уведомления не восстановить
+                        self._drop_clean()
+                        if not conn.is_closed():
+                            await conn.remove_listener(CHANNEL, self._on_notify)
+                logger.error("Подписка FSM потеряна, кэш выключен до переподключения")
+            except Exception as e:
+                logger.error(f"Подписка FSM недоступна, кэш выключен: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_retry_delay)
+
+    def _on_notify(self, conn, pid, channel, payload: str):
+        origin, _, key = payload.partition(":")
+        if origin != self._origin and key not in self._dirty:
+            self._cache.pop(key, None)
+
+    def _drop_clean(self):
+        for key in [key for key in self._cache if key not in self._dirty]:
+            del self._cache[key]
+
+    def _remember(self, key: str, state: Optional[str], data: Dict[str, Any]):
+        self._cache[key] = (state, data, time.monotonic() + self.cache_ttl)
+        self._cache.move_to_end(key)
+        if len(self._cache) <= self.cache_size:
+            return
+        # несброшенные записи есть только в кэше, их не вытесняем
+        for old in list(self._cache):
+            if len(self._cache) <= self.cache_size:
+                break
+            if old not in self._dirty:
+                del self._cache[old]
+
+    async def _load(self, key: str) -> Tuple[Optional[str], Dict[str, Any]]:
+        cached = self._cache.get(key)
+        if cached and (key in self._dirty or (self._listener is not None and cached[2] > time.monotonic())):
+            self._cache.move_to_end(key)
+            return cached[0], cached[1]
+        async with self.db.pool.acquire() as conn:
+            row = await conn.fetchrow("SELECT state, data FROM fsm_storage WHERE key = $1", key)
+        state, data = (row['state'], json.loads(row['data'])) if row else (None, {})
+        self._remember(key, state, data)
+        return state, data
+
+    async def _store(self, key: str, state: Optional[str], data: Dict[str, Any]):
+        self._dirty.add(key)
+        self._remember(key, state, data)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        delay = self.flush_delay
+        while self._dirty:
+            await asyncio.sleep(delay)
+            if await self._flush():
+                delay = self.flush_delay
+            else:
+                delay = min(max(delay * 2, 0.5), self.max_retry_delay)
+
+    async def _flush(self) -> bool:
+        keys, self._dirty = list(self._dirty), set()
+        if not keys:
+            return True
+        states = [self._cache[key][0] for key in keys]
+        data = [json.dumps(self._cache[key][1], ensure_ascii=False) for key in keys]
+        try:
+            async with self.db.pool.acquire() as conn:
+                await conn.execute(
+                    """
+                    WITH written AS (
+                        INSERT INTO fsm_storage (key, state, data)
+                        SELECT * FROM unnest($1::text[], $2::text[], $3::jsonb[])
+                        ON CONFLICT (key) DO UPDATE
+                        SET state = EXCLUDED.state, data = EXCLUDED.data, updated_at = now()
+                        RETURNING key
+                    )
+                    SELECT pg_notify($4, $5 || ':' || key) FROM written
+                    """,
+                    keys, states, data, CHANNEL, self._origin
+                )
+        except asyncio.CancelledError:
+            self._dirty.update(keys)
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка записи FSM, повтор: {e}")
+            # более новая запись ключа уже в _dirty и возьмет актуальное значение из кэша
+            self._dirty.update(keys)
+            return False
+        return True
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        key = self._key(key)
+        _, data = await self._load(key)
+        await self._store(key, state.state if isinstance(state, State) else state, data)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = await self._load(self._key(key))
+        return state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        key = self._key(key)
+        state, _ = await self._load(key)
+        await self._store(key, state, dict(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data = await self._load(self._key(key))
+        return data.copy()
+
+    async def update_data(self, key: StorageKey, data: Mapping[str, Any]) -> Dict[str, Any]:
+        key = self._key(key)
+        state, current = await self._load(key)
+        current = {**current, **data}
+        await self._store(key, state, current)
+        return current.copy()
+
+    async def close(self, attempts: int = 3) -> None:
+        for task in (self._listen_task, self._flush_task):
+            if task and not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        for _ in range(attempts):
+            if await self._flush():
+                return
+            await asyncio.sleep(self.flush_delay)
+        logger.error(f"Не записаны состояния FSM: {len(self._dirty)}")
@@ -0,0 +1,289 @@
+import io
+import os
+import re
+import uuid
+import json
+import zlib
+import hashlib
+import itertools
+import asyncio
+import logging
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Dict, Iterator, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import ArticleCache
+from crypto import CHUNK_SIZE, Crypto
+from publication import compile_message
+
+logger = logging.getLogger(__name__)
+
+
+OBJECTS_DIR = "objects"
+# Файлы, которые создавала прежняя плоская раскладка хранилища
+LEGACY_NAME = re.compile(r"^\.?draft_\d+_\d+\.md(\.enc)?(\.tmp)?$")
+
+
+class Vault:
+    """Асинхронный доступ к зашифрованному хранилищу статей.
+
+    Шифрование и работа с диском выполняются в ограниченном пуле потоков,
+    чтобы обработчики не блокировали event loop. Объект сбрасывается на
+    диск до переименования в свой адрес, поэтому по адресу не может
+    оказаться обрезанный файл. fsync каталогов группируется: все записи,
+    попавшие в одно окно ``fsync_delay``, фиксируются одним проходом.
+
+    Статьи хранятся как неизменяемые объекты ``objects/ab/cd/<hmac>.enc``:
+    имя - HMAC открытого текста, поэтому одинаковые тексты хранятся один
+    раз, а каталоги остаются небольшими. Объекты без ссылок из БД удаляет
+    ``VaultGC``. Тексты длиннее ``CHUNK_SIZE`` шифруются потоковым форматом
+    ``Crypto.encrypt_stream`` и читаются по кускам, не загружая весь файл.
+    """
+
+    def __init__(self, root: Path, crypto: Crypto, max_workers: int = 4, fsync_delay: float = 0.02,
+                 cache: Optional[ArticleCache] = None):
+        self.root = root
+        self.crypto = crypto
+        self.cache = cache
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="vault")
+        self._fsync_delay = fsync_delay
+        self._pending: Dict[Path, List[asyncio.Future]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def object_path(self, address: str) -> Path:
+        return self.root / OBJECTS_DIR / address[:2] / address[2:4] / f"{address}.enc"
+
+    def locate(self, file_path: str) -> Path:
+        """Файл в этом хранилище по пути из БД, как бы ни был записан корень"""
+        name = Path(file_path).name
+        if LEGACY_NAME.match(name):
+            return self.root / name
+        return self.object_path(name[:-len(".enc")])
+
+    async def save_draft(self, text: str) -> Path:
+        """Сохранение текста статьи в зашифрованном виде, возвращает путь к объекту
+
+        Открытый текст на диск не попадает: шифруется прямо из памяти.
+        """
+        path, written = await self._run(self._save_bytes_sync, text.encode('utf-8'))
+        if written:
+            await self._sync(path)
+        return path
+
+    def _save_bytes_sync(self, data: bytes) -> Tuple[Path, bool]:
+        path = self.object_path(self.crypto.mac(data))
+        if self._touch(path):
+            return path, False
+        tmp_path = self._tmp_path(path)
+        with tmp_path.open("wb") as target:
+            if len(data) > CHUNK_SIZE:
+                # кусками: токен Fernet на весь текст занимал бы в памяти еще несколько его копий
+                self.crypto.encrypt_stream(io.BytesIO(data), target)
+            else:
+                target.write(self.crypto.encrypt(data))
+            self._fsync_file(target)
+        os.replace(tmp_path, path)
+        return path, True
+
+    @staticmethod
+    def _touch(path: Path) -> bool:
+        """Объект уже есть: обновляем mtime, чтобы сборщик мусора его не тронул"""
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    @staticmethod
+    def _fsync_file(target: BinaryIO):
+        target.flush()
+        os.fsync(target.fileno())
+
+    @staticmethod
+    def _tmp_path(path: Path) -> Path:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+
+    async def read_text(self, path: Path) -> str:
+        """Чтение и дешифрование статьи (с кэшем расшифрованного текста)"""
+        if self.cache is None:
+            return await self._run(self._read_text_sync, path)
+        key = ("body", str(path))
+        plain = self.cache.get(key)
+        if plain is None:
+            plain = await self._run(self._read_plain_sync, path)
+            self.cache.put(key, plain)
+        return plain.decode('utf-8')
+
+    def _read_text_sync(self, path: Path) -> str:
+        return self._read_plain_sync(path).decode('utf-8')
+
+    def _read_plain_sync(self, path: Path) -> bytes:
+        with path.open("rb") as source:
+            return b"".join(self.crypto.decrypt_stream(source))
+
+    async def build_payload(self, path: Path) -> bytes:
+        """Статья, подготовленная к публикации: куски HTML одним зашифрованным токеном"""
+        return await self._run(self._build_payload_sync, path)
+
+    def _build_payload_sync(self, path: Path) -> bytes:
+        chunks = compile_message(self._read_text_sync(path))
+        return self.crypto.encrypt(json.dumps(chunks, ensure_ascii=False).encode('utf-8'))
+
+    async def compute(self, func, *args):
+        """Работа с текстами статей (дельты, diff, копии для правки) в пуле хранилища"""
+        return await self._run(func, *args)
+
+    async def size(self, path: Path) -> int:
+        """Размер файла хранилища в байтах"""
+        return (await self._run(path.stat)).st_size
+
+    async def seal(self, data: bytes) -> bytes:
+        """Сжатие и шифрование небольших данных (дельты ревизий)"""
+        return await self._run(self._seal_sync, data)
+
+    def _seal_sync(self, data: bytes) -> bytes:
+        return self.crypto.encrypt(zlib.compress(data, 6))
+
+    async def unseal(self, token: bytes) -> bytes:
+        return await self._run(self._unseal_sync, token)
+
+    def _unseal_sync(self, token: bytes) -> bytes:
+        return zlib.decompress(self.crypto.decrypt(token))
+
+    async def read_payload(self, payload: bytes) -> List[str]:
+        """Куски HTML из подготовленной при одобрении публикации"""
+        return json.loads(await self._run(self.crypto.decrypt, payload))
+
+    def invalidate(self, path: Path):
+        """Сброс кэша после изменения содержимого"""
+        if self.cache is not None:
+            self.cache.invalidate(("body", str(path)))
+
+    async def iter_plain(self, path: Path) -> AsyncIterator[bytes]:
+        """Потоковое дешифрование: куски отдаются по мере чтения файла (в любом из форматов)"""
+        source = await self._run(path.open, "rb")
+        try:
+            chunks = self.crypto.decrypt_stream(source)
+            while True:
+                chunk = await self._run(next, chunks, None)
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            await self._run(source.close)
+
+    async def digest(self, path: Path) -> str:
+        """SHA-256 зашифрованного файла: меняется при каждом сохранении"""
+        return await self._run(self._digest_sync, path)
+
+    @staticmethod
+    def _digest_sync(path: Path) -> str:
+        digest = hashlib.sha256()
+        with path.open("rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    async def scan(self, batch_size: int = 500) -> AsyncIterator[List[Tuple[Path, float]]]:
+        """Файлы хранилища пачками ``(путь, mtime)``: объекты и файлы прежней раскладки"""
+        files = self._walk()
+        while True:
+            batch = await self._run(self._take, files, batch_size)
+            if not batch:
+                return
+            yield batch
+
+    def _walk(self) -> Iterator[Tuple[Path, float]]:
+        for entry in os.scandir(self.root):
+            if entry.is_file() and LEGACY_NAME.match(entry.name):
+                yield Path(self.root, entry.name), entry.stat().st_mtime
+        for directory, _, names in os.walk(self.root / OBJECTS_DIR):
+            for name in names:
+                path = Path(directory, name)
+                try:
+                    yield path, path.stat().st_mtime
+                except FileNotFoundError:
+                    continue
+
+    @staticmethod
+    def _take(files: Iterator[Tuple[Path, float]], size: int) -> List[Tuple[Path, float]]:
+        return list(itertools.islice(files, size))
+
+    async def remove(self, paths: List[Path], older_than: float) -> int:
+        """Удаление файлов, не изменявшихся с ``older_than``; возвращает число удаленных"""
+        removed = await self._run(self._remove_sync, paths, older_than)
+        for path in removed:
+            self.invalidate(path)
+        return len(removed)
+
+    @staticmethod
+    def _remove_sync(paths: List[Path], older_than: float) -> List[Path]:
+        removed = []
+        for path in paths:
+            try:
+                # повторная проверка: объект мог только что понадобиться снова
+                if path.stat().st_mtime >= older_than:
+                    continue
+                path.unlink()
+                removed.append(path)
+            except FileNotFoundError:
+                continue
+        return removed
+
+    async def exists(self, path: Path) -> bool:
+        return await self._run(path.exists)
+
+    async def _sync(self, path: Path):
+        """Ожидание fsync каталога файла в составе ближайшей пачки"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(path, []).append(future)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+        await future
+
+    async def _flush_later(self):
+        while self._pending:
+            await asyncio.sleep(self._fsync_delay)
+            await self._flush()
+
+    async def _flush(self):
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return
+        try:
+            await self._run(self._fsync_sync, list(batch))
+        except Exception as e:
+            logger.error(f"Ошибка fsync хранилища: {e}")
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        for futures in batch.values():
+            for future in futures:
+                if not future.done():
+                    future.set_result(None)
+
+    @staticmethod
+    def _fsync_sync(paths: List[Path]):
+        # содержимое уже на диске, остается зафиксировать переименования
+        directories = {path.parent for path in paths}
+        if os.name == "posix":
+            for directory in directories:
+                fd = os.open(directory, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+
+    async def close(self):
+        """Сброс незавершенных fsync и остановка пула"""
+        if self._flush_task and not self._flush_task.done():
+            await self._flush_task
+        await self._flush()
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,91 @@
+import time
+import asyncio
+import logging
+from typing import Optional
+
+from database import AsyncDatabase
+from vault import Vault
+
+logger = logging.getLogger(__name__)
+
+
+class VaultGC:
+    """Сборщик мусора хранилища.
+
+    Раз в ``interval`` секунд обходит файлы хранилища пачками по
+    ``batch_size``, сверяет их с путями в БД и удаляет файлы без ссылок.
+    Файлы моложе ``grace`` секунд не трогаются: объект мог быть только что
+    записан (или найден как дубликат), а строка статьи еще не вставлена.
+
+    Файлы сверяются с БД по имени (адресу объекта), а не по пути. Если ни
+    один файл пачки не нашелся в БД, а файлы живых статей в этом хранилище
+    не находятся, проход прерывается: скорее всего, хранилище не то.
+    """
+
+    def __init__(self, vault: Vault, db: AsyncDatabase, interval: float = 3600.0,
+                 batch_size: int = 500, grace: float = 3600.0, pause: float = 0.1):
+        self.vault = vault
+        self.db = db
+        self.interval = interval
+        self.batch_size = batch_size
+        self.grace = grace
+        self.pause = pause
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self.interval:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.collect()
+            except Exception as e:
+                logger.error(f"Ошибка сборки мусора хранилища: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def collect(self) -> int:
+        """Один проход по хранилищу, возвращает число удаленных файлов"""
+        start = time.monotonic()
+        cutoff = time.time() - self.grace
+        scanned = removed = 0
+        checked = False
+        async for batch in self.vault.scan(self.batch_size):
+            scanned += len(batch)
+            candidates = [path for path, mtime in batch if mtime < cutoff]
+            if candidates:
+                referenced = await self.db.referenced_names([path.name for path in candidates])
+                if not referenced and not checked:
+                    if not await self._vault_matches_db():
+                        logger.error(
+                            f"Сборка мусора остановлена: файлы статей из БД не найдены в {self.vault.root}"
+                        )
+                        return removed
+                    checked = True
+                garbage = [path for path in candidates if path.name not in referenced]
+                removed += await self.vault.remove(garbage, cutoff)
+            # не занимаем пул БД и диск надолго
+            await asyncio.sleep(self.pause)
+        logger.info(
+            f"Сборка мусора хранилища: проверено {scanned}, удалено {removed} "
+            f"за {time.monotonic() - start:.1f} с"
+        )
+        return removed
+
+    async def _vault_matches_db(self) -> bool:
+        """Есть ли в хранилище файлы последних статей из БД"""
+        sample = await self.db.sample_file_paths(20)
+        if not sample:
+            return True
+        for file_path in sample:
+            if await self.vault.exists(self.vault.locate(file_path)):
+                return True
+        return False
@@ -0,0 +1,102 @@
+import hmac
+import asyncio
+import logging
+from typing import Optional
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """Прием обновлений от Telegram через webhook.
+
+    Запросы проверяются по секретному токену и кладутся в ограниченную
+    очередь, которую разбирают ``workers`` обработчиков. Если очередь
+    заполнена, Telegram получает 503 и повторит доставку позже.
+    """
+
+    def __init__(self, bot: Bot, dp: Dispatcher, secret: str, url: Optional[str] = None,
+                 host: str = "0.0.0.0", port: int = 8080, path: str = "/webhook",
+                 workers: int = 8, queue_size: int = 100):
+        self.bot = bot
+        self.dp = dp
+        self.secret = secret
+        self.url = url
+        self.host = host
+        self.port = port
+        self.path = path
+        self.workers = workers
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._tasks = []
+        self._runner: Optional[web.AppRunner] = None
+        self.rejected = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self._handle)
+        return app
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        token = request.headers.get(SECRET_HEADER, "")
+        if not hmac.compare_digest(token, self.secret):
+            return web.Response(status=401)
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except Exception as e:
+            logger.error(f"Некорректное обновление webhook: {e}")
+            return web.Response(status=400)
+        try:
+            self._queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return web.Response(status=503, headers={"Retry-After": "1"})
+        return web.Response(status=200)
+
+    async def _worker(self):
+        while True:
+            update = await self._queue.get()
+            try:
+                await self.dp.feed_update(self.bot, update)
+            except Exception as e:
+                logger.error(f"Ошибка обработки обновления {update.update_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        if self.url:
+            await self.bot.set_webhook(
+                url=self.url,
+                secret_token=self.secret,
+                allowed_updates=self.dp.resolve_used_update_types()
+            )
+        logger.info(f"Webhook слушает {self.host}:{self.port}{self.path}")
+
+    async def stop(self, timeout: float = 10.0):
+        if self._runner:
+            await self._runner.cleanup()
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Не обработано обновлений: {self._queue.qsize()}")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def serve(self):
+        """Работа до отмены задачи"""
+        await self.dp.emit_startup(bot=self.bot, dispatcher=self.dp)
+        await self.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await self.stop()
+            await self.dp.emit_shutdown(bot=self.bot, dispatcher=self.dp)
@@ -0,0 +1,209 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, BinaryIO, Callable, Dict, List, Optional, Tuple
+
+from vault import Vault
+
+try:
+    from watchfiles import awatch
+except ImportError:  # опциональная зависимость: без нее изменения ищутся опросом mtime
+    awatch = None
+
+logger = logging.getLogger(__name__)
+
+# (статья, автор или None для копий, оставшихся с прошлого запуска, текст)
+OnChange = Callable[[int, Optional[int], str], Awaitable[None]]
+# (статья, автор, отложенная копия или None, если копия еще под наблюдением)
+OnFailure = Callable[[int, Optional[int], Optional[Path]], Awaitable[None]]
+
+
+@dataclass
+class _Copy:
+    article_id: int
+    user_id: Optional[int]
+    path: Path
+    digest: Optional[str]
+    stat: Optional[Tuple[float, int]]
+    deadline: Optional[float] = None
+    touched: float = 0.0
+    failed: Optional[str] = None
+
+
+class EditWorkspace:
+    """Рабочий каталог с расшифрованными копиями статей для правки.
+
+    Изменения копий отслеживаются через inotify (пакет ``watchfiles``) или
+    опросом mtime. Сохранения объединяются за ``debounce`` секунд, в
+    хранилище уходят только копии, чье содержимое действительно изменилось.
+    Копии, не менявшиеся ``idle_timeout`` секунд, удаляются. Копия с
+    несохраненной правкой не удаляется, а откладывается в
+    ``<id>.unsaved-<время>.md``; о неудачном сохранении сообщает ``on_failure``.
+    Работа с диском идет в пуле ``vault``.
+    """
+
+    def __init__(self, root: Path, vault: Vault, on_change: OnChange, debounce: float = 2.0,
+                 idle_timeout: float = 1800.0, poll_interval: float = 1.0, use_inotify: bool = True,
+                 on_failure: Optional[OnFailure] = None):
+        self.root = root
+        self.vault = vault
+        self.on_change = on_change
+        self.on_failure = on_failure
+        self.debounce = debounce
+        self.idle_timeout = idle_timeout
+        self.poll_interval = poll_interval
+        self.inotify = use_inotify and awatch is not None
+        self._copies: Dict[Path, _Copy] = {}
+        self._stop = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        for copy in await self.vault.compute(self._prepare):
+            self._copies[copy.path] = copy
+        self._tasks = [asyncio.create_task(self._loop())]
+        if self.inotify:
+            self._tasks.append(asyncio.create_task(self._watch()))
+        logger.info(f"Рабочий каталог правки {self.root} ({'inotify' if self.inotify else 'опрос'})")
+
+    def _prepare(self) -> List[_Copy]:
+        """Каталог только для владельца; копии с прошлого запуска берутся под наблюдение"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        os.chmod(self.root, 0o700)
+        leftovers = []
+        now = time.monotonic()
+        for path in self.root.glob("*.md"):
+            if path.stem.isdigit():
+                # digest неизвестен: при первой проверке копия сверится с текстом статьи
+                leftovers.append(_Copy(int(path.stem), None, path, None, None, now + self.debounce, now))
+        return leftovers
+
+    async def stop(self):
+        """Сохранение последних правок и удаление всех копий"""
+        self._stop.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for copy in list(self._copies.values()):
+            await self._close(copy)
+
+    async def open(self, article_id: int, user_id: int, chunks: AsyncIterator[bytes]) -> Path:
+        """Расшифрованная копия статьи для правки, пишется по мере дешифрования ``chunks``"""
+        path = self.root / f"{article_id}.md"
+        digest = hashlib.sha256()
+        target = await self.vault.compute(self._create, path)
+        try:
+            async for chunk in chunks:
+                digest.update(chunk)
+                await self.vault.compute(target.write, chunk)
+        finally:
+            await self.vault.compute(target.close)
+        stat = await self.vault.compute(self._stat, path)
+        self._copies[path] = _Copy(article_id, user_id, path, digest.hexdigest(), stat, touched=time.monotonic())
+        return path
+
+    @staticmethod
+    def _create(path: Path) -> BinaryIO:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        return os.fdopen(fd, "wb")
+
+    @staticmethod
+    def _stat(path: Path) -> Optional[Tuple[float, int]]:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime, stat.st_size
+
+    def _mark(self, path: Path):
+        copy = self._copies.get(path)
+        if copy is not None:
+            copy.touched = time.monotonic()
+            copy.deadline = copy.touched + self.debounce
+
+    async def _watch(self):
+        async for changes in awatch(self.root, stop_event=self._stop):
+            for _, changed in changes:
+                self._mark(Path(changed))
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                if not self.inotify:
+                    await self._poll()
+                await self._process()
+            except Exception as e:
+                logger.error(f"Ошибка рабочего каталога правки: {e}")
+
+    async def _poll(self):
+        copies = list(self._copies.values())
+        stats = await self.vault.compute(lambda: [self._stat(copy.path) for copy in copies])
+        for copy, stat in zip(copies, stats):
+            if stat != copy.stat:
+                copy.stat = stat
+                self._mark(copy.path)
+
+    async def _process(self):
+        now = time.monotonic()
+        for copy in list(self._copies.values()):
+            if copy.deadline is not None and copy.deadline <= now:
+                copy.deadline = None
+                await self._sync(copy)
+            elif copy.deadline is None and now - copy.touched > self.idle_timeout:
+                await self._close(copy)
+
+    async def _sync(self, copy: _Copy) -> bool:
+        """Отправка правки, если содержимое копии изменилось; False - правка не сохранена"""
+        try:
+            data = await self.vault.compute(copy.path.read_bytes)
+        except FileNotFoundError:
+            self._copies.pop(copy.path, None)
+            return True
+        digest = hashlib.sha256(data).hexdigest()
+        if digest == copy.digest:
+            return True
+        try:
+            await self.on_change(copy.article_id, copy.user_id, data.decode('utf-8'))
+            copy.digest = digest
+            return True
+        except Exception as e:
+            logger.error(f"Не удалось сохранить правку статьи #{copy.article_id}: {e}")
+            # об одном и том же содержимом сообщаем один раз
+            if copy.failed != digest:
+                copy.failed = digest
+                await self._report(copy, None)
+            return False
+
+    async def _close(self, copy: _Copy):
+        """Удаление копии; несохраненная правка откладывается в сторону"""
+        if await self._sync(copy):
+            await self._discard(copy)
+            return
+        self._copies.pop(copy.path, None)
+        kept = self.root / f"{copy.article_id}.unsaved-{int(time.time())}.md"
+        try:
+            await self.vault.compute(os.replace, copy.path, kept)
+        except OSError as e:
+            logger.error(f"Не удалось отложить копию статьи #{copy.article_id}: {e}")
+            return
+        logger.warning(f"Несохраненная правка статьи #{copy.article_id} отложена в {kept}")
+        await self._report(copy, kept)
+
+    async def _report(self, copy: _Copy, kept: Optional[Path]):
+        if self.on_failure is None:
+            return
+        try:
+            await self.on_failure(copy.article_id, copy.user_id, kept)
+        except Exception as e:
+            logger.error(f"Не удалось сообщить о несохраненной правке статьи #{copy.article_id}: {e}")
+
+    async def _discard(self, copy: _Copy):
+        self._copies.pop(copy.path, None)
+        try:
+            await self.vault.compute(copy.path.unlink)
+        except FileNotFoundError:
+            pass
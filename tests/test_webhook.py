@@ -0,0 +1,75 @@
+"""Доставка обновления через WebhookServer с заглушкой Bot API.
+
+Запуск из корня репозитория:
+
+    python -m unittest discover tests
+"""
+import sys
+import socket
+import asyncio
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "bot"))
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.types import Message
+
+from fake_telegram import FakeTelegram
+from webhook import WebhookServer
+
+SECRET = "webhook-secret"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class WebhookServerTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.fake = FakeTelegram(port=_free_port())
+        await self.fake.start()
+        self.bot = Bot(
+            token="42:TEST",
+            session=AiohttpSession(api=TelegramAPIServer.from_base(self.fake.base_url))
+        )
+        self.dp = Dispatcher()
+
+        @self.dp.message()
+        async def echo(message: Message):
+            await message.answer(f"echo: {message.text}")
+
+        port = _free_port()
+        self.server = WebhookServer(
+            self.bot, self.dp, SECRET, url=f"http://127.0.0.1:{port}/webhook",
+            host="127.0.0.1", port=port, workers=2
+        )
+        await self.server.start()
+
+    async def asyncTearDown(self):
+        await self.server.stop(timeout=1.0)
+        await self.bot.session.close()
+        await self.fake.stop()
+
+    async def test_update_is_answered(self):
+        self.assertEqual(self.fake.webhook_secret, SECRET)
+        reply = self.fake.expect("sendMessage", lambda params: int(params["chat_id"]) == 100)
+        status = await self.fake.push_update(self.fake.message_update(100, "привет"))
+        self.assertEqual(status, 200)
+        params = await asyncio.wait_for(reply, timeout=5.0)
+        self.assertEqual(params["text"], "echo: привет")
+
+    async def test_wrong_secret_is_rejected(self):
+        self.fake.webhook_secret = "wrong"
+        status = await self.fake.push_update(self.fake.message_update(100, "привет"))
+        self.assertEqual(status, 401)
+        await asyncio.sleep(0.1)
+        self.assertEqual(self.fake.calls["sendMessage"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()